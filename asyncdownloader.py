@@ -0,0 +1,551 @@
+"""
+MIT License
+
+Copyright (c) 2017 Daniel N. R. da Silva
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import asyncio
+import os
+import time
+import urllib.parse
+
+import aiohttp
+import click
+
+from downloader import CachedCopyEvictedError, IncompleteDownloadError, RetryableStatusError, write_chunk
+from extract import StreamExtractor, is_stream_compressed
+from integrity import Checksums
+from logger import *
+from metrics import metrics
+from retry import parse_retry_after, retry_statuses
+
+
+class AsyncNetworkDownloader(object):
+    """
+    This class runs the url discovery and downloads of a NetworkDownloader on an asyncio event loop. Pages and files
+    are fetched with aiohttp, while the pages are parsed by the downloader _parse_urls_in_main_page and _parse_urls
+    methods, so every repository works unchanged. Thousands of transfers may be in flight at once without a thread
+    per transfer.
+    """
+
+    def __init__(self, downloader, session, semaphore):
+        """
+        Constructor for AsyncNetworkDownloader.
+
+        :param downloader: A NetworkDownloader.
+        :param session: An aiohttp ClientSession, whose connector bounds the connections opened to a single host.
+        :param semaphore: An asyncio Semaphore bounding the number of requests in flight, possibly shared with other
+        repositories.
+        """
+
+        self._downloader = downloader
+        self._session = session
+        self._semaphore = semaphore
+
+    async def _fetch_page(self, url):
+        """
+        Fetches an html page, trying again with backoff on network errors and on statuses telling the page may be
+        served later.
+
+        :param url: A page url.
+        :return: The page, as bytes.
+        """
+
+        downloader = self._downloader
+        http_cache = downloader._http_cache
+        cached, cached_data = http_cache.read(url) if http_cache is not None else (None, None)
+        retry_policy = downloader._retry_policy
+        for attempt in range(1, retry_policy.attempts + 1):
+            try:
+                # Requests wait for the rate limits before taking a slot, so a throttled host does not hold slots
+                # the other hosts could use.
+                await self._request_slot(url)
+                async with self._semaphore:
+                    s_time = time.perf_counter()
+                    async with self._session.get(url, headers=downloader._page_headers(cached)) as response:
+                        if response.status in retry_statuses:
+                            raise RetryableStatusError(response.status,
+                                                       parse_retry_after(response.headers.get('Retry-After')))
+                        response.raise_for_status()
+                        data = await response.read()
+
+                metrics.add(url, 'fetch', time.perf_counter() - s_time, total_bytes=len(data), requests=1)
+                await self._throttle(url, len(data))
+                if response.status == 304 and cached_data is not None:
+                    url_getter_logger.info('{} is up to date in the HTTP cache.'.format(url))
+                    return cached_data
+
+                etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+                if http_cache is not None and response.status == 200 and \
+                        (etag is not None or last_modified is not None):
+                    http_cache.put(url, data, etag=etag, last_modified=last_modified)
+                return data
+
+            except aiohttp.ClientResponseError:
+                raise
+
+            except (aiohttp.ClientError, asyncio.TimeoutError, RetryableStatusError) as e:
+                if attempt == retry_policy.attempts:
+                    raise
+                metrics.retry(url)
+                url_getter_logger.warning('Could not get {} ({}/{}): {}'.format(
+                    url, attempt, retry_policy.attempts, e or type(e).__name__))
+                await asyncio.sleep(retry_policy.delay(attempt, getattr(e, 'retry_after', None)))
+
+    def _parse_urls(self, url, data):
+        """
+        Parses the links to download network data found in a page.
+
+        :param url: The page url.
+        :param data: The page, as bytes.
+        :return: A list of downloadable networks urls.
+        """
+
+        s_time = time.perf_counter()
+        urls = self._downloader._parse_urls(self._downloader._parse_page(data))
+        metrics.add(url, 'parse', time.perf_counter() - s_time)
+        return urls
+
+    async def _get_urls_in_page(self, url):
+        """
+        Fetches a network data page and parses the links to download network data found there.
+
+        :param url: A network data page url.
+        :return: A list of downloadable networks urls, or an empty list if the page could not be fetched.
+        """
+
+        try:
+            data = await self._fetch_page(url)
+        except aiohttp.ClientResponseError as e:
+            url_getter_logger.warning('Could not get {}: HTTP {}.'.format(url, e.status))
+            return []
+        except (aiohttp.ClientError, asyncio.TimeoutError, RetryableStatusError) as e:
+            metrics.failure(url)
+            url_getter_logger.error('Could not get {}: {}'.format(url, e or type(e).__name__))
+            self._downloader._discovery_incomplete = True
+            return []
+
+        return self._parse_urls(url, data)
+
+    async def get_urls(self):
+        """
+        Gets the urls to data for the repository, as NetworkDownloader.get_urls does. Network data pages linked from
+        the main page are fetched concurrently, once each, and their urls are merged without duplicates in the order
+        the pages appear in the main page.
+
+        :return: A list of urls.
+        """
+
+        downloader = self._downloader
+        downloader._discovery_incomplete = False
+        if not urllib.parse.urlparse(downloader._site_url).netloc:
+            # Repositories without a site url know their urls without fetching any page.
+            downloader._downloadable_urls = downloader._parse_urls()
+            return downloader._downloadable_urls
+
+        data = await self._fetch_page(downloader._site_url)
+        s_time = time.perf_counter()
+        soup = downloader._parse_page(data)
+        urls_from_main_page = downloader._parse_urls_in_main_page(soup)
+
+        if urls_from_main_page is not None:
+            metrics.add(downloader._site_url, 'parse', time.perf_counter() - s_time)
+            pages_urls = await asyncio.gather(*(self._get_urls_in_page(url)
+                                                for url in dict.fromkeys(urls_from_main_page)))
+            downloader._downloadable_urls = list(dict.fromkeys(url for page_urls in pages_urls for url in page_urls))
+        else:
+            downloader._downloadable_urls = list(dict.fromkeys(downloader._parse_urls(soup)))
+            metrics.add(downloader._site_url, 'parse', time.perf_counter() - s_time)
+
+        return downloader._downloadable_urls
+
+    async def begin_downloads(self, repository_output_dir, sync=False, extract=False, extract_workers=None, urls=None,
+                              selection=None, shard=None):
+        """
+        Discovers the repository urls, unless the url cache holds fresh ones, and prepares the state shared by its
+        downloads.
+
+        :param repository_output_dir: Directory where downloaded files are to be saved.
+        :param sync: Whether files already in the manifest are only downloaded again if they changed upstream.
+        :param extract: Whether downloaded archives and compressed files are extracted.
+        :param extract_workers: Number of processes extracting archives, or None for one per CPU.
+        :param urls: The network data urls to download, or None to download every url of the repository.
+        :param selection: A Selection of the networks to download among the urls, or None to download them all.
+        :param shard: A Shard of the selected networks to download, or None to download them all.
+        :return: A list of (output file name, url) tuples, one per network to be downloaded, in download order.
+        """
+
+        downloader = self._downloader
+        if urls is None:
+            if not len(downloader._downloadable_urls) and not downloader._load_cached_urls():
+                await self.get_urls()
+                downloader._cache_urls()
+            # The urls are handed over, so a repository where none were found is not discovered again in the thread.
+            urls = downloader._downloadable_urls
+
+        # Sizes a selection or a shard may need are asked with blocking HEAD requests, hence in a thread.
+        return await asyncio.to_thread(downloader.begin_downloads, repository_output_dir, sync=sync, extract=extract,
+                                       extract_workers=extract_workers, urls=urls, selection=selection,
+                                       shard=shard)
+
+    async def download_networks(self, repository_output_dir, sync=False, extract=False, extract_workers=None,
+                                urls=None, selection=None, shard=None):
+        """
+        Downloads networks for the repository, as NetworkDownloader.download_networks does, with every file of the
+        repository in flight at once as far as the semaphore allows.
+
+        :param repository_output_dir: Directory where downloaded files are to be saved.
+        :param sync: Whether files already in the manifest are only downloaded again if they changed upstream.
+        :param extract: Whether downloaded archives and compressed files are extracted.
+        :param extract_workers: Number of processes extracting archives, or None for one per CPU.
+        :param urls: The network data urls to download, or None to download every url of the repository.
+        :param selection: A Selection of the networks to download among the urls, or None to download them all.
+        :param shard: A Shard of the selected networks to download, or None to download them all.
+        :return: None.
+        """
+
+        downloads = await self.begin_downloads(repository_output_dir, sync=sync, extract=extract,
+                                               extract_workers=extract_workers, urls=urls, selection=selection,
+                                               shard=shard)
+        try:
+            with click.progressbar(length=len(downloads),
+                                   label='Downloading {} networks'.format(self._downloader._repository_name)) as bar:
+                await self.download_all(downloads, bar)
+        finally:
+            self._downloader.finish_downloads()
+
+    async def download_all(self, downloads, bar):
+        """
+        Downloads every network prepared by begin_downloads, updating a progress bar as they finish.
+
+        :param downloads: A list of (output file name, url) tuples.
+        :param bar: A progress bar counting finished files.
+        :return: None.
+        """
+
+        async def download(out_filename, url):
+            await self._download_network(out_filename, url)
+            bar.update(1)
+
+        await asyncio.gather(*(download(out_filename, url) for out_filename, url in downloads))
+
+    async def _download_network(self, out_filename, target_url):
+        """
+        Downloads a network, resuming interrupted transfers, as NetworkDownloader._download_network does.
+
+        :param out_filename: Network output file name.
+        :param target_url: Network data url.
+        :return: None.
+        """
+
+        downloader = self._downloader
+        part_filename = out_filename + '.part'
+        validators = downloader._sync_validators(out_filename, target_url)
+        if downloader._link_stored_checksum(out_filename, target_url):
+            return
+
+        retry_policy = downloader._retry_policy
+        error = None
+        for attempt in range(1, retry_policy.attempts + 1):
+            try:
+                if validators is not None and validators['etag'] is None and validators['last_modified'] is None:
+                    await self._request_slot(target_url)
+                    async with self._semaphore:
+                        unchanged = await self._is_unchanged(target_url, validators)
+                    if unchanged:
+                        await asyncio.to_thread(downloader._finish_transfer, out_filename, target_url, {'status': 304})
+                        return
+                    validators = None
+
+                await self._request_slot(target_url)
+                async with self._semaphore:
+                    transfer = await self._transfer(out_filename, target_url, validators)
+
+                if transfer['status'] >= 400:
+                    downloader._record_failure(target_url, 'HTTP {}'.format(transfer['status']))
+                    return
+
+                # Keeping a transfer moves, links and hashes files, so it runs in a thread rather than on the loop.
+                await asyncio.to_thread(downloader._finish_transfer, out_filename, target_url, transfer)
+                return
+
+            except CachedCopyEvictedError as e:
+                # The copy the server found unchanged is gone, so the network is fetched again without validators.
+                error = e
+                validators = None
+                download_logger.info('{}, downloading {} again.'.format(e, target_url))
+
+            except (aiohttp.ClientError, asyncio.TimeoutError, IncompleteDownloadError, RetryableStatusError) as e:
+                error = e
+                metrics.retry(target_url)
+                download_logger.warning('Transfer of {} interrupted ({}/{}): {}'.format(
+                    target_url, attempt, retry_policy.attempts, e or type(e).__name__))
+                if attempt < retry_policy.attempts:
+                    await asyncio.sleep(retry_policy.delay(attempt, getattr(e, 'retry_after', None)))
+
+        downloader._give_up(target_url, part_filename, error)
+
+    async def _is_unchanged(self, target_url, entry):
+        """
+        Compares the size the server announces for a network with the recorded one. The caller waits for the request
+        slot.
+
+        :param target_url: Network data url.
+        :param entry: The url record in the manifest.
+        :return: True if the network size did not change, False otherwise.
+        """
+
+        try:
+            async with self._session.head(target_url, headers=self._downloader._headers,
+                                          allow_redirects=True) as response:
+                return response.status == 200 and response.content_length == entry['size']
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+    async def _transfer(self, out_filename, target_url, validators=None):
+        """
+        Transfers network data into a partial file, asking the server only for the bytes the file still misses. The
+        caller waits for the request slot.
+
+        :param out_filename: Network output file name. Data is written to the partial file name derived from it.
+        :param target_url: Network data url.
+        :param validators: A manifest record whose ETag and Last-Modified make the request conditional, or None.
+        :return: A dict with the response status, validators, size and checksums of the partial file once it
+        holds the complete network data, or with the response status only if nothing must be kept.
+        """
+
+        downloader = self._downloader
+        part_filename = out_filename + '.part'
+        offset, part_record = downloader._resumable_part(part_filename)
+        headers = downloader._transfer_headers(offset, part_record, validators)
+
+        s_time = time.perf_counter()
+        async with self._session.get(target_url, headers=headers) as response:
+            metrics.add(target_url, 'ttfb', time.perf_counter() - s_time, requests=1)
+            if response.status == 304:
+                return {'status': 304}
+
+            if response.status == 416:
+                transfer = await asyncio.to_thread(downloader._completed_part, part_filename, part_record,
+                                                   response.headers.get('Content-Range'))
+                if transfer is not None:
+                    return transfer
+
+                # The partial file does not fit the remote file anymore, so it is discarded and fetched again.
+                downloader._remove_part(part_filename)
+                raise IncompleteDownloadError('range {}- not satisfiable'.format(offset))
+
+            if response.status in retry_statuses:
+                raise RetryableStatusError(response.status, parse_retry_after(response.headers.get('Retry-After')))
+
+            if response.status >= 400:
+                download_logger.error('Could not download {}: HTTP {}.'.format(target_url, response.status))
+                return {'status': response.status}
+
+            total_size = response.content_length
+
+            if response.status == 206:
+                content_range = response.headers.get('Content-Range', '')
+                range_start, _, range_total = content_range.replace('bytes ', '').partition('/')
+                if int(range_start.split('-')[0] or -1) != offset:
+                    downloader._remove_part(part_filename)
+                    raise IncompleteDownloadError('unexpected Content-Range {}'.format(content_range))
+
+                if downloader._part_changed(part_record, response.headers):
+                    downloader._remove_part(part_filename)
+                    raise IncompleteDownloadError('the network changed since its partial file was started')
+
+                total_size = int(range_total) if range_total not in ('', '*') else None
+            else:
+                # The server ignored the range request, or the network changed, hence the whole file is sent again.
+                offset = 0
+                downloader._write_part_record(part_filename, response.headers.get('ETag'),
+                                              response.headers.get('Last-Modified'))
+
+            checksums = Checksums()
+            if offset:
+                await asyncio.to_thread(checksums.update_from_file, part_filename)
+
+            # A resumed file misses the beginning of the compressed stream, so it is extracted once downloaded.
+            extractor = None
+            if downloader._extract_pool is not None and not offset and is_stream_compressed(out_filename):
+                extractor = StreamExtractor(out_filename)
+
+            def consume(data):
+                checksums.update(data)
+                if extractor is not None:
+                    extractor.feed(data)
+
+            try:
+                with open(part_filename, 'ab' if offset else 'wb', buffering=0) as out_file:
+                    # Disk writes are short next to network waits, so they are left on the event loop, while hashing
+                    # and decompressing chunks run in a thread.
+                    s_time, write_time = time.perf_counter(), 0.0
+                    async for data in response.content.iter_chunked(downloader._max_chunk_size):
+                        await self._throttle(target_url, len(data))
+                        w_time = time.perf_counter()
+                        write_chunk(out_file, data)
+                        write_time += time.perf_counter() - w_time
+                        await asyncio.to_thread(consume, data)
+
+                    size = out_file.tell()
+
+                metrics.add(target_url, 'transfer', time.perf_counter() - s_time, total_bytes=size - offset)
+                metrics.add(target_url, 'write', write_time)
+
+                if total_size is not None and size != total_size:
+                    raise IncompleteDownloadError('got {} of {} bytes'.format(size, total_size))
+
+                if extractor is not None:
+                    await asyncio.to_thread(extractor.close)
+                    if extractor.error is not None:
+                        download_logger.warning('Could not decompress {}: {}'.format(target_url, extractor.error))
+
+            except BaseException:
+                if extractor is not None:
+                    extractor.abort()
+                raise
+
+            return {'status': response.status, 'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'), 'size': size,
+                    'checksums': checksums.hexdigests(), 'extracted': extractor is not None}
+
+    async def _request_slot(self, url):
+        """
+        Waits until the rate limits of the downloader allow a request to an url. The request is reserved at once and
+        waited for on the event loop, so a throttled host ties up neither a thread nor a request slot.
+
+        :param url: The requested url.
+        :return: None.
+        """
+
+        downloader = self._downloader
+        if downloader._rate_limiter is not None:
+            wait = downloader._rate_limiter.reserve_request(url, downloader._rate_limits.get('max_requests_per_sec'))
+            if wait:
+                await asyncio.sleep(wait)
+
+    async def _throttle(self, url, total_bytes):
+        """
+        Waits until bytes received from an url fit the bandwidth limits of the downloader.
+
+        :param url: The url the bytes were received from.
+        :param total_bytes: Number of bytes received.
+        :return: None.
+        """
+
+        downloader = self._downloader
+        if downloader._rate_limiter is not None:
+            wait = downloader._rate_limiter.reserve_transfer(url, total_bytes,
+                                                             downloader._rate_limits.get('max_bytes_per_sec'))
+            if wait:
+                await asyncio.sleep(wait)
+
+
+def client_session(workers=100, max_requests_per_host=4, connect_timeout=10.0, read_timeout=60.0):
+    """
+    Builds the aiohttp session shared by the downloads of a run. Responses are not decompressed, so files are saved
+    exactly as served, like the urllib3 downloader does.
+
+    :param workers: Maximum number of connections open at once.
+    :param max_requests_per_host: Maximum number of connections open to a single host.
+    :param connect_timeout: Seconds to wait for a connection to be established.
+    :param read_timeout: Seconds to wait for data on an established connection.
+    :return: An aiohttp ClientSession.
+    """
+
+    connector = aiohttp.TCPConnector(limit=workers, limit_per_host=max_requests_per_host)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, auto_decompress=False,
+                                 trace_configs=[_connect_trace_config()])
+
+
+def _connect_trace_config():
+    """
+    Builds an aiohttp trace configuration recording in the run metrics how long connecting takes.
+
+    :return: An aiohttp TraceConfig.
+    """
+
+    async def on_request_start(session, context, params):
+        context.host = urllib.parse.urlparse(str(params.url)).netloc
+
+    async def on_connection_create_start(session, context, params):
+        context.connect_time = time.perf_counter()
+
+    async def on_connection_create_end(session, context, params):
+        metrics.connect(context.host, time.perf_counter() - context.connect_time)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_create_start.append(on_connection_create_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    return trace_config
+
+
+@timer_decorator('download networks')
+def download_repositories(downloaders, output_dirs, workers=100, max_requests_per_host=4, connect_timeout=10.0,
+                          read_timeout=60.0, download_options=None):
+    """
+    Downloads one or several repositories on a single event loop. Discovery and downloads of every repository run at
+    once, bounded by workers requests in flight overall and max_requests_per_host connections per host.
+
+    :param downloaders: A dict mapping repository names to NetworkDownloaders.
+    :param output_dirs: A dict mapping repository names to the directories where their files are to be saved.
+    :param workers: Maximum number of requests in flight, across all repositories.
+    :param max_requests_per_host: Maximum number of connections open to a single host.
+    :param connect_timeout: Seconds to wait for a connection to be established.
+    :param read_timeout: Seconds to wait for data on an established connection.
+    :param download_options: A dict mapping repository names to further keyword arguments for
+    AsyncNetworkDownloader.download_networks (sync, extract, ...).
+    :return: None.
+    """
+
+    download_options = download_options if download_options is not None else {}
+    repositories = sorted(downloaders)
+
+    async def discover(async_downloader, repository):
+        try:
+            return await async_downloader.begin_downloads(output_dirs[repository],
+                                                          **download_options.get(repository, {}))
+        except (aiohttp.ClientError, asyncio.TimeoutError, RetryableStatusError) as e:
+            url_getter_logger.error('Could not get urls for {}: {}'.format(repository, e or type(e).__name__))
+            return []
+
+    async def run():
+        semaphore = asyncio.Semaphore(max(1, workers))
+        async with client_session(workers, max_requests_per_host, connect_timeout, read_timeout) as session:
+            async_downloaders = [AsyncNetworkDownloader(downloaders[repository], session, semaphore)
+                                 for repository in repositories]
+            plans = await asyncio.gather(*(discover(async_downloader, repository)
+                                           for async_downloader, repository in zip(async_downloaders, repositories)))
+            try:
+                label = 'Downloading {} networks'.format(repositories[0]) if len(repositories) == 1 else \
+                    'Downloading {} repositories'.format(len(repositories))
+                with click.progressbar(length=sum(len(downloads) for downloads in plans), label=label) as bar:
+                    await asyncio.gather(*(async_downloader.download_all(downloads, bar)
+                                           for async_downloader, downloads in zip(async_downloaders, plans)))
+            finally:
+                for repository in repositories:
+                    downloaders[repository].finish_downloads()
+
+    asyncio.run(run())
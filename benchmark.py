@@ -0,0 +1,881 @@
+"""
+MIT License
+
+Copyright (c) 2017 Daniel N. R. da Silva
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import argparse
+import contextlib
+import hashlib
+import http.server
+import json
+import multiprocessing
+import os
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib3
+
+from bs4 import BeautifulSoup
+from downloader import *
+from manifest import Manifest
+from registry import create_downloader, load_class, repositories
+from scheduler import download_repositories
+from selection import Selection
+
+
+class LocalRepositoryHandler(http.server.BaseHTTPRequestHandler):
+    """
+    This class answers requests sent to a LocalRepository. The index page lists every data file, and every data file
+    is served after the configured latency.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.connections_lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        if self.path in ('/', '/index.html'):
+            body = self.server.index_page
+        elif self.path.startswith('/files/'):
+            time.sleep(self.server.latency)
+            body = self.server.file_body
+        elif self.path == '/large':
+            self._send_large_file()
+            return
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_large_file(self):
+        """
+        Sends a file of the configured large file size by repeating the data file body.
+        """
+
+        block = self.server.file_body
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(self.server.large_file_size))
+        self.end_headers()
+
+        remaining = self.server.large_file_size
+        while remaining:
+            sent = min(remaining, len(block))
+            self.wfile.write(block[:sent] if sent < len(block) else block)
+            remaining -= sent
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class LocalRepository(object):
+    """
+    This class implements a local HTTP stand-in for a network repository serving many small files.
+    """
+
+    def __init__(self, total_files=200, file_size=16 * 1024, latency=0.02, large_file_size=0):
+        """
+        Constructor for LocalRepository.
+
+        :param total_files: Number of data files listed in the index page.
+        :param file_size: Size in bytes of every data file.
+        :param latency: Seconds the server waits before answering a data file request.
+        :param large_file_size: Size in bytes of the file served at /large, which is not listed in the index page.
+        """
+
+        self._server = LocalHTTPServer(('127.0.0.1', 0), LocalRepositoryHandler)
+        self._server.connections = 0
+        self._server.connections_lock = threading.Lock()
+        self._server.latency = latency
+        self._server.large_file_size = large_file_size
+        self._server.file_body = os.urandom(file_size)
+        self._server.index_page = ('<html><body>' +
+                                   ''.join('<a href="files/network{}.txt">network{}</a>'.format(i, i)
+                                           for i in range(total_files)) +
+                                   '</body></html>').encode()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def site_url(self):
+        return 'http://{}:{}/'.format(*self._server.server_address)
+
+    @property
+    def connections(self):
+        """
+        Gets the number of connections accepted so far, i.e., the number of handshakes clients went through.
+
+        :return: The number of accepted connections.
+        """
+
+        return self._server.connections
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class LocalDownloader(NetworkDownloader):
+    """
+    This class implements a downloader for a LocalRepository.
+    """
+
+    def _parse_urls_in_main_page(self, soup: BeautifulSoup):
+        return None
+
+    def _parse_urls(self, soup: BeautifulSoup):
+        return [self._site_url + a.get('href') for a in soup.find_all('a')]
+
+
+class UnpooledLocalDownloader(LocalDownloader):
+    """
+    This class implements a downloader for a LocalRepository building a new connection pool for every request, as
+    the downloader did before connections were shared.
+    """
+
+    @property
+    def http(self):
+        return urllib3.PoolManager()
+
+
+fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def read_repositories_options():
+    """
+    Reads repositories.json.
+
+    :return: A dictionary for the repositories.
+    """
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'repositories.json'), 'r') as in_file:
+        return json.load(in_file)
+
+
+def fixture_repositories(repo_options_dict):
+    """
+    Gets the repositories whose pages are saved in the fixtures directory. DBLP is left out, as its single url is
+    known without fetching any page.
+
+    :param repo_options_dict: A dictionary for the repositories, as read from repositories.json.
+    :return: A sorted list of repository names.
+    """
+
+    return [repo for repo in repositories(repo_options_dict)
+            if os.path.exists(os.path.join(fixtures_dir, repo + '.html'))]
+
+
+def benchmark_concurrency(args):
+    """
+    Measures how long downloading every file of a LocalRepository takes for several worker counts.
+
+    :param args: The parsed arguments.
+    :return: None.
+    """
+
+    print('{:>8} {:>10} {:>12}'.format('workers', 'seconds', 'files/s'))
+    with LocalRepository(args.files, args.size, args.latency) as repository:
+        for workers in args.workers:
+            output_dir = tempfile.mkdtemp()
+            try:
+                downloader = LocalDownloader(repository_name='local', site_url=repository.site_url)
+                urls = downloader.downloadable_urls
+
+                s_time = time.time()
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    downloader.download_networks(output_dir, workers=workers, max_requests_per_host=workers)
+                elapsed = time.time() - s_time
+
+                print('{:>8} {:>10.2f} {:>12.1f}'.format(workers, elapsed, len(urls) / elapsed))
+            finally:
+                shutil.rmtree(output_dir)
+
+
+def benchmark_connections(args):
+    """
+    Compares connections opened and elapsed time when every request builds its own connection pool against a
+    connection pool shared by url discovery and file transfers.
+
+    :param args: The parsed arguments.
+    :return: None.
+    """
+
+    print('{:>10} {:>12} {:>10}'.format('pool', 'connections', 'seconds'))
+    for label, downloader_class in (('unpooled', UnpooledLocalDownloader), ('shared', LocalDownloader)):
+        with LocalRepository(args.files, args.size, latency=0) as repository:
+            output_dir = tempfile.mkdtemp()
+            try:
+                downloader = downloader_class(repository_name='local', site_url=repository.site_url)
+
+                s_time = time.time()
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    downloader.download_networks(output_dir, workers=args.workers, max_requests_per_host=args.workers)
+                elapsed = time.time() - s_time
+
+                print('{:>10} {:>12} {:>10.2f}'.format(label, repository.connections, elapsed))
+            finally:
+                shutil.rmtree(output_dir)
+
+
+def download_with_backend(backend, site_url, workers, result_queue):
+    """
+    Downloads every file of a LocalRepository with a backend and reports the elapsed time and the peak memory use of
+    the process. It runs in its own process, so peak memory use is measured for this backend only.
+
+    :param backend: 'threads' or 'async'.
+    :param site_url: The repository url.
+    :param workers: Number of files downloaded concurrently.
+    :param result_queue: Queue the elapsed seconds, the number of files and the peak RSS in MiB are put into.
+    :return: None.
+    """
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        downloader = LocalDownloader(repository_name='local', site_url=site_url, pool_size=workers)
+        total_files = len(downloader.downloadable_urls)
+
+        s_time = time.time()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            if backend == 'async':
+                from asyncdownloader import download_repositories as download_repositories_async
+                download_repositories_async({'local': downloader}, {'local': output_dir}, workers=workers,
+                                            max_requests_per_host=workers)
+            else:
+                downloader.download_networks(output_dir, workers=workers, max_requests_per_host=workers)
+        elapsed = time.time() - s_time
+
+        result_queue.put((elapsed, total_files, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+    finally:
+        shutil.rmtree(output_dir)
+
+
+def benchmark_backends(args):
+    """
+    Compares the thread backend with the asyncio backend when downloading many small files from a slow server.
+
+    :param args: The parsed arguments.
+    :return: None.
+    """
+
+    print('{:>8} {:>8} {:>10} {:>10} {:>12}'.format('backend', 'workers', 'seconds', 'files/s', 'peak MiB'))
+    with LocalRepository(args.files, args.size, args.latency) as repository:
+        for workers in args.workers:
+            for backend in ('threads', 'async'):
+                result_queue = multiprocessing.Queue()
+                process = multiprocessing.Process(target=download_with_backend,
+                                                  args=(backend, repository.site_url, workers, result_queue))
+                process.start()
+                elapsed, total_files, peak_rss = result_queue.get()
+                process.join()
+
+                print('{:>8} {:>8} {:>10.2f} {:>10.1f} {:>12.1f}'.format(backend, workers, elapsed,
+                                                                         total_files / elapsed, peak_rss))
+
+
+def serve_large_file(size, address_queue, stop_event):
+    """
+    Serves a large file from a LocalRepository until stopped. It runs in its own process, so the server CPU time is
+    not charged to the downloader.
+
+    :param size: Size in bytes of the large file.
+    :param address_queue: Queue the repository url is put into once the server is up.
+    :param stop_event: Event set when the server must stop.
+    :return: None.
+    """
+
+    with LocalRepository(total_files=0, file_size=1024 * 1024, latency=0, large_file_size=size) as repository:
+        address_queue.put(repository.site_url)
+        stop_event.wait()
+
+
+def benchmark_throughput(args):
+    """
+    Measures throughput and CPU time per GiB of a single large file download for several read sizes. The 12 KiB
+    setting reads as the downloader did before reads were adaptive.
+
+    :param args: The parsed arguments.
+    :return: None.
+    """
+
+    settings = (('12 KiB', 12 * 1024, 12 * 1024), ('256 KiB', 256 * 1024, 256 * 1024),
+                ('adaptive', 64 * 1024, 4 * 1024 * 1024))
+    size = args.size * 1024 * 1024
+
+    address_queue, stop_event = multiprocessing.Queue(), multiprocessing.Event()
+    server = multiprocessing.Process(target=serve_large_file, args=(size, address_queue, stop_event), daemon=True)
+    server.start()
+    try:
+        site_url = address_queue.get(timeout=10)
+
+        print('{:>10} {:>10} {:>10} {:>12}'.format('reads', 'seconds', 'MB/s', 'CPU s/GiB'))
+        for label, chunk_size, max_chunk_size in settings:
+            output_dir = tempfile.mkdtemp()
+            try:
+                downloader = LocalDownloader(repository_name='local', site_url=site_url, chunk_size=chunk_size,
+                                             max_chunk_size=max_chunk_size)
+
+                s_time, s_cpu = time.time(), time.process_time()
+                downloader.download_network(os.path.join(output_dir, 'large'), site_url + 'large')
+                elapsed, cpu = time.time() - s_time, time.process_time() - s_cpu
+
+                if os.path.getsize(os.path.join(output_dir, 'large')) != size:
+                    raise AssertionError('Incomplete download with {} reads.'.format(label))
+
+                print('{:>10} {:>10.2f} {:>10.1f} {:>12.2f}'.format(label, elapsed, size / elapsed / 1e6,
+                                                                    cpu / (size / 1024 ** 3)))
+            finally:
+                shutil.rmtree(output_dir)
+
+    finally:
+        stop_event.set()
+        server.join()
+
+
+def benchmark_csr(args):
+    """
+    Compares loading a random edge list from text against converting it once to CSR and loading the CSR.
+
+    :param args: The parsed arguments.
+    :return: None.
+    """
+
+    import numpy as np
+    from csr import convert_to_csr, load_csr
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(output_dir, 'edges.txt')
+        edges = np.random.default_rng(0).integers(0, args.nodes, size=(args.edges, 2))
+        np.savetxt(filename, edges, fmt='%d', delimiter='\t', header='random edge list')
+
+        s_time = time.time()
+        text_edges = np.loadtxt(filename, dtype=np.int64)
+        text_degree_sum = int(np.bincount(text_edges[:, 0]).sum())
+        text_edges[:, 1].sum()
+        text_time = time.time() - s_time
+
+        s_time = time.time()
+        path = convert_to_csr(filename)
+        convert_time = time.time() - s_time
+
+        s_time = time.time()
+        indptr, indices, _ = load_csr(path)
+        csr_degree_sum = int(np.diff(indptr).sum())
+        indices.sum()
+        csr_time = time.time() - s_time
+
+        assert text_degree_sum == csr_degree_sum
+        print('{:>22} {:>10}'.format('step', 'seconds'))
+        print('{:>22} {:>10.3f}'.format('load text', text_time))
+        print('{:>22} {:>10.3f}'.format('convert to csr (once)', convert_time))
+        print('{:>22} {:>10.3f}'.format('load csr', csr_time))
+    finally:
+        shutil.rmtree(output_dir)
+
+
+def benchmark_repositories(args):
+    """
+    Compares downloading several local repositories, one of them slow, one after another against scheduling all of
+    them at once on a shared worker pool.
+
+    :param args: The parsed arguments.
+    :return: None.
+    """
+
+    latencies = [args.slow_latency] + [args.latency] * (args.repositories - 1)
+    with contextlib.ExitStack() as stack:
+        repositories = [stack.enter_context(LocalRepository(args.files, args.size, latency))
+                        for latency in latencies]
+
+        print('{:>12} {:>10}'.format('mode', 'seconds'))
+        for mode in ('sequential', 'scheduled'):
+            output_dir = tempfile.mkdtemp()
+            try:
+                downloaders = {'local{}'.format(i): LocalDownloader(repository_name='local{}'.format(i),
+                                                                    site_url=repository.site_url)
+                               for i, repository in enumerate(repositories)}
+                output_dirs = {name: os.path.join(output_dir, name) for name in downloaders}
+                for path in output_dirs.values():
+                    os.mkdir(path)
+
+                s_time = time.time()
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    if mode == 'sequential':
+                        for name in sorted(downloaders):
+                            downloaders[name].download_networks(output_dirs[name], workers=args.workers,
+                                                                max_requests_per_host=args.host_workers)
+                    else:
+                        download_repositories(downloaders, output_dirs, workers=args.workers,
+                                              max_requests_per_host=args.host_workers)
+                elapsed = time.time() - s_time
+
+                print('{:>12} {:>10.2f}'.format(mode, elapsed))
+            finally:
+                shutil.rmtree(output_dir)
+
+
+def fixture_pages(repository):
+    """
+    Reads the saved pages of a repository from the fixtures directory.
+
+    :param repository: A repository name, as in repositories.json.
+    :return: A tuple (main page, network data page or None), as bytes.
+    """
+
+    with open(os.path.join(fixtures_dir, repository + '.html'), 'rb') as in_file:
+        main_page = in_file.read()
+
+    data_page = None
+    data_page_filename = os.path.join(fixtures_dir, repository + '-dataset.html')
+    if os.path.exists(data_page_filename):
+        with open(data_page_filename, 'rb') as in_file:
+            data_page = in_file.read()
+
+    return main_page, data_page
+
+
+def parse_fixture(downloader, main_page, data_page):
+    """
+    Extracts urls from saved pages the way get_urls does, without fetching anything.
+
+    :param downloader: A NetworkDownloader.
+    :param main_page: The repository main page, as bytes.
+    :param data_page: A network data page, as bytes, used for every data page linked from the main page.
+    :return: A list of urls.
+    """
+
+    urls_from_main_page = downloader._parse_urls_in_main_page(downloader._parse_page(main_page))
+    if urls_from_main_page is None:
+        return downloader._parse_urls(downloader._parse_page(main_page))
+
+    return [url for _ in urls_from_main_page for url in downloader._parse_urls(downloader._parse_page(data_page))]
+
+
+def benchmark_parse(args):
+    """
+    Compares the BeautifulSoup and lxml parsers over the saved pages of every repository, checking both extract the
+    same urls.
+
+    :param args: The parsed arguments.
+    :return: None.
+    """
+
+    repo_options_dict = read_repositories_options()
+
+    print('{:>10} {:>8} {:>10} {:>10} {:>8}'.format('repository', 'urls', 'bs4 ms', 'lxml ms', 'speedup'))
+    for repository in fixture_repositories(repo_options_dict):
+        downloader_class = load_class(repo_options_dict[repository]['class'])
+        main_page, data_page = fixture_pages(repository)
+        timings = {}
+        urls = {}
+        for html_parser in ('bs4', 'lxml'):
+            downloader = downloader_class(repository_name=repository,
+                                          site_url=repo_options_dict[repository]['site_url'], html_parser=html_parser)
+            s_time = time.perf_counter()
+            for _ in range(args.repeat):
+                urls[html_parser] = parse_fixture(downloader, main_page, data_page)
+            timings[html_parser] = (time.perf_counter() - s_time) / args.repeat * 1000
+
+        if urls['bs4'] != urls['lxml']:
+            raise AssertionError('Parsers disagree on {} urls.'.format(repository))
+
+        print('{:>10} {:>8} {:>10.2f} {:>10.2f} {:>7.1f}x'.format(repository, len(urls['lxml']), timings['bs4'],
+                                                                  timings['lxml'], timings['bs4'] / timings['lxml']))
+
+
+class FakeRepositoryHandler(http.server.BaseHTTPRequestHandler):
+    """
+    This class answers requests sent to a FakeRepository. The saved main page is served at the repository url, the
+    saved network data page at every url the main page links to, if the repository has data pages, and a synthetic
+    data file at any other url. Every answer is
+    delayed by the configured latency, and data files are sent at the configured bandwidth.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._answer(send_body=True)
+
+    def do_HEAD(self):
+        self._answer(send_body=False)
+
+    def _answer(self, send_body):
+        time.sleep(self.server.latency)
+
+        if self.path == self.server.main_path:
+            body = self.server.main_page
+        elif self.server.data_page is not None and self.path in self.server.page_paths:
+            body = self._data_page()
+        else:
+            self._send_file(send_body)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _data_page(self):
+        """
+        Gets the saved network data page, with the last path segment of every link prefixed by a hash of the page
+        url, so every data page links to files of its own, as the pages of the actual repository do.
+
+        :return: The page, as bytes.
+        """
+
+        prefix = hashlib.sha1(self.path.encode()).hexdigest()[:8]
+        return re.sub(rb'href="([^"]*/)?([^"/]+)"', lambda match: b'href="' + (match.group(1) or b'') +
+                      prefix.encode() + b'-' + match.group(2) + b'"', self.server.data_page)
+
+    def _send_file(self, send_body):
+        """
+        Sends a synthetic data file, whose size is picked from the configured range by a hash of its url, at the
+        configured bandwidth.
+        """
+
+        min_size, max_size = self.server.file_sizes
+        size = min_size + int(hashlib.sha1(self.path.encode()).hexdigest(), 16) % (max_size - min_size + 1)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        if not send_body:
+            return
+
+        block = self.server.file_body
+        bandwidth = self.server.bandwidth
+        s_time = time.perf_counter()
+        sent = 0
+        while sent < size:
+            length = min(size - sent, len(block))
+            self.wfile.write(block[:length] if length < len(block) else block)
+            sent += length
+            if bandwidth:
+                delay = sent / bandwidth - (time.perf_counter() - s_time)
+                if delay > 0:
+                    time.sleep(delay)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeRepository(object):
+    """
+    This class implements a local HTTP stand-in for an actual repository, replaying its pages saved in the fixtures
+    directory. Absolute links of the pages are rewritten to point to the local server.
+    """
+
+    def __init__(self, repository, site_url, file_sizes=(64 * 1024, 64 * 1024), latency=0.0, bandwidth=0):
+        """
+        Constructor for FakeRepository.
+
+        :param repository: A repository name, with pages saved in the fixtures directory.
+        :param site_url: The actual repository url, whose path and query the saved main page is served at.
+        :param file_sizes: A (minimum, maximum) tuple of the sizes in bytes of the data files.
+        :param latency: Seconds the server waits before answering any request.
+        :param bandwidth: Bytes per second data files are sent at, or 0 for no limit.
+        """
+
+        self._server = LocalHTTPServer(('127.0.0.1', 0), FakeRepositoryHandler)
+        base_url = 'http://{}:{}'.format(*self._server.server_address).encode()
+        main_page, data_page = fixture_pages(repository)
+
+        parsed_site_url = urllib.parse.urlparse(site_url)
+        self._site_url = urllib.parse.urlunparse(('http', base_url.decode()[len('http://'):]) + parsed_site_url[2:])
+        self._server.main_path = parsed_site_url.path + ('?' + parsed_site_url.query if parsed_site_url.query else '')
+        self._server.main_page = re.sub(rb'https?://[A-Za-z0-9.-]+(:[0-9]+)?', base_url, main_page)
+        self._server.data_page = re.sub(rb'https?://[A-Za-z0-9.-]+(:[0-9]+)?', base_url, data_page) \
+            if data_page is not None else None
+        self._server.page_paths = set()
+        for href in re.findall(rb'href="([^"#]+)"', self._server.main_page):
+            page_url = urllib.parse.urlparse(urllib.parse.urljoin(self._site_url, href.decode()))
+            self._server.page_paths.add(page_url.path + ('?' + page_url.query if page_url.query else ''))
+        self._server.file_sizes = file_sizes
+        self._server.file_body = os.urandom(min(file_sizes[1], 1024 * 1024) or 1)
+        self._server.latency = latency
+        self._server.bandwidth = bandwidth
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def site_url(self):
+        return self._site_url
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def serve_fake_repository(repository, site_url, options, address_queue, stop_event):
+    """
+    Serves a FakeRepository until stopped. It runs in its own process, so the server CPU time is not charged to the
+    downloader.
+
+    :param repository: A repository name.
+    :param site_url: The actual repository url.
+    :param options: Further keyword arguments for FakeRepository.
+    :param address_queue: Queue the local repository url is put into once the server is up.
+    :param stop_event: Event set when the server must stop.
+    :return: None.
+    """
+
+    with FakeRepository(repository, site_url, **options) as fake_repository:
+        address_queue.put(fake_repository.site_url)
+        stop_event.wait()
+
+
+def download_fake_repository(repository, site_url, args, result_queue):
+    """
+    Discovers the urls of a FakeRepository and downloads its files, measuring both phases. It runs in its own
+    process, so peak memory use and CPU time are measured for this repository only.
+
+    :param repository: A repository name.
+    :param site_url: The local repository url.
+    :param args: The parsed arguments.
+    :param result_queue: Queue the dict of measures is put into.
+    :return: None.
+    """
+
+    repo_options_dict = read_repositories_options()
+    repo_options_dict[repository] = dict(repo_options_dict[repository], site_url=site_url)
+    downloader = create_downloader(repository, repo_options_dict, pool_size=max(args.workers, args.host_workers))
+
+    s_time, s_cpu = time.perf_counter(), time.process_time()
+    urls = downloader.get_urls()
+    discovery_time = time.perf_counter() - s_time
+
+    # Urls built from fixed hosts by the downloader, rather than read from the pages, cannot be served locally.
+    local_prefix = site_url[:site_url.index('/', len('http://'))]
+    local_urls = [url for url in urls if url.startswith(local_prefix + '/')]
+    selection = Selection(limit=args.limit) if args.limit else None
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        s_time = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            if args.backend == 'async':
+                from asyncdownloader import download_repositories as download_repositories_async
+                download_repositories_async({repository: downloader}, {repository: output_dir}, workers=args.workers,
+                                            max_requests_per_host=args.host_workers,
+                                            download_options={repository: {'urls': local_urls,
+                                                                           'selection': selection}})
+            else:
+                downloader.download_networks(output_dir, workers=args.workers,
+                                             max_requests_per_host=args.host_workers, urls=local_urls,
+                                             selection=selection)
+        download_time = time.perf_counter() - s_time
+
+        downloaded = [entry['size'] for _, entry in Manifest(output_dir).items()]
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        result_queue.put({'repository': repository, 'urls': len(urls), 'skipped_urls': len(urls) - len(local_urls),
+                          'discovery_seconds': discovery_time, 'urls_per_second': len(urls) / discovery_time,
+                          'files': len(downloaded), 'bytes': sum(downloaded), 'download_seconds': download_time,
+                          'mb_per_second': sum(downloaded) / download_time / 1e6,
+                          'files_per_second': len(downloaded) / download_time,
+                          'cpu_seconds': time.process_time() - s_cpu, 'peak_rss_mib': usage.ru_maxrss / 1024})
+    finally:
+        shutil.rmtree(output_dir)
+
+
+def benchmark_end_to_end(args):
+    """
+    Discovers and downloads every repository with saved pages from a FakeRepository, reporting urls per second for
+    discovery, MB/s and files per second for downloads, CPU time and peak memory use. Results may be saved as JSON
+    and compared with the ones of a previous run.
+
+    :param args: The parsed arguments.
+    :return: None.
+    """
+
+    repo_options_dict = read_repositories_options()
+    selected = args.repositories or fixture_repositories(repo_options_dict)
+    options = {'file_sizes': (args.min_size * 1024, max(args.min_size, args.max_size) * 1024),
+               'latency': args.latency, 'bandwidth': int(args.bandwidth * 1024 * 1024)}
+
+    previous = {}
+    if args.compare is not None:
+        with open(args.compare, 'r') as in_file:
+            previous = {result['repository']: result for result in json.load(in_file)['results']}
+
+    columns = ('urls', 'urls/s', 'files', 'MB/s', 'files/s', 'CPU s', 'peak MiB')
+    print(('{:>10}' + ' {:>9}' * len(columns)).format('repository', *columns))
+    results = []
+    for repository in selected:
+        address_queue, stop_event = multiprocessing.Queue(), multiprocessing.Event()
+        server = multiprocessing.Process(target=serve_fake_repository, daemon=True,
+                                         args=(repository, repo_options_dict[repository]['site_url'], options,
+                                               address_queue, stop_event))
+        server.start()
+        try:
+            site_url = address_queue.get(timeout=10)
+            result_queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=download_fake_repository,
+                                              args=(repository, site_url, args, result_queue))
+            process.start()
+            result = result_queue.get()
+            process.join()
+        finally:
+            stop_event.set()
+            server.join()
+
+        results.append(result)
+        values = (result['urls'], result['urls_per_second'], result['files'], result['mb_per_second'],
+                  result['files_per_second'], result['cpu_seconds'], result['peak_rss_mib'])
+        print('{:>10} {:>9} {:>9.1f} {:>9} {:>9.1f} {:>9.1f} {:>9.2f} {:>9.1f}'.format(repository, *values))
+        if repository in previous:
+            before = previous[repository]
+            changes = ['{:+.1f}%'.format((after - before[key]) / before[key] * 100) if before[key] else '-'
+                       for key, after in zip(('urls', 'urls_per_second', 'files', 'mb_per_second', 'files_per_second',
+                                              'cpu_seconds', 'peak_rss_mib'), values)]
+            print(('{:>10}' + ' {:>9}' * len(changes)).format('vs before', *changes))
+        if result['skipped_urls']:
+            print('{:>10} {} urls on fixed hosts not downloaded'.format('', result['skipped_urls']))
+
+    if args.json is not None:
+        with open(args.json, 'w') as out_file:
+            json.dump({'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'options': {key: value for key, value in vars(args).items() if key != 'run'},
+                       'results': results}, out_file, indent=1)
+
+
+def get_args():
+    """
+    Parses the arguments entered by the user.
+
+    :return: The parsed arguments.
+    """
+
+    parser = argparse.ArgumentParser(description='Benchmarks for networks-downloader against a local HTTP server.')
+    subparsers = parser.add_subparsers(dest='benchmark')
+    subparsers.required = True
+
+    concurrency_parser = subparsers.add_parser('concurrency', help='Download many small files with several '
+                                                                   'worker counts.')
+    concurrency_parser.add_argument('-files', type=int, default=200, help='Number of files served.')
+    concurrency_parser.add_argument('-size', type=int, default=16 * 1024, help='Size of every file in bytes.')
+    concurrency_parser.add_argument('-latency', type=float, default=0.02, help='Per-file server latency in seconds.')
+    concurrency_parser.add_argument('-workers', type=int, nargs='+', default=[1, 4, 16], help='Worker counts.')
+    concurrency_parser.set_defaults(run=benchmark_concurrency)
+
+    connections_parser = subparsers.add_parser('connections', help='Count handshakes with and without a shared '
+                                                                   'connection pool.')
+    connections_parser.add_argument('-files', type=int, default=500, help='Number of files served.')
+    connections_parser.add_argument('-size', type=int, default=4 * 1024, help='Size of every file in bytes.')
+    connections_parser.add_argument('-workers', type=int, default=4, help='Worker count.')
+    connections_parser.set_defaults(run=benchmark_connections)
+
+    repositories_parser = subparsers.add_parser('repositories', help='Download several repositories one after '
+                                                                     'another and all at once.')
+    repositories_parser.add_argument('-repositories', type=int, default=6, help='Number of repositories.')
+    repositories_parser.add_argument('-files', type=int, default=40, help='Number of files per repository.')
+    repositories_parser.add_argument('-size', type=int, default=16 * 1024, help='Size of every file in bytes.')
+    repositories_parser.add_argument('-latency', type=float, default=0.05, help='Per-file latency of fast hosts.')
+    repositories_parser.add_argument('-slow_latency', type=float, default=0.1, help='Per-file latency of the slow '
+                                                                                    'host.')
+    repositories_parser.add_argument('-workers', type=int, default=16, help='Worker count.')
+    repositories_parser.add_argument('-host_workers', type=int, default=4, help='Maximum concurrent requests per '
+                                                                                'host.')
+    repositories_parser.set_defaults(run=benchmark_repositories)
+
+    parse_parser = subparsers.add_parser('parse', help='Compare html parsers over the saved pages in fixtures/.')
+    parse_parser.add_argument('-repeat', type=int, default=5, help='Times every page is parsed.')
+    parse_parser.set_defaults(run=benchmark_parse)
+
+    backends_parser = subparsers.add_parser('backends', help='Compare the thread and asyncio backends on many small '
+                                                             'files. The asyncio backend requires aiohttp.')
+    backends_parser.add_argument('-files', type=int, default=2000, help='Number of files served.')
+    backends_parser.add_argument('-size', type=int, default=4 * 1024, help='Size of every file in bytes.')
+    backends_parser.add_argument('-latency', type=float, default=0.2, help='Per-file server latency in seconds.')
+    backends_parser.add_argument('-workers', type=int, nargs='+', default=[64, 512], help='Concurrent transfers.')
+    backends_parser.set_defaults(run=benchmark_backends)
+
+    throughput_parser = subparsers.add_parser('throughput', help='Download a single large file with several read '
+                                                                 'sizes.')
+    throughput_parser.add_argument('-size', type=int, default=1024, help='Size of the file in MiB.')
+    throughput_parser.set_defaults(run=benchmark_throughput)
+
+    end_to_end_parser = subparsers.add_parser('e2e', help='Discover and download every repository with saved pages '
+                                                          'from a local server replaying them.')
+    end_to_end_parser.add_argument('-repositories', nargs='+', default=None,
+                                   help='Repositories to benchmark (default: every one with saved pages).')
+    end_to_end_parser.add_argument('-min_size', type=int, default=64, help='Minimum size of data files in KiB.')
+    end_to_end_parser.add_argument('-max_size', type=int, default=256, help='Maximum size of data files in KiB.')
+    end_to_end_parser.add_argument('-latency', type=float, default=0.01, help='Server latency of every request in '
+                                                                             'seconds.')
+    end_to_end_parser.add_argument('-bandwidth', type=float, default=0, help='Bandwidth of every transfer in MiB/s '
+                                                                           '(default: no limit).')
+    end_to_end_parser.add_argument('-limit', type=int, default=200, help='Maximum number of files downloaded per '
+                                                                         'repository (0 for all).')
+    end_to_end_parser.add_argument('-backend', choices=['threads', 'async'], default='threads', help='Download '
+                                                                                                    'backend.')
+    end_to_end_parser.add_argument('-workers', type=int, default=16, help='Worker count.')
+    end_to_end_parser.add_argument('-host_workers', type=int, default=16, help='Maximum concurrent requests per '
+                                                                               'host.')
+    end_to_end_parser.add_argument('-json', type=str, default=None, help='Saves the results to this JSON file.')
+    end_to_end_parser.add_argument('-compare', type=str, default=None, help='Compares the results with the ones '
+                                                                            'saved by a previous run.')
+    end_to_end_parser.set_defaults(run=benchmark_end_to_end)
+
+    csr_parser = subparsers.add_parser('csr', help='Compare loading an edge list from text and from CSR.')
+    csr_parser.add_argument('-nodes', type=int, default=100000, help='Number of nodes.')
+    csr_parser.add_argument('-edges', type=int, default=2000000, help='Number of edges.')
+    csr_parser.set_defaults(run=benchmark_csr)
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+    args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,317 @@
+"""
+MIT License
+
+Copyright (c) 2017 Daniel N. R. da Silva
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import errno
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+# ioctl request cloning a file on copy-on-write file systems (Btrfs, XFS), see ioctl_ficlone(2).
+FICLONE = 0x40049409
+
+
+def default_cache_dir():
+    """
+    Gets the directory where networks-downloader caches data between runs.
+
+    :return: $XDG_CACHE_HOME/networks-downloader, or ~/.cache/networks-downloader if XDG_CACHE_HOME is not set.
+    """
+
+    return os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+                        'networks-downloader')
+
+
+class URLCache(object):
+    """
+    This class implements an on-disk cache of the urls discovered for a repository, so repeated runs do not fetch
+    and parse the repository pages again while the cached urls are fresh.
+    """
+
+    def __init__(self, cache_dir, ttl):
+        """
+        Constructor for URLCache.
+
+        :param cache_dir: Directory where discovered urls are cached.
+        :param ttl: Seconds during which cached urls are considered fresh.
+        """
+
+        self._cache_dir = os.path.join(cache_dir, 'urls')
+        self._ttl = ttl
+
+    def _path(self, repository_name, page_url):
+        key = hashlib.sha1('{}\n{}'.format(repository_name, page_url).encode()).hexdigest()
+        return os.path.join(self._cache_dir, key + '.json')
+
+    def get(self, repository_name, page_url):
+        """
+        Gets the cached urls discovered in a repository page.
+
+        :param repository_name: A repository name.
+        :param page_url: The repository page url where urls were discovered.
+        :return: A list of urls, or None if there are no fresh cached urls.
+        """
+
+        try:
+            with open(self._path(repository_name, page_url), 'r') as in_file:
+                entry = json.load(in_file)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - entry['time'] > self._ttl:
+            return None
+
+        return entry['urls']
+
+    def put(self, repository_name, page_url, urls):
+        """
+        Caches the urls discovered in a repository page.
+
+        :param repository_name: A repository name.
+        :param page_url: The repository page url where urls were discovered.
+        :param urls: A list of urls.
+        :return: None.
+        """
+
+        os.makedirs(self._cache_dir, exist_ok=True)
+        path = self._path(repository_name, page_url)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'w') as out_file:
+            json.dump({'repository': repository_name, 'url': page_url, 'time': time.time(), 'urls': list(urls)},
+                      out_file)
+        os.replace(tmp_path, path)
+
+
+def clone_file(source, destination):
+    """
+    Makes destination a copy of source without copying its data when the file system allows it: a hard link, or a
+    reflink sharing the data blocks when the files are on different mount points of a copy-on-write file system. Data
+    is only copied when neither is possible.
+
+    :param source: The file name to copy.
+    :param destination: The file name of the copy. It is replaced atomically if it exists.
+    :return: None.
+    """
+
+    tmp_destination = '{}.{}.clone'.format(destination, os.getpid())
+    if os.path.lexists(tmp_destination):
+        os.remove(tmp_destination)
+
+    try:
+        os.link(source, tmp_destination)
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            raise
+        try:
+            import fcntl
+
+            with open(source, 'rb') as in_file, open(tmp_destination, 'wb') as out_file:
+                fcntl.ioctl(out_file.fileno(), FICLONE, in_file.fileno())
+        except (ImportError, OSError):
+            shutil.copyfile(source, tmp_destination)
+
+    os.replace(tmp_destination, destination)
+
+
+class HTTPCache(object):
+    """
+    This class implements an on-disk cache of HTTP responses, i.e., repository pages and network files, which may be
+    shared by every run and user of a machine. A cached response is only served once the server tells it is unchanged,
+    through a conditional request, and cached files are linked into output directories instead of copied. When the
+    cache grows larger than its maximum size, the least recently used responses are evicted.
+
+    Every response is kept as two files named by the SHA-256 of its url: the body, and a JSON record of its size and
+    validators, whose modification time tells when the response was last used. Both are replaced atomically, so
+    several processes may share the cache.
+    """
+
+    def __init__(self, cache_dir, max_size):
+        """
+        Constructor for HTTPCache.
+
+        :param cache_dir: Directory where responses are cached.
+        :param max_size: Maximum size in bytes of the cached bodies.
+        """
+
+        self._cache_dir = os.path.join(cache_dir, 'http')
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._added_size = 0
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self._cache_dir, key[:2], key), os.path.join(self._cache_dir, key[:2], key + '.json')
+
+    def get(self, url):
+        """
+        Gets the record of a cached response and marks it as used.
+
+        :param url: A page or network data url.
+        :return: A dict with the size, etag, last_modified and, for network files, the sha256 and md5 of the cached
+        response, or None if the url is not cached or its body is incomplete.
+        """
+
+        body_path, record_path = self._paths(url)
+        try:
+            with open(record_path, 'r') as in_file:
+                entry = json.load(in_file)
+            if os.path.getsize(body_path) != entry['size']:
+                return None
+            os.utime(record_path)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        return entry
+
+    def read(self, url):
+        """
+        Gets a cached response with its body, and marks it as used.
+
+        :param url: A page url.
+        :return: A (record, body) tuple, as get returns the record and with the body as bytes, or (None, None) if the
+        url is not cached.
+        """
+
+        entry = self.get(url)
+        if entry is None:
+            return None, None
+
+        try:
+            with open(self._paths(url)[0], 'rb') as in_file:
+                data = in_file.read()
+        except OSError:
+            return None, None
+
+        return (entry, data) if len(data) == entry['size'] else (None, None)
+
+    def link(self, url, filename):
+        """
+        Places the body of a cached response at a file name, as a hard link or a reflink when possible.
+
+        :param url: A network data url.
+        :param filename: The file name receiving the body.
+        :return: True if the body was placed, False if it was evicted meanwhile.
+        """
+
+        try:
+            clone_file(self._paths(url)[0], filename)
+        except FileNotFoundError:
+            return False
+
+        return True
+
+    def put(self, url, data, etag=None, last_modified=None):
+        """
+        Caches a response held in memory, e.g., a page.
+
+        :param url: A page url.
+        :param data: The response body, as bytes.
+        :param etag: ETag header sent by the server.
+        :param last_modified: Last-Modified header sent by the server.
+        :return: None.
+        """
+
+        body_path, _ = self._paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        tmp_path = '{}.{}.tmp'.format(body_path, os.getpid())
+        with open(tmp_path, 'wb') as out_file:
+            out_file.write(data)
+        os.replace(tmp_path, body_path)
+        self._write_record(url, {'url': url, 'size': len(data), 'etag': etag, 'last_modified': last_modified})
+
+    def put_file(self, url, filename, etag=None, last_modified=None, sha256=None, md5=None):
+        """
+        Caches a response saved to a file, e.g., a network, by linking the file into the cache. Responses with
+        neither an ETag nor a Last-Modified header are not cached, as they could not be revalidated.
+
+        :param url: A network data url.
+        :param filename: The file name holding the response body.
+        :param etag: ETag header sent by the server.
+        :param last_modified: Last-Modified header sent by the server.
+        :param sha256: SHA-256 hex digest of the body.
+        :param md5: MD5 hex digest of the body.
+        :return: None.
+        """
+
+        if etag is None and last_modified is None:
+            return
+
+        body_path, _ = self._paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        clone_file(filename, body_path)
+        self._write_record(url, {'url': url, 'size': os.path.getsize(body_path), 'etag': etag,
+                                 'last_modified': last_modified, 'sha256': sha256, 'md5': md5})
+
+    def _write_record(self, url, entry):
+        _, record_path = self._paths(url)
+        tmp_path = '{}.{}.tmp'.format(record_path, os.getpid())
+        with open(tmp_path, 'w') as out_file:
+            json.dump(entry, out_file)
+        os.replace(tmp_path, record_path)
+
+        # Evictions scan the whole cache, so they only run once a tenth of its size was added.
+        with self._lock:
+            self._added_size += entry['size']
+            must_evict = self._added_size > self._max_size / 10
+            if must_evict:
+                self._added_size = 0
+        if must_evict:
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used responses until the cached bodies fit the maximum size.
+
+        :return: The number of bytes removed.
+        """
+
+        responses = []
+        for dir_path, _, filenames in os.walk(self._cache_dir):
+            for filename in filenames:
+                if not filename.endswith('.json'):
+                    continue
+                record_path = os.path.join(dir_path, filename)
+                body_path = record_path[:-len('.json')]
+                try:
+                    responses.append((os.path.getmtime(record_path), os.path.getsize(body_path), body_path,
+                                      record_path))
+                except OSError:
+                    continue
+
+        total_size = sum(size for _, size, _, _ in responses)
+        removed_size = 0
+        for _, size, body_path, record_path in sorted(responses):
+            if total_size - removed_size <= self._max_size:
+                break
+            for path in (record_path, body_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            removed_size += size
+
+        return removed_size
@@ -0,0 +1,337 @@
+"""
+MIT License
+
+Copyright (c) 2017 Daniel N. R. da Silva
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import bz2
+import gzip
+import io
+import json
+import lzma
+import os
+import warnings
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from logger import *
+
+chunk_size = 64 * 1024 * 1024
+
+compressed_openers = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+    '.xz': lzma.open
+}
+
+
+def is_edge_list(filename):
+    """
+    Tells whether a file looks like an edge list this module converts, i.e., a SNAP edge list (.txt), a Konect edge
+    list (out.*), a tab separated edge list (.tsv, .edges) or a Matrix Market file (.mtx), possibly compressed.
+
+    :param filename: A file name.
+    :return: True if the file looks like an edge list, False otherwise.
+    """
+
+    basename = os.path.basename(filename)
+    root, extension = os.path.splitext(basename)
+    if extension in compressed_openers:
+        basename, extension = root, os.path.splitext(root)[1]
+
+    return extension in ('.txt', '.tsv', '.edges', '.mtx') or basename.startswith('out.')
+
+
+def csr_path(filename):
+    """
+    Gets the directory where the CSR version of an edge list is written.
+
+    :param filename: An edge list file name.
+    :return: The CSR directory, next to the edge list.
+    """
+
+    return filename + '.csr'
+
+
+def _open(filename):
+    opener = compressed_openers.get(os.path.splitext(filename)[1], open)
+    return opener(filename, 'rb')
+
+
+def _read_header(filename):
+    """
+    Reads the Matrix Market banner and size line, if any, and the first data line of an edge list.
+
+    :param filename: An edge list file name.
+    :return: A tuple (matrix market options or None, number of bytes preceding the data, number of data columns).
+    """
+
+    matrix_market = None
+    offset = 0
+    size_line_pending = False
+    with _open(filename) as in_file:
+        for line in in_file:
+            if offset == 0 and line.startswith(b'%%MatrixMarket'):
+                fields = line.decode().lower().split()
+                if fields[2] != 'coordinate':
+                    raise ValueError('only coordinate Matrix Market files are supported')
+                matrix_market = {'field': fields[3], 'symmetry': fields[4]}
+                size_line_pending = True
+            elif line.startswith((b'%', b'#')) or not line.strip():
+                pass
+            elif size_line_pending:
+                matrix_market['size'] = [int(value) for value in line.split()]
+                size_line_pending = False
+            else:
+                return matrix_market, offset, len(line.split())
+
+            offset += len(line)
+
+    return matrix_market, offset, 0
+
+
+def _read_chunks(in_file, size):
+    """
+    Reads a file in chunks ending at a line boundary.
+
+    :param in_file: A binary file object.
+    :param size: Approximate chunk size in bytes.
+    :return: A generator of chunks.
+    """
+
+    remainder = b''
+    while True:
+        block = in_file.read(size)
+        if not block:
+            if remainder:
+                yield remainder
+            return
+
+        block = remainder + block
+        cut = block.rfind(b'\n') + 1
+        remainder = block[cut:]
+        if cut:
+            yield block[:cut]
+
+
+def _parse_edges(filename, offset, columns, dtype, size, id_shift, symmetric):
+    """
+    Parses an edge list chunk by chunk, so only one chunk is held in memory at a time.
+
+    :param filename: An edge list file name.
+    :param offset: Number of bytes preceding the data.
+    :param columns: Indexes of the columns to parse (source, target and, optionally, weight).
+    :param dtype: Data type the columns are parsed to.
+    :param size: Approximate chunk size in bytes.
+    :param id_shift: Value subtracted from node ids, e.g., 1 for 1-based Matrix Market files.
+    :param symmetric: Whether every off-diagonal entry also stands for its reverse edge.
+    :return: A generator of tuples (sources, targets, weights or None).
+    """
+
+    with _open(filename) as in_file:
+        in_file.read(offset)
+        for block in _read_chunks(in_file, size):
+            # Comment lines are dropped beforehand, since several comment markers make np.loadtxt fall back to a
+            # much slower parser. They are usually found in the first chunk only.
+            if b'#' in block or b'%' in block:
+                block = b'\n'.join(line for line in block.split(b'\n') if not line.lstrip().startswith((b'#', b'%')))
+
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)
+                data = np.loadtxt(io.BytesIO(block), comments=None, usecols=columns, dtype=dtype, ndmin=2)
+
+            if not len(data):
+                continue
+
+            sources = data[:, 0].astype(np.int64) - id_shift
+            targets = data[:, 1].astype(np.int64) - id_shift
+            weights = data[:, 2] if len(columns) > 2 else None
+
+            if symmetric:
+                off_diagonal = sources != targets
+                sources, targets = (np.concatenate((sources, targets[off_diagonal])),
+                                    np.concatenate((targets, sources[off_diagonal])))
+                if weights is not None:
+                    weights = np.concatenate((weights, weights[off_diagonal]))
+
+            yield sources, targets, weights
+
+
+def convert_to_csr(filename, weighted=None, size=chunk_size):
+    """
+    Converts an edge list to a memory-mappable binary CSR made of NumPy files: indptr.npy (int64 offsets),
+    indices.npy (int32 neighbors, or int64 for more than 2^31 - 1 nodes) and, for weighted graphs, weights.npy.
+    The edge list is parsed once, chunk by chunk, counting node degrees while the parsed edges are spilled to a
+    temporary binary file; the spilled edges are then read back in chunks to place every neighbor. Memory use is thus
+    bounded by the number of nodes and the chunk size, not by the number of edges.
+
+    Node ids are kept as they appear in the file, except for Matrix Market files whose 1-based ids are made 0-based.
+
+    :param filename: An edge list file name.
+    :param weighted: Whether the third column holds edge weights; None tells it from the number of columns.
+    :param size: Approximate number of bytes parsed at a time.
+    :return: The CSR directory.
+    """
+
+    matrix_market, offset, total_columns = _read_header(filename)
+    if total_columns < 2:
+        raise ValueError('{} has no edges'.format(filename))
+
+    id_shift = 0
+    symmetric = False
+    if matrix_market is not None:
+        id_shift = 1
+        symmetric = matrix_market['symmetry'] != 'general'
+        if weighted is None:
+            weighted = matrix_market['field'] != 'pattern'
+
+    if weighted is None:
+        weighted = total_columns > 2
+
+    columns = (0, 1, 2) if weighted else (0, 1)
+    dtype = np.float64 if weighted else np.int64
+
+    output_dir = csr_path(filename)
+    os.makedirs(output_dir, exist_ok=True)
+    edges_filename = os.path.join(output_dir, 'edges.tmp')
+    weights_filename = os.path.join(output_dir, 'weights.tmp')
+
+    try:
+        # First pass: node degrees. Parsed edges are spilled in binary, so the text is parsed only once.
+        degrees = np.zeros(0, dtype=np.int64)
+        with open(edges_filename, 'wb') as edges_file, open(weights_filename, 'wb') as weights_file:
+            for sources, targets, chunk_weights in _parse_edges(filename, offset, columns, dtype, size, id_shift,
+                                                                symmetric):
+                if sources.min(initial=0) < 0 or targets.min(initial=0) < 0:
+                    raise ValueError('{} has negative node ids'.format(filename))
+
+                nodes = int(max(sources.max(), targets.max())) + 1
+                if nodes > len(degrees):
+                    degrees = np.concatenate((degrees, np.zeros(nodes - len(degrees), dtype=np.int64)))
+                degrees += np.bincount(sources, minlength=len(degrees))
+
+                np.stack((sources, targets), axis=1).tofile(edges_file)
+                if chunk_weights is not None:
+                    chunk_weights.astype(np.float64).tofile(weights_file)
+
+        if matrix_market is not None:
+            nodes = max(matrix_market['size'][:2])
+            if nodes > len(degrees):
+                degrees = np.concatenate((degrees, np.zeros(nodes - len(degrees), dtype=np.int64)))
+
+        indptr = open_memmap(os.path.join(output_dir, 'indptr.npy'), mode='w+', dtype=np.int64,
+                             shape=(len(degrees) + 1,))
+        indptr[0] = 0
+        np.cumsum(degrees, out=indptr[1:])
+        total_edges = int(indptr[-1])
+        del degrees
+
+        index_dtype = np.int32 if len(indptr) - 1 < np.iinfo(np.int32).max else np.int64
+        indices = open_memmap(os.path.join(output_dir, 'indices.npy'), mode='w+', dtype=index_dtype,
+                              shape=(total_edges,))
+        weights = None
+        if weighted:
+            weights = open_memmap(os.path.join(output_dir, 'weights.npy'), mode='w+', dtype=np.float64,
+                                  shape=(total_edges,))
+
+        # Second pass: every edge is written at its row offset plus the number of edges of its row already placed.
+        if total_edges:
+            spilled_edges = np.memmap(edges_filename, dtype=np.int64, mode='r').reshape(-1, 2)
+            spilled_weights = np.memmap(weights_filename, dtype=np.float64, mode='r') if weighted else None
+            placed = np.zeros(len(indptr) - 1, dtype=np.int64)
+            rows = max(1, size // 16)
+
+            for first in range(0, total_edges, rows):
+                sources = np.array(spilled_edges[first:first + rows, 0])
+                order = np.argsort(sources, kind='stable')
+                sorted_sources = sources[order]
+                row_starts = np.searchsorted(sorted_sources, sorted_sources, side='left')
+                positions = indptr[sorted_sources] + placed[sorted_sources] + (np.arange(len(order)) - row_starts)
+
+                indices[positions] = spilled_edges[first:first + rows, 1][order]
+                if weights is not None:
+                    weights[positions] = spilled_weights[first:first + rows][order]
+
+                placed += np.bincount(sources, minlength=len(placed))
+
+            del spilled_edges, spilled_weights
+
+        for array in (indptr, indices, weights):
+            if array is not None:
+                array.flush()
+
+    finally:
+        for tmp_filename in (edges_filename, weights_filename):
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+
+    with open(os.path.join(output_dir, 'meta.json'), 'w') as out_file:
+        json.dump({'source': os.path.basename(filename), 'nodes': len(indptr) - 1, 'edges': total_edges,
+                   'weighted': weighted, 'format': 'mtx' if matrix_market is not None else 'edgelist'}, out_file)
+
+    return output_dir
+
+
+def load_csr(path):
+    """
+    Loads a CSR written by convert_to_csr without reading it, as memory-mapped arrays.
+
+    :param path: A CSR directory.
+    :return: A tuple (indptr, indices, weights or None).
+    """
+
+    weights_path = os.path.join(path, 'weights.npy')
+    return (np.load(os.path.join(path, 'indptr.npy'), mmap_mode='r'),
+            np.load(os.path.join(path, 'indices.npy'), mmap_mode='r'),
+            np.load(weights_path, mmap_mode='r') if os.path.exists(weights_path) else None)
+
+
+def convert_repository(repository_output_dir):
+    """
+    Converts every edge list of a repository output directory, including extracted archives, to CSR. Edge lists
+    whose CSR is newer than them are skipped, and files that turn out not to be edge lists are logged and left alone.
+
+    :param repository_output_dir: Directory where the repository downloaded files are saved.
+    :return: A list of CSR directories.
+    """
+
+    csr_paths = []
+    for root, dirs, files in os.walk(repository_output_dir):
+        dirs[:] = [d for d in dirs if not d.endswith('.csr')]
+        for name in sorted(files):
+            filename = os.path.join(root, name)
+            if not is_edge_list(filename):
+                continue
+
+            meta_filename = os.path.join(csr_path(filename), 'meta.json')
+            if os.path.exists(meta_filename) and os.path.getmtime(meta_filename) >= os.path.getmtime(filename):
+                csr_paths.append(csr_path(filename))
+                continue
+
+            try:
+                csr_paths.append(convert_to_csr(filename))
+                download_logger.info('Converted {} to CSR.'.format(filename))
+            except (ValueError, OSError, EOFError) as e:
+                download_logger.warning('Could not convert {} to CSR: {}'.format(filename, e))
+
+    return csr_paths
@@ -23,84 +23,1301 @@ SOFTWARE.
 """
 
 
+from __future__ import annotations
 from abc import abstractmethod
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import click
+import collections
+import hashlib
+import http.client
+import json
 import os
+import socket
+import tarfile
+import threading
+import time
+import typing
 import urllib3
 import urllib
+import zipfile
+from extract import StreamExtractor, decompression_errors, extract_archive, is_archive, is_stream_compressed
+from integrity import Checksums, mismatched_checksums, parse_checksums, write_sidecar
 from logger import *
+from manifest import Manifest
+from metrics import metrics
+from retry import FailureQueue, RetryPolicy, parse_retry_after, retry_statuses
+
+# HTML parsers are only imported, by _parse_page, when a repository page is parsed.
+if typing.TYPE_CHECKING:
+    from bs4 import BeautifulSoup
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Progress bars are redrawn at most this often, in seconds, rather than once per chunk.
+progress_interval = 0.1
+
+
+class IncompleteDownloadError(Exception):
+    """
+    Raised when a transfer ends before the whole network data was received.
+    """
+
+
+class ChecksumMismatchError(IncompleteDownloadError):
+    """
+    Raised when downloaded network data does not match the checksum published by the repository.
+    """
+
+
+class CachedCopyEvictedError(IncompleteDownloadError):
+    """
+    Raised when the copy of a network the server found unchanged left the HTTP cache, or the content store, before
+    it could be linked.
+    """
+
+
+class RetryableStatusError(urllib3.exceptions.HTTPError):
+    """
+    Raised when a server answers with a status telling the request may succeed later, e.g., 429 or 503.
+    """
+
+    def __init__(self, status, retry_after=None):
+        """
+        Constructor for RetryableStatusError.
+
+        :param status: The response status.
+        :param retry_after: Seconds the server asked to wait before trying again, or None.
+        """
+
+        super().__init__('HTTP {}'.format(status))
+        self.status = status
+        self.retry_after = retry_after
+
+
+class RangeNotSupportedError(Exception):
+    """
+    Raised when a server answers a range request with something else than the requested range.
+    """
+
+
+def _record_connect(connection, s_time):
+    """
+    Records in the run metrics a connection just established.
+
+    :param connection: A urllib3 connection.
+    :param s_time: time.perf_counter() value when connecting started.
+    :return: None.
+    """
+
+    host = connection.host
+    if connection.port not in (None, connection.default_port):
+        host = '{}:{}'.format(host, connection.port)
+    metrics.connect(host, time.perf_counter() - s_time)
+
+
+def write_chunk(out_file, data):
+    """
+    Writes a whole chunk to an unbuffered file, whose write may only write part of it, e.g., when interrupted by a
+    signal or when the disk is nearly full.
+
+    :param out_file: A file opened with buffering=0.
+    :param data: A bytes-like object.
+    :return: None.
+    """
+
+    data = memoryview(data)
+    while data:
+        data = data[out_file.write(data):]
+
+
+def _http_client_response(request):
+    """
+    Gets the http.client response a urllib3 response reads its body from, if the body can be read from it directly.
+    urllib3 keeps it in the private _fp attribute, so it is only used if it is there and is an http.client response;
+    otherwise, as with any content encoding urllib3 must decode, the body is read through urllib3.
+
+    :param request: A urllib3 response opened with preload_content=False.
+    :return: An http.client.HTTPResponse, or None if the body must be read through urllib3.
+    """
+
+    raw = getattr(request, '_fp', None)
+    if request.headers.get('Content-Encoding') or not isinstance(raw, http.client.HTTPResponse):
+        return None
+
+    return raw
+
+
+class TimedHTTPConnection(urllib3.connection.HTTPConnection):
+    """
+    This class implements an HTTP connection recording in the run metrics how long connecting takes, DNS lookup
+    included.
+    """
+
+    def connect(self):
+        s_time = time.perf_counter()
+        super().connect()
+        _record_connect(self, s_time)
+
+
+class TimedHTTPSConnection(urllib3.connection.HTTPSConnection):
+    """
+    This class implements an HTTPS connection recording in the run metrics how long connecting takes, DNS lookup and
+    TLS handshake included.
+    """
+
+    def connect(self):
+        s_time = time.perf_counter()
+        super().connect()
+        _record_connect(self, s_time)
+
+
+class TimedHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
 
 class NetworkDownloader(object):
     """
     This class implements a network (graphs and respective meta data) downloader.
     """
 
-    def __init__(self, repository_name, site_url):
+    def __init__(self, repository_name, site_url, pool_size=16, connect_timeout=10.0, read_timeout=60.0,
+                 keep_alive=True, crawl_workers=8, resume_attempts=5, url_cache=None, refresh_urls=False,
+                 segments=1, segment_threshold=64 * 1024 * 1024, rate_limiter=None, rate_limits=None,
+                 html_parser='lxml', chunk_size=64 * 1024, max_chunk_size=4 * 1024 * 1024, retry_backoff=1.0,
+                 max_retry_backoff=60.0, store=None, http_cache=None):
         """
         Constructor for NetworkDownloader.
         
         :param repository_name: A repository name.
         :param site_url: A repository url where links to data are located.
+        :param pool_size: Maximum number of connections kept open to a single host.
+        :param connect_timeout: Seconds to wait for a connection to be established.
+        :param read_timeout: Seconds to wait for data on an established connection.
+        :param keep_alive: Whether TCP keep-alive probes are enabled on pooled connections.
+        :param crawl_workers: Number of network data pages fetched and parsed concurrently by get_urls.
+        :param resume_attempts: Number of attempts at fetching a page or a file before giving up. Interrupted
+        transfers are resumed where they stopped.
+        :param url_cache: A URLCache serving urls discovered by previous runs, or None to always discover urls.
+        :param refresh_urls: Whether urls are discovered again even if the cache holds fresh ones.
+        :param segments: Number of byte ranges a large network is split into and fetched in parallel; 1 disables it.
+        :param segment_threshold: Size in bytes above which a network is fetched in several ranges.
+        :param rate_limiter: A RateLimiter, possibly shared with other downloaders, or None for no limits.
+        :param rate_limits: A dict with the 'max_bytes_per_sec' and 'max_requests_per_sec' limits applied to every host
+        this downloader sends requests to, or None for no per-host limits.
+        :param html_parser: 'lxml' to extract links straight from an lxml tree, or 'bs4' to build a BeautifulSoup.
+        :param chunk_size: Size in bytes of the first read of a transfer.
+        :param max_chunk_size: Size in bytes reads grow up to while the connection keeps filling them.
+        :param retry_backoff: Base delay in seconds of the jittered exponential backoff between attempts.
+        :param max_retry_backoff: Maximum delay in seconds between attempts, unless the server sends a Retry-After.
+        :param store: A ContentStore, possibly shared with other downloaders, keeping every distinct file once and
+        linking it into the output directory, or None to save files in the output directory.
+        :param http_cache: An HTTPCache, possibly shared with other downloaders and runs, serving pages and files the
+        server tells are unchanged from disk, or None.
         """
 
         self._repository_name = repository_name
         self._site_url = site_url
         self._headers = {'user-agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:27.0) Gecko/20100101 Firefox/27.0'}
         self._downloadable_urls = []
+        self._max_requests_per_host = 4
+        self._host_semaphores = {}
+        self._host_semaphores_lock = threading.Lock()
+        self._pool_size = pool_size
+        self._timeout = urllib3.Timeout(connect=connect_timeout, read=read_timeout)
+        self._keep_alive = keep_alive
+        self._http = None
+        self._http_lock = threading.Lock()
+        self._crawl_workers = max(1, crawl_workers)
+        self._retry_policy = RetryPolicy(resume_attempts, retry_backoff, max_retry_backoff)
+        self._failures = None
+        self._discovery_incomplete = False
+        self._remote_sizes = {}
+        self._store = store
+        self._http_cache = http_cache
+        self._manifest = None
+        self._sync = False
+        self._url_cache = url_cache
+        self._refresh_urls = refresh_urls
+        self._segments = max(1, segments)
+        self._segment_threshold = segment_threshold
+        self._extract_pool = None
+        self._extract_futures = {}
+        self._rate_limiter = rate_limiter
+        self._rate_limits = rate_limits if rate_limits is not None else {}
+        self._html_parser = html_parser
+        self._chunk_size = max(1, chunk_size)
+        self._max_chunk_size = max(self._chunk_size, max_chunk_size)
+        self._checksums = {}
+
+    @property
+    def http(self):
+        """
+        Gets the connection pool shared by url discovery and file transfers, so connections to a host are reused
+        across requests instead of being handshaken again for every page and file.
+
+        :return: A urllib3 pool manager.
+        """
+
+        with self._http_lock:
+            if self._http is None:
+                socket_options = list(urllib3.connection.HTTPConnection.default_socket_options)
+                if self._keep_alive:
+                    socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+
+                self._http = urllib3.PoolManager(maxsize=self._pool_size, timeout=self._timeout,
+                                                 socket_options=socket_options)
+                self._http.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool,
+                                                     'https': TimedHTTPSConnectionPool}
+
+            return self._http
+
+    def _urlopen(self, method, url, headers=None, **kwargs):
+        """
+        Sends a request through the shared connection pool once the rate limits allow it. Preloaded response bodies
+        count against the bandwidth limits; streamed ones are accounted for chunk by chunk with _throttle.
+
+        :param method: HTTP method.
+        :param url: Requested url.
+        :param headers: Request headers, or None for the downloader default headers.
+        :param kwargs: Further arguments to urllib3 urlopen.
+        :return: A urllib3 response.
+        """
+
+        if self._rate_limiter is not None:
+            self._rate_limiter.request(url, self._rate_limits.get('max_requests_per_sec'))
+
+        s_time = time.perf_counter()
+        request = self.http.urlopen(method, url, headers=headers if headers is not None else self._headers, **kwargs)
+
+        if kwargs.get('preload_content', True):
+            metrics.add(url, 'fetch', time.perf_counter() - s_time, total_bytes=len(request.data), requests=1)
+            self._throttle(url, len(request.data))
+        else:
+            metrics.add(url, 'ttfb', time.perf_counter() - s_time, requests=1)
+
+        return request
+
+    def _throttle(self, url, total_bytes):
+        """
+        Waits until bytes received from an url fit the bandwidth limits.
+
+        :param url: The url the bytes were received from.
+        :param total_bytes: Number of bytes received.
+        :return: None.
+        """
+
+        if self._rate_limiter is not None:
+            self._rate_limiter.transfer(url, total_bytes, self._rate_limits.get('max_bytes_per_sec'))
 
     @property
     def downloadable_urls(self):
-        if not len(self._downloadable_urls):
+        if not len(self._downloadable_urls) and not self._load_cached_urls():
             self.get_urls()
+            self._cache_urls()
 
         return sorted(set(self._downloadable_urls))
 
+    def _load_cached_urls(self):
+        """
+        Takes the urls discovered by a previous run from the url cache, unless they are stale or must be refreshed.
+
+        :return: True if cached urls were loaded, False otherwise.
+        """
+
+        if self._url_cache is None or self._refresh_urls:
+            return False
+
+        cached_urls = self._url_cache.get(self._repository_name, self._site_url)
+        if cached_urls is None:
+            return False
+
+        url_getter_logger.info('Using cached urls for {}.'.format(self._repository_name))
+        self._downloadable_urls = cached_urls
+        return True
+
+    def _cache_urls(self):
+        """
+        Stores the urls just discovered in the url cache.
+
+        :return: None.
+        """
+
+        if self._discovery_incomplete:
+            url_getter_logger.warning('Not caching the urls of {}, as some pages could not be fetched.'.format(
+                self._repository_name))
+        elif self._url_cache is not None and len(self._downloadable_urls):
+            self._url_cache.put(self._repository_name, self._site_url, self._downloadable_urls)
+
     @timer_decorator('download networks')
-    def download_networks(self, repository_output_dir):
+    def download_networks(self, repository_output_dir, workers=1, max_requests_per_host=4, sync=False,
+                          extract=False, extract_workers=None, urls=None, selection=None, shard=None):
         """
-        Downloads networks for a specific data repository.
+        Downloads networks for a specific data repository. Every downloaded network is recorded in the repository
+        manifest, so a later synchronization run only transfers new or changed files.
         
         :param repository_output_dir: Directory where downloaded files are to be saved.
+        :param workers: Number of files downloaded concurrently.
+        :param max_requests_per_host: Maximum number of concurrent requests sent to a single host.
+        :param sync: Whether files already in the manifest are only downloaded again if they changed upstream.
+        :param extract: Whether downloaded archives and compressed files are extracted. Single compressed files are
+        decompressed as they are downloaded, while archives are extracted by a process pool once downloaded.
+        :param extract_workers: Number of processes extracting archives, or None for one per CPU.
+        :param urls: The network data urls to download, e.g., the ones of the failure queue, or None to download
+        every url of the repository.
+        :param selection: A Selection of the networks to download among the urls, or None to download them all.
+        :param shard: A Shard of the selected networks to download, or None to download them all.
+        :return: None.
+        """
+
+        downloads = self.begin_downloads(repository_output_dir, max_requests_per_host=max_requests_per_host, sync=sync,
+                                         extract=extract, extract_workers=extract_workers, urls=urls,
+                                         selection=selection, shard=shard)
+
+        try:
+            if workers <= 1:
+                for out_filename, url in downloads:
+                    with self._host_semaphore(url):
+                        self._download_network(out_filename, url)
+                return
+
+            # Per-file progress bars would garble each other when several files are in flight, so a single bar
+            # counting finished files is shown instead.
+            with click.progressbar(length=len(downloads),
+                                   label='Downloading {} networks'.format(self._repository_name)) as bar:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = [executor.submit(self._download_network_in_host_slot, out_filename, url)
+                               for out_filename, url in downloads]
+
+                    for future in as_completed(futures):
+                        future.result()
+                        bar.update(1)
+
+        finally:
+            self.finish_downloads()
+
+    def begin_downloads(self, repository_output_dir, max_requests_per_host=4, sync=False, extract=False,
+                        extract_workers=None, urls=None, selection=None, shard=None):
+        """
+        Discovers the repository urls and prepares the state shared by its downloads. Together with download_network
+        and finish_downloads, it lets a caller schedule the downloads of several repositories at once.
+
+        :param repository_output_dir: Directory where downloaded files are to be saved.
+        :param max_requests_per_host: Maximum number of concurrent requests sent to a single host.
+        :param sync: Whether files already in the manifest are only downloaded again if they changed upstream.
+        :param extract: Whether downloaded archives and compressed files are extracted.
+        :param extract_workers: Number of processes extracting archives, or None for one per CPU.
+        :param urls: The network data urls to download, or None to download every url of the repository.
+        :param selection: A Selection of the networks to download among the urls, or None to download them all.
+        :param shard: A Shard of the selected networks to download, or None to download them all.
+        :return: A list of (output file name, url) tuples, one per network to be downloaded, in download order.
+        """
+
+        with self._host_semaphores_lock:
+            if self._max_requests_per_host != max(1, max_requests_per_host):
+                self._max_requests_per_host = max(1, max_requests_per_host)
+                self._host_semaphores = {}
+
+        # Names are given among every candidate url, so they do not depend on the selection or the shard.
+        candidate_urls = self.downloadable_urls if urls is None else sorted(set(urls))
+        urls = self.select_urls(selection, candidate_urls, shard)
+        self._manifest = Manifest(repository_output_dir)
+        self._failures = FailureQueue(repository_output_dir)
+        self._sync = sync
+        if extract:
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._extract_pool = ProcessPoolExecutor(max_workers=extract_workers)
+            self._extract_futures = {}
+
+        out_filenames = self._output_filenames(repository_output_dir, candidate_urls)
+        return [(out_filenames[url], url) for url in urls]
+
+    def select_urls(self, selection=None, urls=None, shard=None):
+        """
+        Selects the networks to download. Sizes are only asked to the server, with HEAD requests, if the selection
+        filters or orders networks by size, and only for the urls passing its patterns. A shard is taken out of the
+        selected networks, so every machine selects the same ones before splitting them.
+
+        :param selection: A Selection, or None to select every url.
+        :param urls: The network data urls to select from, or None for every url of the repository.
+        :param shard: A Shard of the selected networks, or None to keep them all.
+        :return: The list of selected urls, in download order.
+        """
+
+        urls = self.downloadable_urls if urls is None else sorted(set(urls))
+        if selection is not None:
+            urls = [url for url in urls if selection.matches(url)]
+            urls = selection.apply(urls, self.get_sizes(urls) if selection.needs_sizes else None)
+
+        if shard is not None:
+            urls = shard.apply(urls)
+
+        return urls
+
+    def get_sizes(self, urls):
+        """
+        Gets the sizes of networks from the Content-Length of HEAD requests, sent concurrently and remembered for the
+        rest of the run.
+
+        :param urls: Network data urls.
+        :return: A dict mapping every url to its size in bytes, or to None if the server does not tell it.
+        """
+
+        def get_size(url):
+            try:
+                with self._host_semaphore(url):
+                    request = self._urlopen('HEAD', url)
+            except urllib3.exceptions.HTTPError as e:
+                url_getter_logger.warning('Could not get the size of {}: {}'.format(url, e))
+                return None
+
+            content_length = request.headers.get('Content-Length')
+            return int(content_length) if request.status == 200 and content_length is not None else None
+
+        missing_urls = [url for url in urls if url not in self._remote_sizes]
+        with ThreadPoolExecutor(max_workers=self._crawl_workers) as executor:
+            self._remote_sizes.update(zip(missing_urls, executor.map(get_size, missing_urls)))
+
+        return {url: self._remote_sizes[url] for url in urls}
+
+    def download_network(self, out_filename, target_url):
+        """
+        Downloads a single network prepared by begin_downloads, without a progress bar of its own. The network holds
+        a slot of its host, so the segments of a segmented transfer only use the slots left free.
+
+        :param out_filename: Network output file name.
+        :param target_url: Network data url.
+        :return: None.
+        """
+
+        self._download_network_in_host_slot(out_filename, target_url)
+
+    def finish_downloads(self):
+        """
+        Saves the manifest and waits for the extractions started by the downloads since begin_downloads.
+
+        :return: None.
+        """
+
+        if self._manifest is not None:
+            self._manifest.save()
+        if self._failures is not None:
+            if len(self._failures):
+                download_logger.warning('{} networks of {} could not be downloaded; run again with -retry_failed to '
+                                        'try them again.'.format(len(self._failures), self._repository_name))
+            self._failures.save()
+        if self._store is not None:
+            self._store.save()
+        if self._http_cache is not None:
+            self._http_cache.evict()
+        if self._extract_pool is not None:
+            self._wait_for_extractions()
+
+    def _wait_for_extractions(self):
+        """
+        Waits for the archives submitted to the extraction pool and shuts the pool down.
+
+        :return: None.
+        """
+
+        for future in as_completed(self._extract_futures):
+            try:
+                future.result()
+            except (tarfile.TarError, zipfile.BadZipFile) + decompression_errors as e:
+                download_logger.error('Could not extract {}: {}'.format(self._extract_futures[future], e))
+
+        self._extract_pool.shutdown()
+        self._extract_pool = None
+        self._extract_futures = {}
+
+    @staticmethod
+    def _output_filename(repository_output_dir, url):
+        """
+        Gets the file name where a network is to be saved.
+
+        :param repository_output_dir: Directory where downloaded files are to be saved.
+        :param url: Network data url.
+        :return: The network output file name.
+        """
+
+        return os.path.join(repository_output_dir, urllib.parse.urlparse(url).path.split('/')[-1])
+
+    def _output_filenames(self, repository_output_dir, urls):
+        """
+        Gets the file names where networks are to be saved, such that no two urls share one. A network keeps the file
+        name recorded in the manifest by a previous run. Otherwise it is saved under the last segment of its url path,
+        unless another url ends the same way: such urls are saved under their last two path segments joined by '_',
+        or under a short hash of the url followed by the last segment if that is not enough either.
+
+        :param repository_output_dir: Directory where downloaded files are to be saved.
+        :param urls: Network data urls.
+        :return: A dict mapping every url to its output file name.
+        """
+
+        manifest = self._manifest if self._manifest is not None else Manifest(repository_output_dir)
+        names = {}
+        for url in urls:
+            entry = manifest.get(url)
+            if entry is not None:
+                names[url] = entry['filename']
+
+        taken = set(entry['filename'] for _, entry in manifest.items())
+        candidates = [lambda url: os.path.basename(self._output_filename(repository_output_dir, url)) or 'index',
+                      lambda url: '_'.join(urllib.parse.urlparse(url).path.strip('/').split('/')[-2:]) or 'index',
+                      lambda url: '{}_{}'.format(hashlib.sha1(url.encode()).hexdigest()[:8], candidates[0](url))]
+
+        for candidate in candidates:
+            unnamed = [url for url in urls if url not in names]
+            counts = collections.Counter(candidate(url) for url in unnamed)
+            for url in unnamed:
+                name = candidate(url)
+                if (counts[name] == 1 or candidate is candidates[-1]) and name not in taken:
+                    names[url] = name
+                    taken.add(name)
+
+        return {url: os.path.join(repository_output_dir, names[url]) for url in urls if url in names}
+
+    def _host_semaphore(self, url):
+        """
+        Gets the semaphore bounding the number of concurrent requests sent to the host of an url.
+
+        :param url: An url.
+        :return: A semaphore shared by all requests to the url host.
+        """
+
+        host = urllib.parse.urlparse(url).netloc
+        with self._host_semaphores_lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(self._max_requests_per_host)
+
+            return self._host_semaphores[host]
+
+    def _download_network_in_host_slot(self, out_filename, target_url):
+        """
+        Downloads a network once its host accepts one more concurrent request.
+
+        :param out_filename: Network output file name.
+        :param target_url: Network data url.
         :return: None.
         """
 
-        for url in self.downloadable_urls:
-            url_out_filename = os.path.join(repository_output_dir, urllib.parse.urlparse(url).path.split('/')[-1])
-            self._download_network(url_out_filename, url)
+        with self._host_semaphore(target_url):
+            self._download_network(out_filename, target_url, show_progress=False)
 
-    def _download_network(self, out_filename, target_url):
+    def _download_network(self, out_filename, target_url, show_progress=True):
         """
-        Downloads a network.
+        Downloads a network. Data is written to a '.part' file which is renamed to the output file name only once it
+        is complete, so an interrupted transfer is resumed from where it stopped instead of starting over.
         
         :param out_filename: Network output file name.
         :param target_url: Network data url.
+        :param show_progress: Whether a progress bar is shown for this file.
+        :return: None.
+        """
+
+        part_filename = out_filename + '.part'
+        validators = self._sync_validators(out_filename, target_url)
+
+        if self._link_stored_checksum(out_filename, target_url):
+            return
+
+        if validators is not None and validators['etag'] is None and validators['last_modified'] is None:
+            if self._is_unchanged(target_url, validators):
+                try:
+                    self._finish_transfer(out_filename, target_url, {'status': 304})
+                    return
+                except CachedCopyEvictedError:
+                    pass
+            validators = None
+
+        error = None
+        for attempt in range(1, self._retry_policy.attempts + 1):
+            try:
+                transfer = False
+                if self._segments > 1 and (os.path.exists(part_filename + '.segments') or
+                                           not os.path.exists(part_filename)):
+                    transfer = self._segmented_transfer(out_filename, target_url, show_progress, validators)
+
+                if transfer is False:
+                    transfer = self._transfer(out_filename, target_url, show_progress, validators)
+
+                if transfer['status'] >= 400:
+                    self._record_failure(target_url, 'HTTP {}'.format(transfer['status']))
+                    return
+
+                self._finish_transfer(out_filename, target_url, transfer)
+                return
+
+            except CachedCopyEvictedError as e:
+                # The copy the server found unchanged is gone, so the network is fetched again without validators.
+                error = e
+                validators = None
+                download_logger.info('{}, downloading {} again.'.format(e, target_url))
+
+            except (urllib3.exceptions.HTTPError, IncompleteDownloadError) as e:
+                error = e
+                metrics.retry(target_url)
+                download_logger.warning('Transfer of {} interrupted ({}/{}): {}'.format(
+                    target_url, attempt, self._retry_policy.attempts, e))
+                self._retry_policy.sleep(attempt, getattr(e, 'retry_after', None))
+
+        self._give_up(target_url, part_filename, error)
+
+    def _give_up(self, target_url, part_filename, error):
+        """
+        Gives up on a network after its last attempt failed, and puts it in the failure queue.
+
+        :param target_url: Network data url.
+        :param part_filename: The partial file of the network.
+        :param error: The error of the last attempt.
+        :return: None.
+        """
+
+        metrics.failure(target_url)
+        if os.path.exists(part_filename):
+            download_logger.error('Giving up on {}, partial data kept in {}.'.format(target_url, part_filename))
+        else:
+            download_logger.error('Giving up on {}.'.format(target_url))
+        self._record_failure(target_url, str(error) or type(error).__name__)
+
+    def _record_failure(self, target_url, error):
+        """
+        Puts a network which could not be downloaded in the failure queue.
+
+        :param target_url: Network data url.
+        :param error: Description of the error.
         :return: None.
         """
 
-        http = urllib3.PoolManager()
-        chunk_size = 12 * 1024
+        if self._failures is not None:
+            self._failures.add(target_url, error)
+
+    def _sync_validators(self, out_filename, target_url):
+        """
+        Gets what is known about a copy of a network already held: its file in a synchronization run, or its content
+        in the content store or the HTTP cache.
+
+        :param out_filename: Network output file name.
+        :param target_url: Network data url.
+        :return: The manifest record of the network if its file is complete, or its content store or HTTP cache record
+        if the file is missing, so the network may be fetched conditionally, or None if it must be downloaded.
+        """
+
+        entry = self._manifest.get(target_url) if self._manifest is not None else None
+        if self._sync and entry is not None and not os.path.exists(out_filename + '.part') and \
+                os.path.exists(out_filename) and os.path.getsize(out_filename) == entry['size']:
+            return entry
+
+        # A network missing from the output directory may be in the content store or the HTTP cache already.
+        if os.path.exists(out_filename) or os.path.exists(out_filename + '.part'):
+            return None
+
+        entry = self._store.lookup(target_url) if self._store is not None else None
+        if entry is None and self._http_cache is not None:
+            entry = self._http_cache.get(target_url)
+
+        return entry
+
+    def _finish_transfer(self, out_filename, target_url, transfer):
+        """
+        Keeps a finished transfer: checks it against the published checksums, renames the partial file, writes the
+        checksum file, submits archives for extraction and records the network in the manifest.
+
+        :param out_filename: Network output file name.
+        :param target_url: Network data url.
+        :param transfer: The dict returned by the transfer.
+        :return: None.
+        """
+
+        part_filename = out_filename + '.part'
+        if self._failures is not None:
+            self._failures.remove(target_url)
+
+        if transfer['status'] == 304:
+            if not os.path.exists(out_filename):
+                # The copy found unchanged is the one of the content store or, failing that, of the HTTP cache, as
+                # the network file is missing.
+                entry = self._store.lookup(target_url) if self._store is not None else None
+                if entry is not None:
+                    self._link_from_store(out_filename, target_url, entry)
+                else:
+                    self._link_from_cache(out_filename, target_url)
+            download_logger.info('{} is up to date.'.format(target_url))
+            return
+
+        mismatches = mismatched_checksums(transfer['checksums'], self._expected_checksums(target_url))
+        if mismatches:
+            self._remove_part(part_filename)
+            raise ChecksumMismatchError('{} mismatch'.format(', '.join(mismatches)))
+
+        os.replace(part_filename, out_filename)
+        if os.path.exists(part_filename + '.json'):
+            os.remove(part_filename + '.json')
+        write_sidecar(out_filename, transfer['checksums']['sha256'])
+        if self._http_cache is not None:
+            self._http_cache.put_file(target_url, out_filename, etag=transfer['etag'],
+                                      last_modified=transfer['last_modified'], sha256=transfer['checksums']['sha256'],
+                                      md5=transfer['checksums']['md5'])
+        if self._store is not None:
+            self._store.add(out_filename, target_url, transfer['checksums']['sha256'], md5=transfer['checksums']['md5'],
+                            size=transfer['size'], etag=transfer['etag'], last_modified=transfer['last_modified'])
+        if self._extract_pool is not None and not transfer.get('extracted') and is_archive(out_filename):
+            self._extract_futures[self._extract_pool.submit(extract_archive, out_filename)] = out_filename
+
+        if self._manifest is not None:
+            self._manifest.record(target_url, os.path.basename(out_filename), transfer['size'],
+                                  etag=transfer['etag'], last_modified=transfer['last_modified'],
+                                  sha256=transfer['checksums']['sha256'], md5=transfer['checksums']['md5'])
+
+    def _link_from_store(self, out_filename, target_url, entry):
+        """
+        Saves a network by linking its content from the content store instead of downloading it.
+
+        :param out_filename: Network output file name.
+        :param target_url: Network data url.
+        :param entry: The content store record of the network content, with at least its sha256.
+        :return: None.
+        """
+
+        try:
+            self._store.link(entry['sha256'], out_filename)
+        except FileNotFoundError:
+            raise CachedCopyEvictedError('the stored copy is missing')
+        self._record_link(out_filename, target_url, entry)
+
+    def _link_from_cache(self, out_filename, target_url):
+        """
+        Saves a network by linking its content from the HTTP cache instead of downloading it.
+
+        :param out_filename: Network output file name.
+        :param target_url: Network data url.
+        :return: None.
+        """
+
+        entry = self._http_cache.get(target_url)
+        if entry is None or not self._http_cache.link(target_url, out_filename):
+            raise CachedCopyEvictedError('the cached copy was evicted')
+
+        if entry.get('sha256') is None:
+            checksums = Checksums()
+            checksums.update_from_file(out_filename)
+            entry.update(checksums.hexdigests())
+        if self._store is not None:
+            self._store.add(out_filename, target_url, entry['sha256'], md5=entry.get('md5'), size=entry['size'],
+                            etag=entry['etag'], last_modified=entry['last_modified'])
+        self._record_link(out_filename, target_url, entry)
+
+    def _record_link(self, out_filename, target_url, entry):
+        """
+        Keeps a network linked from the content store or the HTTP cache: writes the checksum file, submits archives
+        for extraction and records the network in the manifest.
+
+        :param out_filename: Network output file name.
+        :param target_url: Network data url.
+        :param entry: The record of the network content, with at least its sha256.
+        :return: None.
+        """
+
+        write_sidecar(out_filename, entry['sha256'])
+        if self._extract_pool is not None and is_archive(out_filename):
+            self._extract_futures[self._extract_pool.submit(extract_archive, out_filename)] = out_filename
+
+        if self._manifest is not None:
+            self._manifest.record(target_url, os.path.basename(out_filename), os.path.getsize(out_filename),
+                                  etag=entry.get('etag'), last_modified=entry.get('last_modified'),
+                                  sha256=entry['sha256'], md5=entry.get('md5'))
+
+    def _link_stored_checksum(self, out_filename, target_url):
+        """
+        Saves a network whose published sha256 the content store already holds, without any request.
+
+        :param out_filename: Network output file name.
+        :param target_url: Network data url.
+        :return: True if the network was linked from the content store, False if it must be fetched.
+        """
+
+        expected_sha256 = self._expected_checksums(target_url).get('sha256', '').lower()
+        if self._store is None or not expected_sha256 or not self._store.has(expected_sha256) or \
+                os.path.exists(out_filename):
+            return False
+
+        self._link_from_store(out_filename, target_url, {'sha256': expected_sha256})
+        download_logger.info('{} is already in the content store.'.format(target_url))
+        return True
+
+    def _expected_checksums(self, target_url):
+        """
+        Gets the checksums a repository publishes for a network. Downloaders of repositories publishing checksums
+        fill self._checksums, a dict mapping network data urls to dicts of algorithm names ('sha256', 'md5') and hex
+        digests, with _record_published_checksums while parsing pages in _parse_urls; they are only known for urls
+        discovered in the current run.
+
+        :param target_url: Network data url.
+        :return: A dict mapping algorithm names to hex digests, empty if no checksum is known.
+        """
+
+        return self._checksums.get(target_url, {})
+
+    def _record_published_checksums(self, target_url, text):
+        """
+        Records the checksums a repository publishes for a network next to its link.
+
+        :param target_url: Network data url.
+        :param text: The page text describing the network, e.g., the table row of its link.
+        :return: None.
+        """
+
+        checksums = parse_checksums(text)
+        if checksums:
+            self._checksums[target_url] = checksums
+
+    def _is_unchanged(self, target_url, entry):
+        """
+        Compares the size the server announces for a network with the recorded one. It is used for servers sending
+        neither ETag nor Last-Modified headers, for which a conditional request is not possible.
+
+        :param target_url: Network data url.
+        :param entry: The url record in the manifest.
+        :return: True if the network size did not change, False otherwise.
+        """
+
         try:
-            request = http.urlopen('GET', target_url, headers=self._headers, preload_content=False)
-            total_size = int(request.getheaders()['Content-Length'])
+            request = self._urlopen('HEAD', target_url)
+        except urllib3.exceptions.HTTPError:
+            return False
+
+        content_length = request.headers.get('Content-Length')
+        return request.status == 200 and content_length is not None and int(content_length) == entry['size']
+
+    def _segmented_transfer(self, out_filename, target_url, show_progress, validators=None):
+        """
+        Transfers network data as several byte ranges fetched in parallel, each written in place into a preallocated
+        partial file. Progress of every range is kept next to the partial file, so an interrupted transfer resumes each
+        range where it stopped.
+
+        :param out_filename: Network output file name. Data is written to the partial file name derived from it.
+        :param target_url: Network data url.
+        :param show_progress: Whether a progress bar is shown for this file.
+        :param validators: A manifest record whose ETag and Last-Modified tell whether the network changed, or None.
+        :return: The same as _transfer, or False if the server does not support ranges or the network is smaller
+        than the segment threshold, in which case a single stream should be used.
+        """
 
-            with click.progressbar(length=total_size,
+        part_filename = out_filename + '.part'
+        state_filename = part_filename + '.segments'
+
+        head = self._urlopen('HEAD', target_url)
+        size = head.headers.get('Content-Length')
+        size = int(size) if size is not None else None
+        etag = head.headers.get('ETag')
+        last_modified = head.headers.get('Last-Modified')
+
+        if head.status >= 400 or size is None:
+            return False
+
+        if validators is not None and size == validators['size'] and \
+                ((etag is not None and etag == validators['etag']) or
+                 (last_modified is not None and last_modified == validators['last_modified'])):
+            return {'status': 304}
+
+        if head.headers.get('Accept-Ranges', '').lower() != 'bytes' or size < self._segment_threshold:
+            return False
+
+        state = None
+        if os.path.exists(state_filename) and os.path.exists(part_filename):
+            with open(state_filename, 'r') as state_file:
+                state = json.load(state_file)
+
+        if state is None or (state['size'], state['etag'], state['last_modified']) != (size, etag, last_modified):
+            segment_size = -(-size // self._segments)
+            state = {'size': size, 'etag': etag, 'last_modified': last_modified,
+                     'segments': [[start, min(start + segment_size, size), 0]
+                                  for start in range(0, size, segment_size)]}
+
+            with open(part_filename, 'wb') as part_file:
+                part_file.truncate(size)
+            with open(state_filename, 'w') as state_file:
+                json.dump(state, state_file)
+
+        # The network holds one slot of its host already; ranges are only fetched in parallel over the slots left
+        # free, so segments count against the host limit like whole files do.
+        remaining_segments = [segment for segment in state['segments'] if segment[0] + segment[2] < segment[1]]
+        host_semaphore = self._host_semaphore(target_url)
+        extra_slots = 0
+        while extra_slots < len(remaining_segments) - 1 and host_semaphore.acquire(blocking=False):
+            extra_slots += 1
+
+        fd = os.open(part_filename, os.O_WRONLY)
+        bar_lock = threading.Lock()
+        try:
+            with click.progressbar(length=size, hidden=not show_progress,
                                    label='Downloading {}'.format(os.path.basename(out_filename))) as bar:
-                with open(out_filename, 'wb') as out_file:
-                    while True:
-                        data = request.read(chunk_size)
-                        if not data:
-                            break
+                bar.update(sum(done for _, _, done in state['segments']))
+                with ThreadPoolExecutor(max_workers=1 + extra_slots) as executor:
+                    futures = [executor.submit(self._fetch_segment, fd, segment, target_url, bar, bar_lock)
+                               for segment in remaining_segments]
+                    for future in futures:
+                        future.result()
+
+        except RangeNotSupportedError:
+            os.close(fd)
+            fd = None
+            os.remove(part_filename)
+            os.remove(state_filename)
+            return False
+
+        finally:
+            for _ in range(extra_slots):
+                host_semaphore.release()
+            if fd is not None:
+                os.close(fd)
+                if any(start + done < end for start, end, done in state['segments']):
+                    with open(state_filename, 'w') as state_file:
+                        json.dump(state, state_file)
+
+        os.remove(state_filename)
+
+        # Ranges complete out of order, so checksums are computed once the whole file is in place.
+        checksums = Checksums()
+        checksums.update_from_file(part_filename)
+
+        return {'status': 200, 'etag': etag, 'last_modified': last_modified, 'size': size,
+                'checksums': checksums.hexdigests()}
+
+    def _read_chunks(self, request):
+        """
+        Reads a response body into a single reusable buffer. Reads start at the configured chunk size and double, up
+        to the maximum chunk size, while a chunk is read and consumed faster than the progress interval, and halve
+        when that takes over a second, so fast transfers take few large reads while slow or throttled ones keep
+        reporting progress.
+
+        A body without content encoding is read straight from the underlying http.client response, when urllib3
+        exposes it, which fills the buffer in place; urllib3 would read into a new bytes object and copy it into the
+        buffer.
+
+        :param request: A urllib3 response opened with preload_content=False.
+        :return: A generator of memoryviews over the buffer, each valid until the next one is produced.
+        """
+
+        buffer = memoryview(bytearray(self._max_chunk_size))
+        chunk_size = self._chunk_size
+        raw = _http_client_response(request) or request
+
+        while True:
+            started = time.monotonic()
+            try:
+                read = raw.readinto(buffer[:chunk_size])
+            except (http.client.HTTPException, socket.timeout, ConnectionError) as e:
+                raise urllib3.exceptions.ProtocolError('Connection broken: {!r}'.format(e), e)
+
+            if not read:
+                break
+
+            yield buffer[:read]
+            elapsed = time.monotonic() - started
+            if read == chunk_size and elapsed < progress_interval:
+                chunk_size = min(2 * chunk_size, self._max_chunk_size)
+            elif elapsed > 1.0:
+                chunk_size = max(chunk_size // 2, self._chunk_size)
+
+    def _fetch_segment(self, fd, segment, target_url, bar, bar_lock):
+        """
+        Fetches the missing bytes of a range and writes them at their position in the partial file.
 
-                        out_file.write(data)
-                        bar.update(chunk_size)
+        :param fd: Partial output file descriptor.
+        :param segment: A [start, end, done] list describing the range; its done count is updated as data arrives.
+        :param target_url: Network data url.
+        :param bar: The progress bar of the whole file.
+        :param bar_lock: Lock serializing progress bar updates.
+        :return: None.
+        """
 
+        start, end = segment[0], segment[1]
+        headers = dict(self._headers)
+        headers['Range'] = 'bytes={}-{}'.format(start + segment[2], end - 1)
+
+        request = self._urlopen('GET', target_url, headers=headers, preload_content=False)
+        try:
+            # Errors leave the ranges fetched so far in place, so the transfer resumes each range where it stopped.
+            if request.status in retry_statuses:
+                request.drain_conn()
+                raise RetryableStatusError(request.status, parse_retry_after(request.headers.get('Retry-After')))
+
+            if request.status >= 400:
+                request.drain_conn()
+                raise IncompleteDownloadError('HTTP {} on range {}-{}'.format(request.status, start, end - 1))
+
+            if request.status != 206 or \
+                    not request.headers.get('Content-Range', '').startswith('bytes {}-'.format(start + segment[2])):
+                request.close()
+                raise RangeNotSupportedError(target_url)
+
+            progress, last_update = 0, time.monotonic()
+            s_time, write_time, received = time.perf_counter(), 0.0, 0
+            for data in self._read_chunks(request):
+                self._throttle(target_url, len(data))
+                w_time = time.perf_counter()
+                # A write may be short, so it is repeated until the whole chunk is in place.
+                written = 0
+                while written < len(data):
+                    chunk_written = os.pwrite(fd, data[written:], start + segment[2])
+                    segment[2] += chunk_written
+                    written += chunk_written
+                write_time += time.perf_counter() - w_time
+                received += len(data)
+                progress += len(data)
+                if time.monotonic() - last_update >= progress_interval:
+                    with bar_lock:
+                        bar.update(progress)
+                    progress, last_update = 0, time.monotonic()
+
+            with bar_lock:
+                bar.update(progress)
+
+            metrics.add(target_url, 'transfer', time.perf_counter() - s_time, total_bytes=received)
+            metrics.add(target_url, 'write', write_time)
+
+            if start + segment[2] != end:
+                raise IncompleteDownloadError('got {} of {} bytes of range {}-{}'.format(
+                    segment[2], end - start, start, end - 1))
+
+        finally:
             request.release_conn()
 
-        except urllib3.exceptions.RequestError:
-            pass
+    def _resumable_part(self, part_filename):
+        """
+        Gets the partial file of a network to resume. A partial file without the record of the response it was started
+        from cannot be told apart from a partial file of another version of the network, so it is discarded.
+
+        :param part_filename: The partial file of a network.
+        :return: A (size, record) tuple, where the record holds the ETag and Last-Modified headers of the response the
+        partial file was started from, or (0, None) if the network must be transferred from its beginning.
+        """
+
+        offset = os.path.getsize(part_filename) if os.path.exists(part_filename) else 0
+        if not offset:
+            return 0, None
+
+        try:
+            with open(part_filename + '.json', 'r') as record_file:
+                return offset, json.load(record_file)
+        except (OSError, ValueError):
+            self._remove_part(part_filename)
+            return 0, None
+
+    def _write_part_record(self, part_filename, etag, last_modified):
+        """
+        Records the validators of the response a partial file is started from, so a resumed transfer only appends the
+        bytes of the same version of the network.
+
+        :param part_filename: The partial file of a network.
+        :param etag: ETag header sent by the server.
+        :param last_modified: Last-Modified header sent by the server.
+        :return: None.
+        """
+
+        tmp_filename = part_filename + '.json.tmp'
+        with open(tmp_filename, 'w') as record_file:
+            json.dump({'etag': etag, 'last_modified': last_modified}, record_file)
+        os.replace(tmp_filename, part_filename + '.json')
+
+    def _remove_part(self, part_filename):
+        """
+        Removes the partial file of a network and the record of the response it was started from.
+
+        :param part_filename: The partial file of a network.
+        :return: None.
+        """
+
+        for filename in (part_filename, part_filename + '.json'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def _transfer_headers(self, offset, part_record, validators):
+        """
+        Gets the headers of a transfer: a range request for the bytes a partial file misses, valid only if the network
+        did not change since, or a conditional request if a copy of the network is held already.
+
+        :param offset: Size of the partial file.
+        :param part_record: The record of the response the partial file was started from, or None.
+        :param validators: A manifest record whose ETag and Last-Modified make the request conditional, or None.
+        :return: A dict of headers.
+        """
+
+        headers = dict(self._headers)
+        if offset:
+            headers['Range'] = 'bytes={}-'.format(offset)
+            # Weak ETags cannot validate a range, so the date is sent instead.
+            if part_record['etag'] is not None and not part_record['etag'].startswith('W/'):
+                headers['If-Range'] = part_record['etag']
+            elif part_record['last_modified'] is not None:
+                headers['If-Range'] = part_record['last_modified']
+        elif validators is not None:
+            if validators['etag'] is not None:
+                headers['If-None-Match'] = validators['etag']
+            if validators['last_modified'] is not None:
+                headers['If-Modified-Since'] = validators['last_modified']
+
+        return headers
+
+    @staticmethod
+    def _part_changed(part_record, headers):
+        """
+        Tells whether the response resuming a partial file comes from another version of the network, for servers
+        ignoring If-Range.
+
+        :param part_record: The record of the response the partial file was started from.
+        :param headers: The headers of the response resuming the partial file.
+        :return: True if the ETag or the Last-Modified header differs from the recorded one, False otherwise.
+        """
+
+        etag, last_modified = headers.get('ETag'), headers.get('Last-Modified')
+        return (etag is not None and part_record['etag'] is not None and etag != part_record['etag']) or \
+            (last_modified is not None and part_record['last_modified'] is not None and
+             last_modified != part_record['last_modified'])
+
+    def _completed_part(self, part_filename, part_record, content_range):
+        """
+        Checks whether a partial file whose resumption was refused already holds the whole network, as when the
+        process stopped right before renaming it.
+
+        :param part_filename: The partial file of a network.
+        :param part_record: The record of the response the partial file was started from.
+        :param content_range: The Content-Range header of the 416 response, e.g., 'bytes */1024'.
+        :return: The same as _transfer if the partial file is complete, None otherwise.
+        """
+
+        size = os.path.getsize(part_filename)
+        if content_range != 'bytes */{}'.format(size):
+            return None
+
+        checksums = Checksums()
+        checksums.update_from_file(part_filename)
+        return {'status': 200, 'etag': part_record['etag'], 'last_modified': part_record['last_modified'],
+                'size': size, 'checksums': checksums.hexdigests()}
+
+    def _transfer(self, out_filename, target_url, show_progress, validators=None):
+        """
+        Transfers network data into a partial file, asking the server only for the bytes the file still misses.
+
+        :param out_filename: Network output file name. Data is written to the partial file name derived from it.
+        :param target_url: Network data url.
+        :param show_progress: Whether a progress bar is shown for this file.
+        :param validators: A manifest record whose ETag and Last-Modified make the request conditional, or None.
+        :return: A dict with the response status, validators, size and checksums of the partial file once it
+        holds the complete network data, or with the response status only if nothing must be kept.
+        """
+
+        part_filename = out_filename + '.part'
+        offset, part_record = self._resumable_part(part_filename)
+        headers = self._transfer_headers(offset, part_record, validators)
+
+        request = self._urlopen('GET', target_url, headers=headers, preload_content=False)
+        try:
+            if request.status == 304:
+                return {'status': 304}
+
+            if request.status == 416:
+                request.drain_conn()
+                transfer = self._completed_part(part_filename, part_record, request.headers.get('Content-Range'))
+                if transfer is not None:
+                    return transfer
+
+                # The partial file does not fit the remote file anymore, so it is discarded and fetched again.
+                self._remove_part(part_filename)
+                raise IncompleteDownloadError('range {}- not satisfiable'.format(offset))
+
+            if request.status in retry_statuses:
+                request.drain_conn()
+                raise RetryableStatusError(request.status, parse_retry_after(request.headers.get('Retry-After')))
+
+            if request.status >= 400:
+                request.drain_conn()
+                download_logger.error('Could not download {}: HTTP {}.'.format(target_url, request.status))
+                return {'status': request.status}
+
+            total_size = request.headers.get('Content-Length')
+            total_size = int(total_size) if total_size is not None else None
+
+            if request.status == 206:
+                content_range = request.headers.get('Content-Range', '')
+                range_start, _, range_total = content_range.replace('bytes ', '').partition('/')
+                if int(range_start.split('-')[0] or -1) != offset:
+                    request.close()
+                    self._remove_part(part_filename)
+                    raise IncompleteDownloadError('unexpected Content-Range {}'.format(content_range))
+
+                if self._part_changed(part_record, request.headers):
+                    request.close()
+                    self._remove_part(part_filename)
+                    raise IncompleteDownloadError('the network changed since its partial file was started')
+
+                total_size = int(range_total) if range_total not in ('', '*') else None
+            else:
+                # The server ignored the range request, or the network changed, hence the whole file is sent again.
+                offset = 0
+                self._write_part_record(part_filename, request.headers.get('ETag'),
+                                        request.headers.get('Last-Modified'))
+
+            checksums = Checksums()
+            if offset:
+                checksums.update_from_file(part_filename)
+
+            # A resumed file misses the beginning of the compressed stream, so it is extracted once downloaded.
+            extractor = None
+            if self._extract_pool is not None and not offset and is_stream_compressed(out_filename):
+                extractor = StreamExtractor(out_filename)
+
+            try:
+                with click.progressbar(length=total_size, hidden=not show_progress,
+                                       label='Downloading {}'.format(os.path.basename(out_filename))) as bar:
+                    bar.update(offset)
+                    # The file is unbuffered as every write already hands over a whole chunk.
+                    with open(part_filename, 'ab' if offset else 'wb', buffering=0) as out_file:
+                        progress, last_update = 0, time.monotonic()
+                        s_time, write_time = time.perf_counter(), 0.0
+                        for data in self._read_chunks(request):
+                            self._throttle(target_url, len(data))
+                            w_time = time.perf_counter()
+                            write_chunk(out_file, data)
+                            write_time += time.perf_counter() - w_time
+                            checksums.update(data)
+                            if extractor is not None:
+                                extractor.feed(data)
+                            progress += len(data)
+                            if time.monotonic() - last_update >= progress_interval:
+                                bar.update(progress)
+                                progress, last_update = 0, time.monotonic()
+
+                        bar.update(progress)
+                        size = out_file.tell()
+
+                metrics.add(target_url, 'transfer', time.perf_counter() - s_time, total_bytes=size - offset)
+                metrics.add(target_url, 'write', write_time)
+
+                if total_size is not None and size != total_size:
+                    raise IncompleteDownloadError('got {} of {} bytes'.format(size, total_size))
+
+                if extractor is not None:
+                    extractor.close()
+                    if extractor.error is not None:
+                        # Data that cannot be decompressed is still kept, as the remote file may just be misnamed.
+                        download_logger.warning('Could not decompress {}: {}'.format(target_url, extractor.error))
+
+            except BaseException:
+                if extractor is not None:
+                    extractor.abort()
+                raise
+
+            return {'status': request.status, 'etag': request.headers.get('ETag'),
+                    'last_modified': request.headers.get('Last-Modified'), 'size': size,
+                    'checksums': checksums.hexdigests(), 'extracted': extractor is not None}
+
+        finally:
+            request.release_conn()
 
     @abstractmethod
     def _parse_urls_in_main_page(self, soup: BeautifulSoup) -> list:
@@ -115,7 +1332,7 @@ class NetworkDownloader(object):
         print('You must implement this method.')
 
     @abstractmethod
-    def _parse_urls(self, soup: BeautifulSoup):
+    def _parse_urls(self, soup: BeautifulSoup) -> list:
         """
         This function reads a 'souped' page and extract the links to download network data.
         
@@ -125,36 +1342,155 @@ class NetworkDownloader(object):
 
         print('You must implement this method.')
 
+    def _parse_page(self, data):
+        """
+        Parses an html page for _parse_urls_in_main_page and _parse_urls.
+
+        :param data: The html page, as bytes.
+        :return: A BeautifulSoup, or an LxmlPage offering the same link lookups for the 'lxml' parser.
+        """
+
+        if self._html_parser == 'bs4':
+            from bs4 import BeautifulSoup
+
+            return BeautifulSoup(data, 'lxml')
+
+        from htmlparse import LxmlPage
+
+        return LxmlPage.from_html(data)
+
+    def _fetch_page(self, url):
+        """
+        Fetches an html page, trying again with backoff on network errors and on statuses telling the page may be
+        served later.
+
+        :param url: A page url.
+        :return: A urllib3 response with the preloaded page.
+        """
+
+        # Cached pages are small, so they are read before the request and cannot be evicted meanwhile.
+        cached, cached_data = self._http_cache.read(url) if self._http_cache is not None else (None, None)
+        for attempt in range(1, self._retry_policy.attempts + 1):
+            try:
+                with self._host_semaphore(url):
+                    request = self._urlopen('GET', url, headers=self._page_headers(cached))
+                if request.status in retry_statuses:
+                    raise RetryableStatusError(request.status, parse_retry_after(request.headers.get('Retry-After')))
+                return self._cache_page(url, request, cached_data)
+
+            except urllib3.exceptions.LocationValueError:
+                raise
+
+            except urllib3.exceptions.HTTPError as e:
+                if attempt == self._retry_policy.attempts:
+                    raise
+                metrics.retry(url)
+                url_getter_logger.warning('Could not get {} ({}/{}): {}'.format(
+                    url, attempt, self._retry_policy.attempts, e))
+                self._retry_policy.sleep(attempt, getattr(e, 'retry_after', None))
+
+    def _page_headers(self, cached):
+        """
+        Gets the headers of a page request, conditional if the page is cached with validators.
+
+        :param cached: The HTTP cache record of the page, or None.
+        :return: A dict of request headers.
+        """
+
+        headers = dict(self._headers)
+        if cached is not None:
+            if cached['etag'] is not None:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified'] is not None:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        return headers
+
+    def _cache_page(self, url, request, cached_data):
+        """
+        Serves a page from the HTTP cache if the server tells it is unchanged, or caches a page the server sent.
+
+        :param url: A page url.
+        :param request: The urllib3 response to the page request.
+        :param cached_data: The cached page, as bytes, or None if the page is not cached.
+        :return: A urllib3 response with the preloaded page.
+        """
+
+        if self._http_cache is None:
+            return request
+
+        if request.status == 304 and cached_data is not None:
+            url_getter_logger.info('{} is up to date in the HTTP cache.'.format(url))
+            return urllib3.response.HTTPResponse(body=cached_data, headers=request.headers, status=200,
+                                                 preload_content=True)
+
+        etag, last_modified = request.headers.get('ETag'), request.headers.get('Last-Modified')
+        if request.status == 200 and (etag is not None or last_modified is not None):
+            self._http_cache.put(url, request.data, etag=etag, last_modified=last_modified)
+
+        return request
+
+    def _get_urls_in_page(self, url):
+        """
+        Fetches a network data page and parses the links to download network data found there.
+
+        :param url: A network data page url.
+        :return: A list of downloadable networks urls, or an empty list if the page could not be fetched.
+        """
+
+        try:
+            url_request = self._fetch_page(url)
+        except urllib3.exceptions.HTTPError as e:
+            metrics.failure(url)
+            url_getter_logger.error('Could not get {}: {}'.format(url, e))
+            self._discovery_incomplete = True
+            return []
+
+        if url_request.status >= 400:
+            url_getter_logger.warning('Could not get {}: HTTP {}.'.format(url, url_request.status))
+            return []
+
+        s_time = time.perf_counter()
+        urls = self._parse_urls(self._parse_page(url_request.data))
+        metrics.add(url, 'parse', time.perf_counter() - s_time)
+        return urls
+
     def get_urls(self):
         """
-        Gets the urls to data for a specific repository.
+        Gets the urls to data for a specific repository. Network data pages linked from the main page are fetched and
+        parsed concurrently, once each, and their urls are merged without duplicates in the order the pages appear in
+        the main page.
         
         :return: A list of urls
         """
 
+        self._discovery_incomplete = False
         try:
-            http = urllib3.PoolManager()
-            request = http.urlopen('GET', self._site_url, headers=self._headers)
-            soup = BeautifulSoup(request.data, 'lxml')
+            request = self._fetch_page(self._site_url)
+            s_time = time.perf_counter()
+            soup = self._parse_page(request.data)
             urls_from_main_page = self._parse_urls_in_main_page(soup)
+            metrics.add(self._site_url, 'parse', time.perf_counter() - s_time)
 
             if urls_from_main_page is not None:
-                for url in urls_from_main_page:
-                    try:
-                        url_request = http.urlopen('GET', url, headers=self._headers)
-                        soup = BeautifulSoup(url_request.data, 'lxml')
-                        self._parse_urls(soup)
-                    except urllib3.exceptions.RequestError:
-                        pass
+                # Main pages may link a data page several times, e.g., from several categories.
+                with ThreadPoolExecutor(max_workers=self._crawl_workers) as executor:
+                    self._downloadable_urls = list(dict.fromkeys(
+                        url for page_urls in executor.map(self._get_urls_in_page, dict.fromkeys(urls_from_main_page))
+                        for url in page_urls))
             else:
-                self._parse_urls(soup)
+                s_time = time.perf_counter()
+                self._downloadable_urls = list(dict.fromkeys(self._parse_urls(soup)))
+                metrics.add(self._site_url, 'parse', time.perf_counter() - s_time)
 
         except urllib3.exceptions.LocationValueError:
-            self._parse_urls()
+            self._downloadable_urls = self._parse_urls()
 
         except urllib3.exceptions.RequestError:
             raise
 
+        return self._downloadable_urls
+
 
 class CommonCrawlDownloader(NetworkDownloader):
     """
@@ -167,8 +1503,8 @@ class CommonCrawlDownloader(NetworkDownloader):
         return None
 
     def _parse_urls(self, soup: BeautifulSoup):
-        self._downloadable_urls = [a.get('href') for td in soup.findAll('table')
-                                   for a in td.findAll('a') if 'gz' in a.get('href')]
+        return [a.get('href') for td in soup.findAll('table')
+                for a in td.findAll('a') if 'gz' in a.get('href')]
 
 
 class DBLPDownloader(NetworkDownloader):
@@ -181,7 +1517,7 @@ class DBLPDownloader(NetworkDownloader):
         return None
 
     def _parse_urls(self, soup: BeautifulSoup=None):
-        self._downloadable_urls = ['http://kdl.cs.umass.edu/databases/dblp-data.xml.gz']
+        return ['http://kdl.cs.umass.edu/databases/dblp-data.xml.gz']
 
 
 class Dimacs11Downloader(NetworkDownloader):
@@ -202,7 +1538,7 @@ class Dimacs11Downloader(NetworkDownloader):
                     url = '{}://{}/{}'.format(url_parser.scheme, url_parser.netloc, a.get('href'))
                     urls.append(url)
 
-        self._downloadable_urls = urls
+        return urls
 
 
 class Dimacs9Downloader(NetworkDownloader):
@@ -223,7 +1559,7 @@ class Dimacs9Downloader(NetworkDownloader):
                     url = '{}://{}/challenge9/{}'.format(url_parser.scheme, url_parser.netloc, a.get('href'))
                     urls.append(url)
 
-        self._downloadable_urls = urls
+        return urls
 
 
 class DOIDownloader(NetworkDownloader):
@@ -236,8 +1572,8 @@ class DOIDownloader(NetworkDownloader):
         return None
 
     def _parse_urls(self, soup: BeautifulSoup):
-        self._downloadable_urls = ['https://archive.org/compress/doi-urls/formats=' +
-                                   'COMMA-SEPARATED%20VALUES%20GZ&file=/doi-urls.zip']
+        return ['https://archive.org/compress/doi-urls/formats=' +
+                'COMMA-SEPARATED%20VALUES%20GZ&file=/doi-urls.zip']
 
 
 class HetrecDownloader(NetworkDownloader):
@@ -250,8 +1586,8 @@ class HetrecDownloader(NetworkDownloader):
         return None
 
     def _parse_urls(self, soup: BeautifulSoup):
-        self._downloadable_urls = [a.get('href') for a in soup.findAll('a')
-                                   if a is not None and a.get('href') is not None and 'zip' in a.get('href')]
+        return [a.get('href') for a in soup.findAll('a')
+                if a is not None and a.get('href') is not None and 'zip' in a.get('href')]
 
 
 class KoneDownloader(NetworkDownloader):
@@ -264,11 +1600,11 @@ class KoneDownloader(NetworkDownloader):
         return None
 
     def _parse_urls(self, soup: BeautifulSoup):
-        self._downloadable_urls = ['/'.join(self._site_url.split('/')[:-1]) + '/' + a.get('href')
-                                   for table_sorter_child in soup.findAll('table', {'id': 'sort1'})
-                                   for a in table_sorter_child.findAll('a')
-                                   if 'http' not in a.get('href') and '#' not in a.get('href')
-                                   and 'tsv/' in a.get('href')]
+        return ['/'.join(self._site_url.split('/')[:-1]) + '/' + a.get('href')
+                for table_sorter_child in soup.findAll('table', {'id': 'sort1'})
+                for a in table_sorter_child.findAll('a')
+                if 'http' not in a.get('href') and '#' not in a.get('href')
+                and 'tsv/' in a.get('href')]
 
 
 class LALGDownloader(NetworkDownloader):
@@ -283,10 +1619,10 @@ class LALGDownloader(NetworkDownloader):
                 for a in table_sorter_child.findAll('a')]
 
     def _parse_urls(self, soup: BeautifulSoup):
-        self._downloadable_urls += [a.get('href')
-                                    for table_data_set_child in soup.findAll('table', {'class': 'dataset'})
-                                    for a in table_data_set_child.findAll('a')
-                                    ][0:2]
+        return [a.get('href')
+                for table_data_set_child in soup.findAll('table', {'class': 'dataset'})
+                for a in table_data_set_child.findAll('a')
+                ][0:2]
 
 
 class MVLensDownloader(NetworkDownloader):
@@ -299,8 +1635,8 @@ class MVLensDownloader(NetworkDownloader):
         return None
 
     def _parse_urls(self, soup: BeautifulSoup):
-        self._downloadable_urls = [a.get('href') for a in soup.findAll('a')
-                                   if a is not None and a.get('href') is not None and 'zip' in a.get('href')]
+        return [a.get('href') for a in soup.findAll('a')
+                if a is not None and a.get('href') is not None and 'zip' in a.get('href')]
 
 
 class NBERDownloader(NetworkDownloader):
@@ -312,9 +1648,9 @@ class NBERDownloader(NetworkDownloader):
         return None
 
     def _parse_urls(self, soup: BeautifulSoup):
-        self._downloadable_urls = ['/'.join(self._site_url.split('/')[:-2]) + a.get('href')
-                                   for table_sorter_child in soup.findAll('table')
-                                   for a in table_sorter_child.findAll('a') if 'zip' in a.get('href')]
+        return ['/'.join(self._site_url.split('/')[:-2]) + a.get('href')
+                for table_sorter_child in soup.findAll('table')
+                for a in table_sorter_child.findAll('a') if 'zip' in a.get('href')]
 
 
 class NetworkRepositoryDownloader(NetworkDownloader):
@@ -327,8 +1663,8 @@ class NetworkRepositoryDownloader(NetworkDownloader):
         return None
 
     def _parse_urls(self, soup: BeautifulSoup):
-        self._downloadable_urls = [link.get('href')
-                                   for link in soup.table.findAll('a') if 'php' not in link.get('href')]
+        return [link.get('href')
+                for link in soup.table.findAll('a') if 'php' not in link.get('href')]
 
 
 class SmallDownloader(NetworkDownloader):
@@ -341,8 +1677,8 @@ class SmallDownloader(NetworkDownloader):
         return None
 
     def _parse_urls(self, soup: BeautifulSoup):
-        self._downloadable_urls = [self._site_url + a.get('href') for ul in soup.findAll('ul', limit=1)
-                                   for a in ul.findAll('a') if 'zip' in a.get('href')]
+        return [self._site_url + a.get('href') for ul in soup.findAll('ul', limit=1)
+                for a in ul.findAll('a') if 'zip' in a.get('href')]
 
 
 class SNAPDownloader(NetworkDownloader):
@@ -360,9 +1696,17 @@ class SNAPDownloader(NetworkDownloader):
                 if 'http' not in a.get('href') and '#' not in a.get('href')]
 
     def _parse_urls(self, soup: BeautifulSoup):
-        self._downloadable_urls += ['/'.join(self._site_url.split('/')[:-1]) + '/' + a.get('href').replace('../data/', '')
-                                    for table_data_set_child in soup.findAll('table', {'id': 'datatab'})
-                                    for a in table_data_set_child.findAll('a')]
+        urls = []
+        for table_data_set_child in soup.findAll('table', {'id': 'datatab'}):
+            for row in table_data_set_child.findAll('tr'):
+                # Every row describes one file, so the checksums found anywhere in the row are the file ones.
+                row_urls = ['/'.join(self._site_url.split('/')[:-1]) + '/' + a.get('href').replace('../data/', '')
+                            for a in row.findAll('a')]
+                if len(row_urls) == 1:
+                    self._record_published_checksums(row_urls[0], row.get_text())
+                urls.extend(row_urls)
+
+        return urls
 
 
 class SparseMatrixDownloader(NetworkDownloader):
@@ -375,8 +1719,16 @@ class SparseMatrixDownloader(NetworkDownloader):
         return None
 
     def _parse_urls(self, soup: BeautifulSoup):
-        self._downloadable_urls = ['/'.join(self._site_url.split('/')[:-2]) + a.get('href').replace('..', '')
-                                   for table_sorter_child in soup.findAll('table')
-                                   for a in table_sorter_child.findAll('a')
-                                   if '/MM/' in a.get('href')]
+        urls = []
+        for table_sorter_child in soup.findAll('table'):
+            for cell in table_sorter_child.findAll('td'):
+                # A row links the MAT, MM and RB formats of a matrix, so only the checksums in the cell of the MM
+                # link are its ones.
+                cell_urls = ['/'.join(self._site_url.split('/')[:-2]) + a.get('href').replace('..', '')
+                             for a in cell.findAll('a') if '/MM/' in a.get('href')]
+                if len(cell_urls) == 1:
+                    self._record_published_checksums(cell_urls[0], cell.get_text())
+                urls.extend(cell_urls)
+
+        return urls
 
@@ -0,0 +1,178 @@
+"""
+MIT License
+
+Copyright (c) 2017 Daniel N. R. da Silva
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import bz2
+import lzma
+import os
+import tarfile
+import zipfile
+import zlib
+
+tar_extensions = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+stream_decompressors = {
+    '.gz': lambda: zlib.decompressobj(zlib.MAX_WBITS | 16),
+    '.bz2': bz2.BZ2Decompressor,
+    '.xz': lzma.LZMADecompressor
+}
+
+
+def is_archive(filename):
+    """
+    Tells whether a file is an archive or a compressed file that can be extracted.
+
+    :param filename: A file name.
+    :return: True if the file can be extracted, False otherwise.
+    """
+
+    return filename.endswith(tar_extensions) or filename.endswith('.zip') or is_stream_compressed(filename)
+
+
+def is_stream_compressed(filename):
+    """
+    Tells whether a file is a single compressed file (not an archive) that can be decompressed as it is downloaded.
+
+    :param filename: A file name.
+    :return: True if the file can be decompressed as a stream, False otherwise.
+    """
+
+    return not filename.endswith(tar_extensions) and os.path.splitext(filename)[1] in stream_decompressors
+
+
+def extract_archive(filename):
+    """
+    Extracts an archive into the directory where it is located, or decompresses a single compressed file next to it.
+    This function runs in worker processes, so it must only take and return picklable values.
+
+    :param filename: An archive or compressed file name.
+    :return: The archive file name.
+    """
+
+    output_dir = os.path.dirname(filename)
+
+    if filename.endswith(tar_extensions):
+        with tarfile.open(filename, 'r:*') as archive:
+            if hasattr(tarfile, 'data_filter'):
+                archive.extractall(output_dir, filter='data')
+            else:
+                archive.extractall(output_dir)
+
+    elif filename.endswith('.zip'):
+        with zipfile.ZipFile(filename) as archive:
+            archive.extractall(output_dir)
+
+    else:
+        extractor = StreamExtractor(filename)
+        try:
+            with open(filename, 'rb') as in_file:
+                for data in iter(lambda: in_file.read(1024 * 1024), b''):
+                    extractor.feed(data)
+            extractor.close()
+        except BaseException:
+            extractor.abort()
+            raise
+
+        if extractor.error is not None:
+            raise extractor.error
+
+    return filename
+
+
+decompression_errors = (zlib.error, EOFError, OSError, lzma.LZMAError)
+
+
+class StreamExtractor(object):
+    """
+    This class implements a decompressor fed with the bytes of a compressed file as they are downloaded, so the
+    decompressed file is ready as soon as the download ends and the compressed file is never read back. If the bytes
+    cannot be decompressed, the decompressed data is discarded and the error is kept in the error attribute.
+    """
+
+    def __init__(self, filename):
+        """
+        Constructor for StreamExtractor.
+
+        :param filename: Compressed file name. The decompressed file is written next to it, without its extension.
+        """
+
+        self._extension = os.path.splitext(filename)[1]
+        self._out_filename = os.path.splitext(filename)[0]
+        self._part_filename = self._out_filename + '.part'
+        self._decompressor = stream_decompressors[self._extension]()
+        self._out_file = open(self._part_filename, 'wb')
+        self.error = None
+
+    def feed(self, data):
+        """
+        Decompresses a chunk of the compressed file.
+
+        :param data: Compressed bytes following the ones fed so far.
+        :return: None.
+        """
+
+        while data and self.error is None:
+            try:
+                decompressed_data = self._decompressor.decompress(data)
+            except decompression_errors as e:
+                self.error = e
+                self.abort()
+                return
+
+            self._out_file.write(decompressed_data)
+
+            # Concatenated streams (e.g., multi-member gzip files) start over with a new decompressor.
+            if not self._decompressor.eof:
+                break
+
+            data = self._decompressor.unused_data
+            self._decompressor = stream_decompressors[self._extension]()
+
+    def close(self):
+        """
+        Finishes the decompressed file.
+
+        :return: None.
+        """
+
+        if self.error is not None:
+            return
+
+        if hasattr(self._decompressor, 'flush'):
+            self._out_file.write(self._decompressor.flush())
+
+        self._out_file.close()
+        os.replace(self._part_filename, self._out_filename)
+
+    def abort(self):
+        """
+        Discards the decompressed data written so far.
+
+        :return: None.
+        """
+
+        if not self._out_file.closed:
+            self._out_file.close()
+        if os.path.exists(self._part_filename):
+            os.remove(self._part_filename)
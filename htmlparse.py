@@ -0,0 +1,140 @@
+"""
+MIT License
+
+Copyright (c) 2017 Daniel N. R. da Silva
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import lxml.etree
+import lxml.html
+
+
+class LxmlPage(object):
+    """
+    This class implements a lightweight, read-only stand-in for the parts of a BeautifulSoup tree the downloaders use
+    to extract links: findAll/find_all with tag names, attribute filters and limits, attribute access with get, text
+    with get_text and first-descendant access such as page.table. It wraps an lxml element directly, so pages are
+    parsed by libxml2 without building a tree of Python objects, and only the elements a downloader asks for are ever
+    wrapped.
+    """
+
+    __slots__ = ('_element',)
+
+    def __init__(self, element):
+        """
+        Constructor for LxmlPage.
+
+        :param element: An lxml element.
+        """
+
+        self._element = element
+
+    @classmethod
+    def from_html(cls, data):
+        """
+        Parses an html page.
+
+        :param data: The html page, as bytes.
+        :return: An LxmlPage wrapping the page root element, an empty html element if the page is empty.
+        """
+
+        try:
+            return cls(lxml.html.document_fromstring(data))
+        except lxml.etree.ParserError:
+            # lxml refuses empty documents, which BeautifulSoup parses as a page without any element.
+            return cls(lxml.html.Element('html'))
+
+    def _matches(self, element, attrs):
+        for key, value in attrs.items():
+            element_value = element.get(key)
+            if element_value is None:
+                return False
+
+            # As with BeautifulSoup, classes are matched one by one, so {'class': 'x'} matches class="x y".
+            if key == 'class':
+                if value not in element_value.split():
+                    return False
+            elif element_value != value:
+                return False
+
+        return True
+
+    def findAll(self, name=None, attrs=None, limit=None):
+        """
+        Finds the descendants of this element with a tag name and attributes.
+
+        :param name: A tag name, or None for any tag.
+        :param attrs: A dict of attribute values the descendants must have, or None.
+        :param limit: Maximum number of descendants returned, or None for all of them.
+        :return: A list of LxmlPage, in document order.
+        """
+
+        found = []
+        for element in self._element.iterdescendants(name):
+            if attrs and not self._matches(element, attrs):
+                continue
+
+            found.append(LxmlPage(element))
+            if limit is not None and len(found) >= limit:
+                break
+
+        return found
+
+    find_all = findAll
+
+    def find(self, name=None, attrs=None):
+        """
+        Finds the first descendant of this element with a tag name and attributes.
+
+        :param name: A tag name, or None for any tag.
+        :param attrs: A dict of attribute values the descendant must have, or None.
+        :return: An LxmlPage, or None if there is no such descendant.
+        """
+
+        found = self.findAll(name, attrs, limit=1)
+        return found[0] if found else None
+
+    def get(self, key, default=None):
+        """
+        Gets an attribute value of this element.
+
+        :param key: An attribute name.
+        :param default: Value returned if the element has no such attribute.
+        :return: The attribute value. As with BeautifulSoup, the class attribute is returned as a list of classes.
+        """
+
+        value = self._element.get(key)
+        if value is None:
+            return default
+
+        return value.split() if key == 'class' else value
+
+    def get_text(self):
+        """
+        Gets the text of this element and of its descendants.
+
+        :return: The text, as a string.
+        """
+
+        return self._element.text_content()
+
+    def __getattr__(self, name):
+        return self.find(name)
@@ -0,0 +1,208 @@
+"""
+MIT License
+
+Copyright (c) 2017 Daniel N. R. da Silva
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import click
+import hashlib
+import os
+import re
+from logger import *
+from manifest import Manifest
+
+checksum_algorithms = ('sha256', 'md5')
+
+
+class Checksums(object):
+    """
+    This class implements the checksums of a file computed incrementally, as its bytes are written, so the file is
+    never read again to checksum it.
+    """
+
+    def __init__(self, algorithms=checksum_algorithms):
+        """
+        Constructor for Checksums.
+
+        :param algorithms: Names of the hashlib algorithms computed.
+        """
+
+        self._hashes = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+
+    def update(self, data):
+        """
+        Feeds the bytes following the ones fed so far to every checksum.
+
+        :param data: A bytes-like object.
+        :return: None.
+        """
+
+        for hash_object in self._hashes.values():
+            hash_object.update(data)
+
+    def update_from_file(self, filename):
+        """
+        Feeds the whole content of a file to every checksum.
+
+        :param filename: A file name.
+        :return: None.
+        """
+
+        with open(filename, 'rb') as in_file:
+            for data in iter(lambda: in_file.read(1024 * 1024), b''):
+                self.update(data)
+
+    def hexdigests(self):
+        """
+        Gets the checksums of the bytes fed so far.
+
+        :return: A dict mapping every algorithm to its hex digest.
+        """
+
+        return {algorithm: hash_object.hexdigest() for algorithm, hash_object in self._hashes.items()}
+
+
+def mismatched_checksums(checksums, expected_checksums):
+    """
+    Compares computed checksums with expected ones, e.g., checksums published by a repository.
+
+    :param checksums: A dict mapping algorithms to computed hex digests.
+    :param expected_checksums: A dict mapping algorithms to expected hex digests. Algorithms which were not computed
+    are ignored.
+    :return: A list with the algorithms whose digests differ.
+    """
+
+    return [algorithm for algorithm, digest in expected_checksums.items()
+            if algorithm in checksums and digest.lower() != checksums[algorithm]]
+
+
+def parse_checksums(text):
+    """
+    Finds the hex digests in a text, such as the description of a file on a repository page. A 64-digit digest is
+    taken as SHA-256 and a 32-digit one as MD5.
+
+    :param text: A text.
+    :return: A dict mapping algorithms to the lower case hex digests, without the algorithms whose digest is missing
+    or ambiguous.
+    """
+
+    found = {}
+    for digest in re.findall(r'(?<![0-9A-Fa-f])(?:[0-9A-Fa-f]{64}|[0-9A-Fa-f]{32})(?![0-9A-Fa-f])', text):
+        found.setdefault('sha256' if len(digest) == 64 else 'md5', set()).add(digest.lower())
+
+    return {algorithm: digests.pop() for algorithm, digests in found.items() if len(digests) == 1}
+
+
+def sidecar_path(filename):
+    """
+    Gets the name of the file holding the SHA-256 checksum of a downloaded file.
+
+    :param filename: A downloaded file name.
+    :return: The checksum file name, next to the downloaded file.
+    """
+
+    return filename + '.sha256'
+
+
+def write_sidecar(filename, sha256):
+    """
+    Writes the SHA-256 checksum of a downloaded file next to it, in the format read by 'sha256sum -c'.
+
+    :param filename: A downloaded file name.
+    :param sha256: The file SHA-256 hex digest.
+    :return: None.
+    """
+
+    with open(sidecar_path(filename), 'w') as out_file:
+        out_file.write('{}  {}\n'.format(sha256, os.path.basename(filename)))
+
+
+def read_sidecar(filename):
+    """
+    Reads the SHA-256 checksum written next to a downloaded file.
+
+    :param filename: A downloaded file name.
+    :return: The SHA-256 hex digest, or None if there is no checksum file.
+    """
+
+    try:
+        with open(sidecar_path(filename), 'r') as in_file:
+            return in_file.read().split()[0]
+    except (OSError, IndexError):
+        return None
+
+
+def hash_file(filename, algorithms=checksum_algorithms):
+    """
+    Computes the checksums of a file. This function runs in worker processes, so it must only take and return
+    picklable values.
+
+    :param filename: A file name.
+    :param algorithms: Names of the hashlib algorithms computed.
+    :return: A dict mapping every algorithm to its hex digest.
+    """
+
+    checksums = Checksums(algorithms)
+    checksums.update_from_file(filename)
+    return checksums.hexdigests()
+
+
+@timer_decorator('verify networks')
+def verify_repository(repository_output_dir, workers=None):
+    """
+    Checksums every file recorded in the manifest of a repository output directory again, spreading files over
+    processes, and compares sizes and checksums with the recorded ones. Files recorded without a checksum are
+    compared with their checksum file, if any.
+
+    :param repository_output_dir: Directory where the repository downloaded files are saved.
+    :param workers: Number of processes checksumming files; None uses every core.
+    :return: A list of (file name, problem) tuples, empty if every file is intact.
+    """
+
+    problems = []
+    expected = {}
+    for url, entry in Manifest(repository_output_dir).items():
+        filename = os.path.join(repository_output_dir, entry['filename'])
+        if not os.path.exists(filename):
+            problems.append((filename, 'missing'))
+        elif os.path.getsize(filename) != entry['size']:
+            problems.append((filename, 'size is {} instead of {}'.format(os.path.getsize(filename), entry['size'])))
+        else:
+            checksums = {algorithm: entry.get(algorithm) for algorithm in checksum_algorithms if entry.get(algorithm)}
+            if not checksums and read_sidecar(filename) is not None:
+                checksums = {'sha256': read_sidecar(filename)}
+            if checksums:
+                expected[filename] = checksums
+            else:
+                download_logger.warning('{} has no recorded checksum.'.format(filename))
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {filename: executor.submit(hash_file, filename, tuple(checksums))
+                   for filename, checksums in expected.items()}
+        with click.progressbar(futures.items(), label='Verifying {}'.format(repository_output_dir)) as bar:
+            for filename, future in bar:
+                for algorithm in mismatched_checksums(future.result(), expected[filename]):
+                    problems.append((filename, '{} mismatch'.format(algorithm)))
+
+    return problems
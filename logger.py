@@ -26,6 +26,7 @@ SOFTWARE.
 from functools import wraps
 import logging
 import time
+from metrics import metrics
 
 time_logger = logging.getLogger('TIMER')
 time_logger.setLevel(logging.INFO)
@@ -45,6 +46,7 @@ def timer_decorator(log_msg):
             result = f(*args, **kwargs)
             f_time = time.time()
             logging.getLogger('TIMER').info('It took {:.2f}s to {}.'.format(f_time - s_time, log_msg))
+            metrics.run_phase(log_msg, f_time - s_time)
             return result
         return wrapper
     return timing
@@ -0,0 +1,115 @@
+"""
+MIT License
+
+Copyright (c) 2017 Daniel N. R. da Silva
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import json
+import os
+import threading
+
+
+class Manifest(object):
+    """
+    This class implements a persistent record of the networks downloaded from a repository. It is kept as a JSON file
+    in the repository output directory and maps every network data url to the file it was saved to, together with
+    the file size, checksum and the validators (ETag and Last-Modified) sent by the server.
+    """
+
+    filename = '.manifest.json'
+
+    def __init__(self, repository_output_dir):
+        """
+        Constructor for Manifest.
+
+        :param repository_output_dir: Directory where the repository downloaded files are saved.
+        """
+
+        self._path = os.path.join(repository_output_dir, self.filename)
+        self._lock = threading.Lock()
+        self._entries = {}
+
+        if os.path.exists(self._path):
+            with open(self._path, 'r') as in_file:
+                self._entries = json.load(in_file)
+
+    def __contains__(self, url):
+        with self._lock:
+            return url in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, url):
+        """
+        Gets the record of a network data url.
+
+        :param url: A network data url.
+        :return: A dict with the url record, or None if the url was never downloaded.
+        """
+
+        with self._lock:
+            entry = self._entries.get(url)
+            return dict(entry) if entry is not None else None
+
+    def items(self):
+        """
+        Gets every record of the manifest.
+
+        :return: A list of (url, record) tuples.
+        """
+
+        with self._lock:
+            return [(url, dict(entry)) for url, entry in self._entries.items()]
+
+    def record(self, url, filename, size, etag=None, last_modified=None, sha256=None, md5=None):
+        """
+        Records a downloaded network.
+
+        :param url: Network data url.
+        :param filename: Name of the file, relative to the repository output directory, where the network was saved.
+        :param size: File size in bytes.
+        :param etag: ETag header sent by the server.
+        :param last_modified: Last-Modified header sent by the server.
+        :param sha256: SHA-256 hex digest of the file.
+        :param md5: MD5 hex digest of the file.
+        :return: None.
+        """
+
+        with self._lock:
+            self._entries[url] = {'filename': filename, 'size': size, 'etag': etag,
+                                  'last_modified': last_modified, 'sha256': sha256, 'md5': md5}
+
+    def save(self):
+        """
+        Writes the manifest to disk. The file is replaced atomically, so an interrupted run never leaves a truncated
+        manifest behind.
+
+        :return: None.
+        """
+
+        with self._lock:
+            tmp_path = self._path + '.tmp'
+            with open(tmp_path, 'w') as out_file:
+                json.dump(self._entries, out_file, indent=1, sort_keys=True)
+            os.replace(tmp_path, self._path)
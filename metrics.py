@@ -0,0 +1,278 @@
+"""
+MIT License
+
+Copyright (c) 2017 Daniel N. R. da Silva
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import json
+import threading
+import urllib.parse
+
+
+class Metrics(object):
+    """
+    This class implements a collector of performance metrics: time spent per phase of a run, and bytes, requests,
+    retries, failures and time spent per phase (connect, ttfb, fetch, transfer, write, parse) for every url and host.
+    Collection is off until enabled, and then costs a dict update under a lock per event.
+    """
+
+    url_phases = ('ttfb', 'fetch', 'transfer', 'write', 'parse')
+
+    def __init__(self):
+        """
+        Constructor for Metrics.
+        """
+
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._urls = {}
+        self._connects = {}
+        self._run_phases = {}
+
+    def enable(self):
+        """
+        Starts collecting metrics.
+
+        :return: None.
+        """
+
+        self.enabled = True
+
+    def _url_record(self, url):
+        record = self._urls.get(url)
+        if record is None:
+            record = self._urls[url] = {'host': urllib.parse.urlparse(url).netloc, 'bytes': 0, 'requests': 0,
+                                        'retries': 0, 'failures': 0, 'seconds': dict.fromkeys(self.url_phases, 0.0)}
+        return record
+
+    def add(self, url, phase=None, seconds=0.0, total_bytes=0, requests=0):
+        """
+        Records time spent on an url and the bytes received from it.
+
+        :param url: An url.
+        :param phase: One of url_phases, or None if no time is recorded.
+        :param seconds: Seconds spent in the phase.
+        :param total_bytes: Number of bytes received.
+        :param requests: Number of requests sent.
+        :return: None.
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            record = self._url_record(url)
+            if phase is not None:
+                record['seconds'][phase] += seconds
+            record['bytes'] += total_bytes
+            record['requests'] += requests
+
+    def connect(self, host, seconds):
+        """
+        Records a connection established to a host, DNS lookup and TLS handshake included.
+
+        :param host: The host, as found in urls (host name, and port unless it is the default one).
+        :param seconds: Seconds taken to connect.
+        :return: None.
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            connections, total_seconds = self._connects.get(host, (0, 0.0))
+            self._connects[host] = (connections + 1, total_seconds + seconds)
+
+    def retry(self, url):
+        """
+        Records an interrupted transfer of an url that is tried again.
+
+        :param url: An url.
+        :return: None.
+        """
+
+        if self.enabled:
+            with self._lock:
+                self._url_record(url)['retries'] += 1
+
+    def failure(self, url):
+        """
+        Records an url given up on.
+
+        :param url: An url.
+        :return: None.
+        """
+
+        if self.enabled:
+            with self._lock:
+                self._url_record(url)['failures'] += 1
+
+    def run_phase(self, name, seconds):
+        """
+        Records the time spent in a phase of the run, e.g., downloading the networks of a repository.
+
+        :param name: The phase name.
+        :param seconds: Seconds spent in the phase.
+        :return: None.
+        """
+
+        if self.enabled:
+            with self._lock:
+                self._run_phases[name] = self._run_phases.get(name, 0.0) + seconds
+
+    def url_records(self):
+        """
+        Gets the metrics of every url.
+
+        :return: A list of dicts with the url, its host, bytes, requests, retries, failures, seconds per phase, total
+        seconds and transfer throughput in bytes per second.
+        """
+
+        with self._lock:
+            records = [dict(record, url=url, seconds=dict(record['seconds'])) for url, record in self._urls.items()]
+
+        for record in records:
+            record['total_seconds'] = sum(record['seconds'].values())
+            transfer_seconds = record['seconds']['transfer'] + record['seconds']['fetch']
+            record['bytes_per_sec'] = record['bytes'] / transfer_seconds if transfer_seconds else None
+
+        return records
+
+    def host_records(self):
+        """
+        Gets the metrics of every host, i.e., the sum of the metrics of its urls and its connections.
+
+        :return: A list of dicts with the host, number of urls, connections, bytes, requests, retries, failures,
+        seconds per phase (connect included), total seconds and transfer throughput in bytes per second.
+        """
+
+        hosts = {}
+        for record in self.url_records():
+            host = hosts.setdefault(record['host'], {'host': record['host'], 'urls': 0, 'connections': 0, 'bytes': 0,
+                                                     'requests': 0, 'retries': 0, 'failures': 0,
+                                                     'seconds': dict.fromkeys(('connect',) + self.url_phases, 0.0)})
+            host['urls'] += 1
+            for key in ('bytes', 'requests', 'retries', 'failures'):
+                host[key] += record[key]
+            for phase, seconds in record['seconds'].items():
+                host['seconds'][phase] += seconds
+
+        with self._lock:
+            connects = dict(self._connects)
+
+        for name, (connections, seconds) in connects.items():
+            if name in hosts:
+                hosts[name]['connections'] = connections
+                hosts[name]['seconds']['connect'] = seconds
+
+        for host in hosts.values():
+            host['total_seconds'] = sum(host['seconds'].values())
+            transfer_seconds = host['seconds']['transfer'] + host['seconds']['fetch']
+            host['bytes_per_sec'] = host['bytes'] / transfer_seconds if transfer_seconds else None
+
+        return list(hosts.values())
+
+    def run_phases(self):
+        """
+        Gets the time spent in every phase of the run.
+
+        :return: A dict mapping phase names to seconds.
+        """
+
+        with self._lock:
+            return dict(self._run_phases)
+
+    def write_json_lines(self, path):
+        """
+        Writes the metrics as JSON lines: one object per run phase, host and url, told apart by their 'type' key.
+
+        :param path: Output file name.
+        :return: None.
+        """
+
+        with open(path, 'w') as out_file:
+            for name, seconds in sorted(self.run_phases().items()):
+                out_file.write(json.dumps({'type': 'phase', 'phase': name, 'seconds': seconds}) + '\n')
+            for record in sorted(self.host_records(), key=lambda record: record['host']):
+                out_file.write(json.dumps(dict(record, type='host'), sort_keys=True) + '\n')
+            for record in sorted(self.url_records(), key=lambda record: record['url']):
+                out_file.write(json.dumps(dict(record, type='url'), sort_keys=True) + '\n')
+
+    def write_prometheus(self, path):
+        """
+        Writes the metrics in the Prometheus text format. Metrics are labeled by host and phase only, as one series
+        per url would be too many.
+
+        :param path: Output file name.
+        :return: None.
+        """
+
+        lines = ['# TYPE networks_downloader_run_seconds gauge']
+        lines += ['networks_downloader_run_seconds{{phase="{}"}} {}'.format(name, seconds)
+                  for name, seconds in sorted(self.run_phases().items())]
+
+        hosts = sorted(self.host_records(), key=lambda record: record['host'])
+        for key in ('urls', 'connections', 'bytes', 'requests', 'retries', 'failures'):
+            lines.append('# TYPE networks_downloader_{}_total counter'.format(key))
+            lines += ['networks_downloader_{}_total{{host="{}"}} {}'.format(key, host['host'], host[key])
+                      for host in hosts]
+
+        lines.append('# TYPE networks_downloader_seconds_total counter')
+        lines += ['networks_downloader_seconds_total{{host="{}",phase="{}"}} {}'.format(host['host'], phase, seconds)
+                  for host in hosts for phase, seconds in sorted(host['seconds'].items())]
+
+        with open(path, 'w') as out_file:
+            out_file.write('\n'.join(lines) + '\n')
+
+    def summary(self, top=10):
+        """
+        Formats a table of the slowest hosts and files.
+
+        :param top: Number of hosts and of files listed.
+        :return: The table, as a string.
+        """
+
+        def rate(bytes_per_sec):
+            return '{:.2f}'.format(bytes_per_sec / 1024 ** 2) if bytes_per_sec is not None else '-'
+
+        lines = ['{:<40} {:>6} {:>8} {:>8} {:>8} {:>10} {:>8} {:>8}'.format(
+            'slowest hosts', 'urls', 'retries', 'failed', 'connect', 'ttfb+fetch', 'parse', 'MiB/s')]
+        for host in sorted(self.host_records(), key=lambda record: -record['total_seconds'])[:top]:
+            lines.append('{:<40} {:>6} {:>8} {:>8} {:>8.2f} {:>10.2f} {:>8.2f} {:>8}'.format(
+                host['host'][:40], host['urls'], host['retries'], host['failures'], host['seconds']['connect'],
+                host['seconds']['ttfb'] + host['seconds']['fetch'], host['seconds']['parse'],
+                rate(host['bytes_per_sec'])))
+
+        lines.append('')
+        lines.append('{:<60} {:>8} {:>8} {:>8} {:>8} {:>8}'.format(
+            'slowest files', 'MiB', 'ttfb', 'transfer', 'write', 'MiB/s'))
+        files = [record for record in self.url_records() if record['seconds']['transfer']]
+        for record in sorted(files, key=lambda record: -record['total_seconds'])[:top]:
+            lines.append('{:<60} {:>8.2f} {:>8.2f} {:>8.2f} {:>8.2f} {:>8}'.format(
+                record['url'][-60:], record['bytes'] / 1024 ** 2, record['seconds']['ttfb'],
+                record['seconds']['transfer'], record['seconds']['write'], rate(record['bytes_per_sec'])))
+
+        return '\n'.join(lines)
+
+
+# Metrics of the whole run, shared by every downloader.
+metrics = Metrics()
@@ -23,11 +23,21 @@ SOFTWARE.
 """
 
 
+from concurrent.futures import ThreadPoolExecutor
 import argparse
 import json
+import os
 import sys
 
-from downloader import *
+from cache import HTTPCache, URLCache, default_cache_dir
+from logger import *
+from metrics import metrics
+from ratelimit import RateLimiter
+from registry import create_downloader, repositories
+from retry import FailureQueue
+from selection import Selection, orders
+from shard import Shard, manifest_sizes, merge_shards, parse_shard
+from store import ContentStore
 
 
 if sys.version_info[0] < 3:
@@ -60,60 +70,177 @@ def get_args(repositories_options_dict):
                         ),
                         required=True)
 
-    return parser.parse_args()
-
-
-def main():
-
-    with open('repositories.json', 'r') as in_file:
-        repo_options_dict = json.load(in_file)
-
-    downloaders_dict = {
-        'ccrawl':       CommonCrawlDownloader(repository_name='ccrawl',
-                                              site_url=repo_options_dict['ccrawl']['site_url']),
-
-        'dblp':         DBLPDownloader(repository_name='dblp',
-                                       site_url=repo_options_dict['dblp']['site_url']),
+    parser.add_argument('-workers', type=int, default=1,
+                        help='Number of files downloaded concurrently (default: 1).')
+    parser.add_argument('-backend', choices=['threads', 'async'], default='threads',
+                        help='Download with a thread per file (threads) or on a single asyncio event loop (async), '
+                             'which scales to many more concurrent transfers. The async backend requires aiohttp and '
+                             'does not split files into -segments (default: threads).')
+    parser.add_argument('-async_workers', type=int, default=100,
+                        help='Number of requests in flight with the async backend (default: 100).')
+    parser.add_argument('-host_workers', type=int, default=4,
+                        help='Maximum number of concurrent requests sent to a single host (default: 4).')
+    parser.add_argument('-pool_size', type=int, default=16,
+                        help='Maximum number of connections kept open to a single host (default: 16).')
+    parser.add_argument('-timeout', type=float, default=60.0,
+                        help='Seconds to wait for a connection or for data before giving up (default: 60).')
+    parser.add_argument('-include', nargs='+', default=None,
+                        help='Only downloads files whose url matches one of these patterns. Glob patterns (e.g., '
+                             '"*.mtx.gz") match the whole url; patterns starting with "re:" are regular expressions '
+                             'searched in the url.')
+    parser.add_argument('-exclude', nargs='+', default=None,
+                        help='Skips files whose url matches one of these patterns, written as for -include.')
+    parser.add_argument('-max_size', type=float, default=None,
+                        help='Skips files larger than this size in MiB, as told by HEAD requests. Files whose size '
+                             'the server does not tell are kept.')
+    parser.add_argument('-order', choices=orders, default='name',
+                        help='Downloads files in url order (name), or smallest or largest first, as told by HEAD '
+                             'requests (default: name).')
+    parser.add_argument('-limit', type=int, default=None,
+                        help='Downloads at most this number of files per repository, after -order.')
+    parser.add_argument('-dry_run', '--dry-run', action='store_true',
+                        help='Lists the files which would be downloaded, with their sizes and the total size, '
+                             'instead of downloading them.')
+    parser.add_argument('-shard', '--shard', type=str, default=None,
+                        help='Only downloads the i-th of N disjoint shards of every repository, given as i/N (e.g., '
+                             '2/4), so N machines can mirror a repository without talking to each other.')
+    parser.add_argument('-shard_sizes', '--shard-sizes', type=str, default=None,
+                        help='Output directory of a previous merged run, the same on every machine, whose manifests '
+                             'give the sizes used to spread the largest files evenly among the -shard shards.')
+    parser.add_argument('-merge_shards', '--merge-shards', nargs='+', default=None,
+                        help='Merges the manifests and failure queues of the shards downloaded to these output '
+                             'directories into the ones of -odir, instead of downloading.')
+    parser.add_argument('-retries', type=int, default=5,
+                        help='Number of attempts at fetching a page or a file before giving up (default: 5).')
+    parser.add_argument('-retry_backoff', type=float, default=1.0,
+                        help='Base delay in seconds between attempts; it doubles after every failed attempt, with '
+                             'random jitter, unless the server sends a Retry-After header (default: 1).')
+    parser.add_argument('-max_retry_backoff', type=float, default=60.0,
+                        help='Maximum delay in seconds between attempts (default: 60).')
+    parser.add_argument('-retry_failed', '--retry-failed', action='store_true',
+                        help='Only downloads the files which could not be downloaded by previous runs, as recorded '
+                             'in the failure queue of every repository.')
+    parser.add_argument('-segments', type=int, default=1,
+                        help='Number of byte ranges fetched in parallel for files larger than -segment_threshold, when '
+                             'the server supports ranges (default: 1, i.e., a single stream).')
+    parser.add_argument('-segment_threshold', type=float, default=64,
+                        help='Size in MiB above which a file is fetched in several byte ranges (default: 64).')
+    parser.add_argument('-chunk_size', type=int, default=64,
+                        help='Size in KiB of the first read of a transfer (default: 64).')
+    parser.add_argument('-max_chunk_size', type=int, default=4096,
+                        help='Size in KiB reads grow up to on fast connections (default: 4096).')
+    parser.add_argument('-extract', action='store_true',
+                        help='Extracts downloaded archives of every repository. Extraction is otherwise enabled per '
+                             'repository with the "extract" option in repositories.json.')
+    parser.add_argument('-csr', action='store_true',
+                        help='Converts downloaded edge lists (SNAP, Konect, Matrix Market) to a memory-mappable binary '
+                             'CSR written next to them. Requires NumPy.')
+    parser.add_argument('-max_rate', type=float, default=None,
+                        help='Global bandwidth limit in MiB/s, shared by every download (default: no limit).')
+    parser.add_argument('-max_rps', type=float, default=None,
+                        help='Global limit of requests per second (default: no limit). Per-host limits are set with '
+                             'the "max_bytes_per_sec" and "max_requests_per_sec" options in repositories.json.')
+    parser.add_argument('-html_parser', choices=['lxml', 'bs4'], default='lxml',
+                        help='Parser used to extract urls from repository pages (default: lxml).')
+    parser.add_argument('-metrics', type=str, default=None,
+                        help='Collects connect, time to first byte, transfer, write and parse times, bytes, retries '
+                             'and failures per url and host, writes them to this file and prints the slowest hosts '
+                             'and files.')
+    parser.add_argument('-metrics_format', choices=['jsonl', 'prometheus'], default='jsonl',
+                        help='Format of the -metrics file: JSON lines, or the Prometheus text format (default: jsonl).')
+    parser.add_argument('-verify', '--verify', action='store_true',
+                        help='Checksums the files already downloaded again and compares them with the manifest, '
+                             'instead of downloading.')
+    parser.add_argument('-verify_workers', type=int, default=None,
+                        help='Number of processes checksumming files with -verify (default: one per core).')
+    parser.add_argument('-sync', '--sync', action='store_true',
+                        help='Only downloads files which are new or changed since the last run.')
+    parser.add_argument('-url_ttl', type=float, default=24.0,
+                        help='Hours during which urls discovered by a previous run are reused (default: 24, 0 disables '
+                             'the cache).')
+    parser.add_argument('-refresh_urls', '--refresh-urls', action='store_true',
+                        help='Discovers urls again even if cached ones are fresh.')
+    parser.add_argument('-cache_dir', default=default_cache_dir(),
+                        help='Directory where data is cached between runs (default: {}).'.format(default_cache_dir()))
+    parser.add_argument('-store', type=str, default=None,
+                        help='Directory of a content-addressed store shared by repositories: every distinct file is '
+                             'kept there once and hard-linked into the output directories, and files already in the '
+                             'store are not downloaded again.')
+    parser.add_argument('-http_cache', type=str, default=None,
+                        help='Directory of an HTTP cache, which may be shared by runs and users, of repository pages '
+                             'and files. Cached pages and files are revalidated with conditional requests, and cached '
+                             'files are hard-linked into the output directory instead of downloaded again.')
+    parser.add_argument('-http_cache_size', type=float, default=10.0,
+                        help='Size in GiB above which the least recently used responses are evicted from the HTTP '
+                             'cache (default: 10).')
+    parser.add_argument('-no_keep_alive', action='store_true',
+                        help='Disables TCP keep-alive probes on pooled connections.')
 
-        'dimacs11':     Dimacs11Downloader(repository_name='dimacs11',
-                                           site_url=repo_options_dict['dimacs11']['site_url']),
+    return parser.parse_args()
 
-        'dimacs9':      Dimacs9Downloader(repository_name='dimacs9',
-                                          site_url=repo_options_dict['dimacs9']['site_url']),
 
-        'doi':          DOIDownloader(repository_name='doi',
-                                      site_url=repo_options_dict['doi']['site_url']),
+def print_plan(downloaders, download_options):
+    """
+    Prints the files which would be downloaded from every repository, with their sizes and the total size. Urls and
+    sizes of the repositories are fetched concurrently.
 
-        'hetrec':       HetrecDownloader(repository_name='hetrec',
-                                         site_url=repo_options_dict['hetrec']['site_url']),
+    :param downloaders: A dict mapping repository names to NetworkDownloaders.
+    :param download_options: A dict mapping repository names to the urls, selection and shard of their downloads.
+    :return: None.
+    """
 
-        'kone':         KoneDownloader(repository_name='kone',
-                                       site_url=repo_options_dict['kone']['site_url']),
+    import urllib3
 
-        'lalg':         LALGDownloader(repository_name='lalg',
-                                       site_url=repo_options_dict['lalg']['site_url']),
+    def plan(repo):
+        downloader = downloaders[repo]
+        try:
+            urls = downloader.select_urls(download_options[repo].get('selection'), download_options[repo].get('urls'),
+                                          download_options[repo].get('shard'))
+            return urls, downloader.get_sizes(urls)
+        except urllib3.exceptions.HTTPError as e:
+            url_getter_logger.error('Could not get urls for {}: {}'.format(repo, e))
+            return [], {}
+
+    repos = sorted(downloaders)
+    with ThreadPoolExecutor(max_workers=max(1, len(repos))) as executor:
+        plans = dict(zip(repos, executor.map(plan, repos)))
+
+    total_files, total_size = 0, 0
+    for repo in repos:
+        urls, sizes = plans[repo]
+        for url in urls:
+            print('{:>12} {}'.format(sizes[url] if sizes[url] is not None else '?', url))
+
+        known_sizes = [sizes[url] for url in urls if sizes[url] is not None]
+        print('{}: {} files, {:.1f} MiB{}\n'.format(
+            repo, len(urls), sum(known_sizes) / 1024 ** 2,
+            ' ({} of unknown size)'.format(len(urls) - len(known_sizes)) if len(known_sizes) < len(urls) else ''))
+        total_files += len(urls)
+        total_size += sum(known_sizes)
+
+    if len(repos) > 1:
+        print('Total: {} files, {:.1f} MiB'.format(total_files, total_size / 1024 ** 2))
 
-        'mvlens':       MVLensDownloader(repository_name='mvlens',
-                                         site_url=repo_options_dict['mvlens']['site_url']),
 
-        'nber':         NBERDownloader(repository_name='nber',
-                                       site_url=repo_options_dict['nber']['site_url']),
+def main():
 
-        'netr':         NetworkRepositoryDownloader(repository_name='netr',
-                                                    site_url=repo_options_dict['netr']['site_url']),
+    with open('repositories.json', 'r') as in_file:
+        repo_options_dict = json.load(in_file)
 
-        'small':        SmallDownloader(repository_name='small',
-                                        site_url=repo_options_dict['small']['site_url']),
+    args = get_args(repo_options_dict)
+    output_dir = args.odir
 
-        'snap':         SNAPDownloader(repository_name='snap',
-                                       site_url=repo_options_dict['snap']['site_url']),
+    if args.metrics is not None:
+        metrics.enable()
 
-        'spmx':         SparseMatrixDownloader(repository_name='spmx',
-                                               site_url=repo_options_dict['spmx']['site_url'])
-    }
+    store = ContentStore(args.store) if args.store is not None else None
+    http_cache = HTTPCache(args.http_cache, int(args.http_cache_size * 1024 ** 3)) \
+        if args.http_cache is not None else None
+    url_cache = URLCache(args.cache_dir, args.url_ttl * 3600) if args.url_ttl > 0 else None
+    rate_limiter = RateLimiter(bytes_per_sec=args.max_rate * 1024 * 1024 if args.max_rate else None,
+                               requests_per_sec=args.max_rps)
 
-    args = get_args(repo_options_dict)
-    output_dir = args.odir
+    repos = repositories(repo_options_dict) if args.repo == 'all' else [args.repo]
 
     if not os.path.exists(output_dir):
         try:
@@ -121,27 +248,121 @@ def main():
         except OSError:
             raise
 
-    if args.repo == 'all':
-        for downloader_repo in downloaders_dict:
-            downloader_output_dir = os.path.join(output_dir, downloader_repo)
-            try:
-                os.mkdir(downloader_output_dir)
-            except FileExistsError:
-                pass
-
-            download_logger.info('Downloading {} networks.'.format(downloader_repo))
-            downloaders_dict[downloader_repo].download_networks(downloader_output_dir)
-    else:
-        downloader_repo = args.repo
-        downloader_output_dir = os.path.join(output_dir, downloader_repo)
+    output_dirs = {repo: os.path.join(output_dir, repo) for repo in repos}
+    download_options = {repo: {'sync': args.sync,
+                               'extract': args.extract or repo_options_dict[repo].get('extract', False)}
+                        for repo in repos}
 
+    for downloader_repo in repos:
         try:
-            os.mkdir(downloader_output_dir)
+            os.mkdir(output_dirs[downloader_repo])
         except FileExistsError:
             pass
 
+    if args.verify:
+        from integrity import verify_repository
+
+        problems = []
+        for downloader_repo in repos:
+            problems += verify_repository(output_dirs[downloader_repo], workers=args.verify_workers)
+        for filename, problem in problems:
+            download_logger.error('{}: {}.'.format(filename, problem))
+        download_logger.info('{} corrupted or missing files.'.format(len(problems)))
+        return 1 if problems else 0
+
+    if args.merge_shards:
+        for downloader_repo in repos:
+            shard_dirs = [os.path.join(shard_dir, downloader_repo) for shard_dir in args.merge_shards]
+            total = merge_shards([shard_dir for shard_dir in shard_dirs if os.path.isdir(shard_dir)],
+                                 output_dirs[downloader_repo])
+            download_logger.info('{} networks of {} in the merged manifest.'.format(total, downloader_repo))
+        return 0
+
+    if args.retry_failed:
+        for downloader_repo in list(repos):
+            download_options[downloader_repo]['urls'] = FailureQueue(output_dirs[downloader_repo]).urls()
+            if not download_options[downloader_repo]['urls']:
+                repos.remove(downloader_repo)
+        if not repos:
+            download_logger.info('No failed downloads to retry.')
+            return 0
+
+    if args.include or args.exclude or args.max_size is not None or args.order != 'name' or args.limit is not None:
+        selection = Selection(include=args.include, exclude=args.exclude, order=args.order, limit=args.limit,
+                              max_size=int(args.max_size * 1024 * 1024) if args.max_size is not None else None)
+        for downloader_repo in repos:
+            download_options[downloader_repo]['selection'] = selection
+
+    if args.shard is not None:
+        try:
+            index, count = parse_shard(args.shard)
+        except ValueError as e:
+            download_logger.error(str(e))
+            return 2
+        # The failure queue of a machine only holds networks of its shard already.
+        if not args.retry_failed:
+            for downloader_repo in repos:
+                sizes = manifest_sizes(os.path.join(args.shard_sizes, downloader_repo)) \
+                    if args.shard_sizes is not None else None
+                download_options[downloader_repo]['shard'] = Shard(index, count, sizes=sizes)
+
+    # Only the downloaders of the requested repositories are imported and built, once they are needed.
+    downloaders_dict = {
+        repo: create_downloader(repo, repo_options_dict,
+                                pool_size=max(args.pool_size, args.host_workers), connect_timeout=args.timeout,
+                                read_timeout=args.timeout, keep_alive=not args.no_keep_alive,
+                                url_cache=url_cache, refresh_urls=args.refresh_urls, segments=args.segments,
+                                segment_threshold=int(args.segment_threshold * 1024 * 1024), rate_limiter=rate_limiter,
+                                rate_limits={option: repo_options_dict[repo][option]
+                                             for option in ('max_bytes_per_sec', 'max_requests_per_sec')
+                                             if option in repo_options_dict[repo]},
+                                html_parser=args.html_parser, chunk_size=args.chunk_size * 1024,
+                                max_chunk_size=args.max_chunk_size * 1024, resume_attempts=args.retries,
+                                retry_backoff=args.retry_backoff, max_retry_backoff=args.max_retry_backoff,
+                                store=store, http_cache=http_cache)
+        for repo in repos
+    }
+
+    if args.dry_run:
+        print_plan({repo: downloaders_dict[repo] for repo in repos}, download_options)
+        return 0
+
+    if args.backend == 'async':
+        # aiohttp is only needed, hence only imported, with the async backend.
+        from asyncdownloader import download_repositories as download_repositories_async
+
+        download_logger.info('Downloading networks of {}.'.format(', '.join(repos)))
+        download_repositories_async({repo: downloaders_dict[repo] for repo in repos}, output_dirs,
+                                    workers=args.async_workers, max_requests_per_host=args.host_workers,
+                                    connect_timeout=args.timeout, read_timeout=args.timeout,
+                                    download_options=download_options)
+    elif args.repo == 'all':
+        from scheduler import download_repositories
+
+        download_logger.info('Downloading networks of {} repositories.'.format(len(repos)))
+        download_repositories({repo: downloaders_dict[repo] for repo in repos}, output_dirs,
+                              workers=max(args.workers, len(repos)), max_requests_per_host=args.host_workers,
+                              download_options=download_options)
+    else:
+        downloader_repo = args.repo
         download_logger.info('Downloading {} networks.'.format(downloader_repo))
-        downloaders_dict[downloader_repo].download_networks(downloader_output_dir)
+        downloaders_dict[downloader_repo].download_networks(output_dirs[downloader_repo], workers=args.workers,
+                                                            max_requests_per_host=args.host_workers,
+                                                            **download_options[downloader_repo])
+
+    if args.csr:
+        # NumPy is only needed, hence only imported, when edge lists are converted.
+        from csr import convert_repository
+
+        for downloader_repo in repos:
+            convert_repository(output_dirs[downloader_repo])
+
+    if args.metrics is not None:
+        if args.metrics_format == 'prometheus':
+            metrics.write_prometheus(args.metrics)
+        else:
+            metrics.write_json_lines(args.metrics)
+        print(metrics.summary())
 
 
 if __name__ == '__main__':
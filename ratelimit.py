@@ -0,0 +1,165 @@
+"""
+MIT License
+
+Copyright (c) 2017 Daniel N. R. da Silva
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import threading
+import time
+import urllib.parse
+
+
+class TokenBucket(object):
+    """
+    This class implements a thread-safe token bucket. Tokens are refilled at a constant rate up to a capacity, and a
+    consumer asking for more tokens than available waits until the bucket refills. Consumers that must not block, such
+    as coroutines, reserve tokens and wait on their own.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Constructor for TokenBucket.
+
+        :param rate: Tokens added per second.
+        :param capacity: Maximum number of tokens held, i.e., the allowed burst; defaults to one second of tokens.
+        """
+
+        self._rate = float(rate)
+        self._capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self._capacity
+        self._last_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """
+        Takes tokens from the bucket without waiting for them. Amounts larger than the capacity are allowed: the bucket
+        goes into debt and later consumers wait for it to be paid back.
+
+        :param amount: Number of tokens to take.
+        :return: Seconds to wait before using the tokens.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._last_time) * self._rate)
+            self._last_time = now
+            self._tokens -= amount
+            return -self._tokens / self._rate if self._tokens < 0 else 0.0
+
+    def consume(self, amount=1):
+        """
+        Takes tokens from the bucket, waiting as long as needed for them.
+
+        :param amount: Number of tokens to take.
+        :return: Seconds spent waiting.
+        """
+
+        wait = self.reserve(amount)
+        if wait:
+            time.sleep(wait)
+
+        return wait
+
+
+class RateLimiter(object):
+    """
+    This class implements request and bandwidth limits, both global and per host. A single limiter may be shared by
+    several downloaders, so limits hold across every repository of a run.
+    """
+
+    def __init__(self, bytes_per_sec=None, requests_per_sec=None):
+        """
+        Constructor for RateLimiter.
+
+        :param bytes_per_sec: Global bandwidth limit, or None for no limit.
+        :param requests_per_sec: Global request rate limit, or None for no limit.
+        """
+
+        self._global_bytes = TokenBucket(bytes_per_sec) if bytes_per_sec else None
+        self._global_requests = TokenBucket(requests_per_sec) if requests_per_sec else None
+        self._host_buckets = {}
+        self._lock = threading.Lock()
+
+    def _host_bucket(self, url, kind, rate):
+        if not rate:
+            return None
+
+        host = urllib.parse.urlparse(url).netloc
+        with self._lock:
+            if (host, kind) not in self._host_buckets:
+                self._host_buckets[(host, kind)] = TokenBucket(rate)
+
+            return self._host_buckets[(host, kind)]
+
+    def reserve_request(self, url, requests_per_sec=None):
+        """
+        Reserves a request to an url without waiting for it.
+
+        :param url: The requested url.
+        :param requests_per_sec: Request rate limit of the url host, or None for no limit. The limit given the first
+        time a host is seen holds for the rest of the run.
+        :return: Seconds to wait before sending the request, 0 if no limit applies.
+        """
+
+        buckets = (self._global_requests, self._host_bucket(url, 'requests', requests_per_sec))
+        return max([bucket.reserve(1) for bucket in buckets if bucket is not None], default=0.0)
+
+    def reserve_transfer(self, url, total_bytes, bytes_per_sec=None):
+        """
+        Reserves bytes received from an url against the bandwidth limits without waiting for them.
+
+        :param url: The url the bytes were received from.
+        :param total_bytes: Number of bytes received.
+        :param bytes_per_sec: Bandwidth limit of the url host, or None for no limit. The limit given the first time a
+        host is seen holds for the rest of the run.
+        :return: Seconds to wait before receiving more bytes, 0 if no limit applies.
+        """
+
+        buckets = (self._global_bytes, self._host_bucket(url, 'bytes', bytes_per_sec))
+        return max([bucket.reserve(total_bytes) for bucket in buckets if bucket is not None], default=0.0)
+
+    def request(self, url, requests_per_sec=None):
+        """
+        Waits until a request to an url is allowed.
+
+        :param url: The requested url.
+        :param requests_per_sec: Request rate limit of the url host, or None for no limit.
+        :return: None.
+        """
+
+        wait = self.reserve_request(url, requests_per_sec)
+        if wait:
+            time.sleep(wait)
+
+    def transfer(self, url, total_bytes, bytes_per_sec=None):
+        """
+        Waits until bytes received from an url fit the bandwidth limits.
+
+        :param url: The url the bytes were received from.
+        :param total_bytes: Number of bytes received.
+        :param bytes_per_sec: Bandwidth limit of the url host, or None for no limit.
+        :return: None.
+        """
+
+        wait = self.reserve_transfer(url, total_bytes, bytes_per_sec)
+        if wait:
+            time.sleep(wait)
@@ -0,0 +1,72 @@
+"""
+MIT License
+
+Copyright (c) 2017 Daniel N. R. da Silva
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import importlib
+
+
+def load_class(class_path):
+    """
+    Imports a class given by its path, e.g., 'downloader:SNAPDownloader'. Only the module holding the class is
+    imported, so repositories whose downloaders live in other modules, possibly outside this package, cost nothing
+    until they are used.
+
+    :param class_path: The class path, as 'module:Class'.
+    :return: The class.
+    """
+
+    module_name, _, class_name = class_path.partition(':')
+    if not module_name or not class_name:
+        raise ValueError('a class path must be given as module:Class, not {}'.format(class_path))
+
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def repositories(repositories_options_dict):
+    """
+    Gets the repositories of the registry, i.e., the entries of repositories.json naming a downloader class.
+
+    :param repositories_options_dict: A dictionary for the repositories, as read from repositories.json.
+    :return: A sorted list of repository names.
+    """
+
+    return sorted(repo for repo, options in repositories_options_dict.items() if 'class' in options)
+
+
+def create_downloader(repository_name, repositories_options_dict, **kwargs):
+    """
+    Imports the downloader class of a repository and constructs it.
+
+    :param repository_name: Name of the repository, an entry of repositories.json.
+    :param repositories_options_dict: A dictionary for the repositories, as read from repositories.json.
+    :param kwargs: Further keyword arguments for the downloader constructor.
+    :return: A NetworkDownloader.
+    """
+
+    options = repositories_options_dict[repository_name]
+    if 'class' not in options:
+        raise ValueError('{} does not name a downloader class'.format(repository_name))
+
+    downloader_class = load_class(options['class'])
+    return downloader_class(repository_name=repository_name, site_url=options['site_url'], **kwargs)
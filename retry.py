@@ -0,0 +1,200 @@
+"""
+MIT License
+
+Copyright (c) 2017 Daniel N. R. da Silva
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+
+# Statuses telling a request may succeed if sent again later.
+retry_statuses = frozenset((408, 425, 429, 500, 502, 503, 504))
+
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header, given either as seconds or as an HTTP date.
+
+    :param value: The header value, or None.
+    :return: Seconds to wait, or None if the header is missing or malformed.
+    """
+
+    if value is None:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_time = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(0.0, retry_time.timestamp() - time.time())
+
+
+class RetryPolicy(object):
+    """
+    This class implements retries with exponential backoff and full jitter: before attempt n + 1 the caller waits a
+    random time between 0 and backoff * 2 ** (n - 1) seconds, capped at max_backoff, so clients failing together do not
+    retry together. A Retry-After sent by the server takes precedence over the backoff.
+    """
+
+    def __init__(self, attempts=5, backoff=1.0, max_backoff=60.0, max_retry_after=600.0):
+        """
+        Constructor for RetryPolicy.
+
+        :param attempts: Number of attempts before giving up.
+        :param backoff: Base delay in seconds.
+        :param max_backoff: Maximum delay in seconds between two attempts, Retry-After aside.
+        :param max_retry_after: Maximum delay in seconds honoured from a Retry-After header.
+        """
+
+        self.attempts = max(1, attempts)
+        self._backoff = max(0.0, backoff)
+        self._max_backoff = max_backoff
+        self._max_retry_after = max_retry_after
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Gets how long to wait after a failed attempt.
+
+        :param attempt: Number of the attempt which failed, starting at 1.
+        :param retry_after: Seconds the server asked to wait, or None.
+        :return: Seconds to wait before the next attempt.
+        """
+
+        if retry_after is not None:
+            return min(retry_after, self._max_retry_after)
+
+        return random.uniform(0, min(self._max_backoff, self._backoff * 2 ** (attempt - 1)))
+
+    def sleep(self, attempt, retry_after=None):
+        """
+        Waits after a failed attempt, unless it was the last one.
+
+        :param attempt: Number of the attempt which failed, starting at 1.
+        :param retry_after: Seconds the server asked to wait, or None.
+        :return: None.
+        """
+
+        if attempt < self.attempts:
+            time.sleep(self.delay(attempt, retry_after))
+
+
+class FailureQueue(object):
+    """
+    This class implements a persistent queue of the networks of a repository that could not be downloaded. It is kept
+    as a JSON file in the repository output directory, so a later run may only try those networks again.
+    """
+
+    filename = '.failed.json'
+
+    def __init__(self, repository_output_dir):
+        """
+        Constructor for FailureQueue.
+
+        :param repository_output_dir: Directory where the repository downloaded files are saved.
+        """
+
+        self._path = os.path.join(repository_output_dir, self.filename)
+        self._lock = threading.Lock()
+        self._entries = {}
+
+        if os.path.exists(self._path):
+            with open(self._path, 'r') as in_file:
+                self._entries = json.load(in_file)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def urls(self):
+        """
+        Gets the urls in the queue.
+
+        :return: A sorted list of network data urls.
+        """
+
+        with self._lock:
+            return sorted(self._entries)
+
+    def add(self, url, error):
+        """
+        Puts a network that could not be downloaded in the queue.
+
+        :param url: Network data url.
+        :param error: Description of the last error.
+        :return: None.
+        """
+
+        with self._lock:
+            failures = self._entries.get(url, {}).get('failures', 0)
+            self._entries[url] = {'error': error, 'failures': failures + 1,
+                                  'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+    def merge(self, other):
+        """
+        Puts the networks of another queue, e.g., the one of another shard, in the queue.
+
+        :param other: A FailureQueue.
+        :return: None.
+        """
+
+        with other._lock:
+            entries = {url: dict(entry) for url, entry in other._entries.items()}
+        with self._lock:
+            self._entries.update(entries)
+
+    def remove(self, url):
+        """
+        Takes a network out of the queue, e.g., once it was downloaded.
+
+        :param url: Network data url.
+        :return: None.
+        """
+
+        with self._lock:
+            self._entries.pop(url, None)
+
+    def save(self):
+        """
+        Writes the queue to disk, atomically, or removes its file if the queue is empty.
+
+        :return: None.
+        """
+
+        with self._lock:
+            if not self._entries:
+                if os.path.exists(self._path):
+                    os.remove(self._path)
+                return
+
+            tmp_path = self._path + '.tmp'
+            with open(tmp_path, 'w') as out_file:
+                json.dump(self._entries, out_file, indent=1, sort_keys=True)
+            os.replace(tmp_path, self._path)
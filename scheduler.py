@@ -0,0 +1,127 @@
+"""
+MIT License
+
+Copyright (c) 2017 Daniel N. R. da Silva
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import collections
+import urllib.parse
+
+import click
+import urllib3
+
+from logger import *
+
+
+def _discover(downloader, repository_output_dir, download_options):
+    """
+    Discovers the urls of a repository and prepares its downloads, logging instead of raising on network errors so
+    one unreachable repository does not stop the others.
+
+    :param downloader: A NetworkDownloader.
+    :param repository_output_dir: Directory where the repository downloaded files are to be saved.
+    :param download_options: Keyword arguments for begin_downloads.
+    :return: A list of (output file name, url) tuples, or None if the repository could not be reached.
+    """
+
+    try:
+        return downloader.begin_downloads(repository_output_dir, **download_options)
+    except urllib3.exceptions.HTTPError as e:
+        url_getter_logger.error('Could not get urls for {}: {}'.format(downloader._repository_name, e))
+        return None
+
+
+@timer_decorator('download all repositories')
+def download_repositories(downloaders, output_dirs, workers=8, max_requests_per_host=4, download_options=None):
+    """
+    Downloads several repositories at once. Urls of every repository are discovered concurrently, and then the
+    downloads of all repositories are interleaved on a single worker pool: files are handed to workers round-robin
+    across hosts, and a host never gets more than max_requests_per_host concurrent requests. A slow host thus only
+    holds up its own files and the whole run takes about as long as the slowest host.
+
+    :param downloaders: A dict mapping repository names to NetworkDownloaders.
+    :param output_dirs: A dict mapping repository names to the directories where their files are to be saved.
+    :param workers: Number of files downloaded concurrently, across all repositories.
+    :param max_requests_per_host: Maximum number of concurrent requests sent to a single host.
+    :param download_options: A dict mapping repository names to further keyword arguments for
+    NetworkDownloader.begin_downloads (sync, extract, ...).
+    :return: None.
+    """
+
+    repositories = sorted(downloaders)
+    download_options = download_options if download_options is not None else {}
+
+    def discover(repository):
+        options = dict(download_options.get(repository, {}), max_requests_per_host=max_requests_per_host)
+        return _discover(downloaders[repository], output_dirs[repository], options)
+
+    with ThreadPoolExecutor(max_workers=max(1, len(repositories))) as executor:
+        plans = dict(zip(repositories, executor.map(discover, repositories)))
+
+    host_queues = collections.OrderedDict()
+    for repository in repositories:
+        for out_filename, url in plans[repository] or []:
+            host = urllib.parse.urlparse(url).netloc
+            host_queues.setdefault(host, collections.deque()).append((downloaders[repository], out_filename, url))
+
+    total = sum(len(queue) for queue in host_queues.values())
+    in_flight = collections.Counter()
+    pending = {}
+    hosts = list(host_queues)
+    next_host = 0
+
+    try:
+        with click.progressbar(length=total, label='Downloading {} repositories'.format(len(repositories))) as bar:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                while hosts or pending:
+                    # Hands files to idle workers, visiting hosts round-robin and skipping hosts at their limit.
+                    skipped = 0
+                    while hosts and len(pending) < workers and skipped < len(hosts):
+                        next_host %= len(hosts)
+                        host = hosts[next_host]
+                        if in_flight[host] >= max_requests_per_host:
+                            next_host += 1
+                            skipped += 1
+                            continue
+
+                        downloader, out_filename, url = host_queues[host].popleft()
+                        pending[executor.submit(downloader.download_network, out_filename, url)] = host
+                        in_flight[host] += 1
+                        skipped = 0
+
+                        if host_queues[host]:
+                            next_host += 1
+                        else:
+                            del host_queues[host]
+                            hosts.pop(next_host)
+
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        in_flight[pending.pop(future)] -= 1
+                        future.result()
+                        bar.update(1)
+
+    finally:
+        for repository in repositories:
+            if plans[repository] is not None:
+                downloaders[repository].finish_downloads()
@@ -0,0 +1,116 @@
+"""
+MIT License
+
+Copyright (c) 2017 Daniel N. R. da Silva
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import fnmatch
+import re
+
+orders = ('name', 'smallest', 'largest')
+
+
+def _compile_pattern(pattern):
+    """
+    Compiles a url pattern: a regular expression if it starts with 're:', and a glob pattern otherwise.
+
+    :param pattern: A url pattern.
+    :return: A compiled regular expression searched in urls.
+    """
+
+    if pattern.startswith('re:'):
+        return re.compile(pattern[3:])
+
+    return re.compile(r'\A' + fnmatch.translate(pattern))
+
+
+class Selection(object):
+    """
+    This class implements the choice of the networks of a repository to download: urls matching include and exclude
+    patterns, files no larger than a maximum size, in name or size order, and at most a number of them.
+    """
+
+    def __init__(self, include=None, exclude=None, max_size=None, order='name', limit=None):
+        """
+        Constructor for Selection.
+
+        :param include: Url patterns of which one must match, or None to include every url. Glob patterns match the
+        whole url; patterns starting with 're:' are regular expressions searched in the url.
+        :param exclude: Url patterns of which none may match, or None.
+        :param max_size: Maximum file size in bytes, or None. Files whose size the server does not tell are kept.
+        :param order: 'name' for url order, or 'smallest' or 'largest' for smallest or largest files first. Files
+        whose size the server does not tell come last.
+        :param limit: Maximum number of files, or None.
+        """
+
+        if order not in orders:
+            raise ValueError('order must be one of {}'.format(', '.join(orders)))
+
+        self._include = [_compile_pattern(pattern) for pattern in include or []]
+        self._exclude = [_compile_pattern(pattern) for pattern in exclude or []]
+        self._max_size = max_size
+        self._order = order
+        self._limit = limit
+
+    @property
+    def needs_sizes(self):
+        """
+        Tells whether file sizes must be known to apply the selection.
+
+        :return: True if the selection filters or orders files by size, False otherwise.
+        """
+
+        return self._max_size is not None or self._order != 'name'
+
+    def matches(self, url):
+        """
+        Tells whether an url passes the include and exclude patterns.
+
+        :param url: A network data url.
+        :return: True if the url is selected by the patterns, False otherwise.
+        """
+
+        if self._include and not any(pattern.search(url) for pattern in self._include):
+            return False
+
+        return not any(pattern.search(url) for pattern in self._exclude)
+
+    def apply(self, urls, sizes=None):
+        """
+        Selects networks.
+
+        :param urls: Network data urls.
+        :param sizes: A dict mapping urls to file sizes in bytes, or to None when unknown. It is required if
+        needs_sizes is True.
+        :return: The list of selected urls, in the selection order.
+        """
+
+        urls = [url for url in urls if self.matches(url)]
+
+        if self._max_size is not None:
+            urls = [url for url in urls if sizes.get(url) is None or sizes[url] <= self._max_size]
+
+        if self._order != 'name':
+            sign = 1 if self._order == 'smallest' else -1
+            urls.sort(key=lambda url: (sizes.get(url) is None, sign * (sizes.get(url) or 0), url))
+
+        return urls[:self._limit] if self._limit is not None else urls
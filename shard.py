@@ -0,0 +1,185 @@
+"""
+MIT License
+
+Copyright (c) 2017 Daniel N. R. da Silva
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import hashlib
+import os
+
+from manifest import Manifest
+from retry import FailureQueue
+
+
+def _stable_hash(text):
+    """
+    Hashes a string the same way on every machine and run, unlike the built-in hash.
+
+    :param text: A string.
+    :return: A non-negative integer.
+    """
+
+    return int(hashlib.sha1(text.encode()).hexdigest()[:16], 16)
+
+
+def parse_shard(text):
+    """
+    Parses a shard given as 'i/N', the i-th of N shards, counting from 1.
+
+    :param text: A shard as 'i/N'.
+    :return: A (index, count) tuple.
+    """
+
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError('a shard must be given as i/N, e.g., 1/4')
+
+    if not 1 <= index <= count:
+        raise ValueError('a shard index must be between 1 and the number of shards')
+
+    return index, count
+
+
+class Shard(object):
+    """
+    This class implements the split of the networks of a repository among machines, each downloading a disjoint
+    shard without talking to the others. Networks are split by rendezvous hashing: every url goes to the shard with
+    the highest hash of the url and the shard index. The shard of a url therefore only depends on the url, so every
+    machine agrees on it even if they discovered different urls, and shards get about the same number of files.
+
+    Hashing does not balance bytes when a few networks are much larger than the others. Given the sizes recorded in
+    the merged manifest of a previous run, which every machine reads alike, networks of at least size_threshold bytes
+    are instead assigned largest first to the shard with the fewest bytes so far, counting the smaller recorded
+    networks in their hashed shards. Networks missing from the manifest are still hashed.
+    """
+
+    def __init__(self, index, count, sizes=None, size_threshold=64 * 1024 * 1024):
+        """
+        Constructor for Shard.
+
+        :param index: Index of the shard to download, from 1 to count.
+        :param count: Number of shards.
+        :param sizes: A dict mapping network data urls to their sizes in bytes, e.g., from manifest_sizes, or None to
+        split networks by hashing only. Every machine must be given the same sizes.
+        :param size_threshold: Size in bytes from which a network is assigned by size instead of hashed.
+        """
+
+        if not 1 <= index <= count:
+            raise ValueError('a shard index must be between 1 and the number of shards')
+
+        self._index = index
+        self._count = count
+        self._assigned = self._assign_by_size(sizes or {}, size_threshold)
+
+    def __str__(self):
+        return '{}/{}'.format(self._index, self._count)
+
+    def _hashed_shard_of(self, url):
+        return max(range(1, self._count + 1), key=lambda shard: _stable_hash('{}\n{}'.format(shard, url)))
+
+    def _assign_by_size(self, sizes, size_threshold):
+        """
+        Assigns the large networks to shards so that shards get about the same number of bytes. The assignment only
+        depends on the sizes, not on the order of the dict.
+
+        :param sizes: A dict mapping network data urls to their sizes in bytes, or to None when unknown.
+        :param size_threshold: Size in bytes from which a network is assigned by size.
+        :return: A dict mapping the urls of the large networks to their shard indexes.
+        """
+
+        shard_bytes = [0] * (self._count + 1)
+        large = []
+        for url, size in sizes.items():
+            if size is None:
+                continue
+            if size >= size_threshold:
+                large.append((url, size))
+            else:
+                shard_bytes[self._hashed_shard_of(url)] += size
+
+        assigned = {}
+        for url, size in sorted(large, key=lambda item: (-item[1], item[0])):
+            shard = min(range(1, self._count + 1), key=lambda index: (shard_bytes[index], index))
+            assigned[url] = shard
+            shard_bytes[shard] += size
+
+        return assigned
+
+    def shard_of(self, url):
+        """
+        Gets the shard a network goes to.
+
+        :param url: A network data url.
+        :return: The shard index, from 1 to count.
+        """
+
+        return self._assigned.get(url) or self._hashed_shard_of(url)
+
+    def apply(self, urls):
+        """
+        Keeps the networks of this shard.
+
+        :param urls: Network data urls, in download order.
+        :return: The list of urls of this shard, in download order.
+        """
+
+        return [url for url in urls if self.shard_of(url) == self._index]
+
+
+def manifest_sizes(repository_output_dir):
+    """
+    Gets the sizes of the networks recorded in a manifest, e.g., the one merged by merge_shards.
+
+    :param repository_output_dir: Directory holding the manifest of a repository.
+    :return: A dict mapping network data urls to their sizes in bytes, empty if there is no manifest.
+    """
+
+    return {url: entry['size'] for url, entry in Manifest(repository_output_dir).items()}
+
+
+def merge_shards(shard_dirs, repository_output_dir):
+    """
+    Merges the manifests and failure queues that the machines downloading the shards of a repository wrote to their
+    output directories. Files are not copied.
+
+    :param shard_dirs: Repository output directories of the shards.
+    :param repository_output_dir: Directory whose manifest and failure queue receive the records of every shard.
+    :return: The number of networks recorded in the merged manifest.
+    """
+
+    manifest = Manifest(repository_output_dir)
+    failures = FailureQueue(repository_output_dir)
+    for shard_dir in shard_dirs:
+        if os.path.abspath(shard_dir) == os.path.abspath(repository_output_dir):
+            continue
+
+        for url, entry in Manifest(shard_dir).items():
+            manifest.record(url, **entry)
+        failures.merge(FailureQueue(shard_dir))
+
+    for url, _ in manifest.items():
+        failures.remove(url)
+
+    manifest.save()
+    failures.save()
+    return len(manifest)
@@ -0,0 +1,159 @@
+"""
+MIT License
+
+Copyright (c) 2017 Daniel N. R. da Silva
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import errno
+import json
+import os
+import shutil
+import threading
+
+
+class ContentStore(object):
+    """
+    This class implements a content-addressed store shared by repositories: every distinct file is kept once, as a
+    blob named by its SHA-256, and repository output directories hold hard links to the blobs (symbolic links when
+    the store is on another file system). An index maps every url to the checksum, size and validators of the content
+    last downloaded from it, so content already in the store is not downloaded again.
+    """
+
+    index_filename = 'index.json'
+
+    def __init__(self, store_dir):
+        """
+        Constructor for ContentStore.
+
+        :param store_dir: Directory where blobs and the index are kept.
+        """
+
+        self._store_dir = store_dir
+        self._index_path = os.path.join(store_dir, self.index_filename)
+        self._lock = threading.Lock()
+        self._index = {}
+
+        os.makedirs(store_dir, exist_ok=True)
+        if os.path.exists(self._index_path):
+            with open(self._index_path, 'r') as in_file:
+                self._index = json.load(in_file)
+
+    def blob_path(self, sha256):
+        """
+        Gets the file name of a blob.
+
+        :param sha256: The blob SHA-256 hex digest.
+        :return: The blob file name, under a directory named by the first two hex digits.
+        """
+
+        return os.path.join(self._store_dir, sha256[:2], sha256)
+
+    def has(self, sha256):
+        """
+        Tells whether the store holds a blob.
+
+        :param sha256: A SHA-256 hex digest.
+        :return: True if the blob is in the store, False otherwise.
+        """
+
+        return os.path.exists(self.blob_path(sha256))
+
+    def lookup(self, url):
+        """
+        Gets what the store knows about the content of an url.
+
+        :param url: A network data url.
+        :return: A dict with the sha256, md5, size, etag and last_modified of the content last downloaded from the url,
+        or None if the url is unknown or its blob is gone.
+        """
+
+        with self._lock:
+            entry = self._index.get(url)
+
+        if entry is None or not self.has(entry['sha256']):
+            return None
+
+        return dict(entry)
+
+    def add(self, filename, url, sha256, md5=None, size=None, etag=None, last_modified=None):
+        """
+        Moves a downloaded file into the store, or drops it if the store already holds the same content, links it back
+        in place and indexes its url.
+
+        :param filename: The downloaded file name.
+        :param url: The url the file was downloaded from.
+        :param sha256: The file SHA-256 hex digest.
+        :param md5: The file MD5 hex digest.
+        :param size: The file size in bytes.
+        :param etag: ETag header sent by the server.
+        :param last_modified: Last-Modified header sent by the server.
+        :return: None.
+        """
+
+        blob_path = self.blob_path(sha256)
+        with self._lock:
+            if os.path.exists(blob_path):
+                os.remove(filename)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                shutil.move(filename, blob_path)
+
+            self._index[url] = {'sha256': sha256, 'md5': md5, 'size': size, 'etag': etag,
+                                'last_modified': last_modified}
+
+        self.link(sha256, filename)
+
+    def link(self, sha256, filename):
+        """
+        Links a blob to a file name, replacing the file if it exists. The link is a hard link, or a symbolic link when
+        the file name is on another file system or hard links are not allowed there.
+
+        :param sha256: The blob SHA-256 hex digest.
+        :param filename: The file name linked to the blob.
+        :return: None.
+        """
+
+        tmp_filename = filename + '.link'
+        if os.path.lexists(tmp_filename):
+            os.remove(tmp_filename)
+
+        try:
+            os.link(self.blob_path(sha256), tmp_filename)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM):
+                raise
+            os.symlink(os.path.abspath(self.blob_path(sha256)), tmp_filename)
+
+        os.replace(tmp_filename, filename)
+
+    def save(self):
+        """
+        Writes the index to disk, atomically.
+
+        :return: None.
+        """
+
+        with self._lock:
+            tmp_path = self._index_path + '.tmp'
+            with open(tmp_path, 'w') as out_file:
+                json.dump(self._index, out_file, indent=1, sort_keys=True)
+            os.replace(tmp_path, self._index_path)
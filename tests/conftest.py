@@ -0,0 +1,209 @@
+import asyncio
+import email.utils
+import functools
+import http.server
+import os
+import re
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloader import NetworkDownloader  # noqa: E402
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serves files like a repository does, answering requests for a range of bytes, valid only for the current version
+    of the file if If-Range is sent, and recording the requested paths and ranges. Responses queued for a path, and
+    possibly a range, are sent once each instead, before the file is served again.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    requested_paths = None
+    requested_ranges = None
+    queued_responses = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_queued_response(self):
+        for index, (path, requested_range, status, headers) in enumerate(self.queued_responses):
+            if path == self.path and requested_range in (None, self.headers.get('Range')):
+                del self.queued_responses[index]
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', '0')
+                super().end_headers()
+                return True
+
+        return False
+
+    def do_HEAD(self):
+        if not self._send_queued_response():
+            super().do_HEAD()
+
+    def do_GET(self):
+        self.requested_paths.append(self.path)
+        self.requested_ranges.append((self.path, self.headers.get('Range')))
+        if self._send_queued_response():
+            return
+
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        filename = self.translate_path(self.path)
+        if match is None or not os.path.isfile(filename):
+            return super().do_GET()
+
+        last_modified = self.date_time_string(int(os.path.getmtime(filename)))
+        if self.headers.get('If-Range', last_modified) != last_modified:
+            return super().do_GET()
+
+        with open(filename, 'rb') as in_file:
+            data = in_file.read()
+        start = int(match.group(1))
+        if start >= len(data):
+            self.send_response(416)
+            self.send_header('Content-Range', 'bytes */{}'.format(len(data)))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        end = min(int(match.group(2) or len(data) - 1), len(data) - 1)
+        self.send_response(206)
+        self.send_header('Last-Modified', last_modified)
+        self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, end, len(data)))
+        self.send_header('Content-Length', str(end + 1 - start))
+        self.end_headers()
+        self.wfile.write(data[start:end + 1])
+
+    def end_headers(self):
+        self.send_header('Accept-Ranges', 'bytes')
+        super().end_headers()
+
+
+class LocalDownloader(NetworkDownloader):
+    """
+    Downloads the networks linked from the index page of a local file server, or from the data pages linked there.
+    """
+
+    def __init__(self, base_url, categories=False, **kwargs):
+        """
+        Constructor for LocalDownloader.
+
+        :param base_url: The url of the file server.
+        :param categories: Whether the index page links data pages, which link the networks.
+        :param kwargs: Further keyword arguments for NetworkDownloader.
+        """
+
+        super().__init__('local', base_url + '/index.html', **kwargs)
+        self._base_url = base_url
+        self._categories = categories
+
+    def _links(self, soup):
+        return [self._base_url + a.get('href') for a in soup.find_all('a')]
+
+    def _parse_urls_in_main_page(self, soup):
+        return self._links(soup) if self._categories else None
+
+    def _parse_urls(self, soup=None):
+        return self._links(soup)
+
+
+class FileServer(object):
+    """
+    A directory served over HTTP on localhost, standing in for a repository.
+    """
+
+    def __init__(self, directory, base_url, handler):
+        self.directory = directory
+        self.base_url = base_url
+        self.requested_paths = handler.requested_paths
+        self.requested_ranges = handler.requested_ranges
+        self._queued_responses = handler.queued_responses
+
+    def serve(self, files):
+        """
+        Serves networks, linked from the index page.
+
+        :param files: A dict mapping file names to their content, as bytes.
+        :return: None.
+        """
+
+        for name, data in files.items():
+            (self.directory / name).write_bytes(data)
+        (self.directory / 'index.html').write_text(''.join('<a href="/{}">x</a>'.format(name) for name in files))
+
+    def url(self, name):
+        return '{}/{}'.format(self.base_url, name)
+
+    def respond(self, name, status, headers=None, requested_range=None):
+        """
+        Queues a response sent once, instead of the file, to the next request for it.
+
+        :param name: A file name.
+        :param status: The response status.
+        :param headers: A dict of response headers, or None.
+        :param requested_range: The Range header of the request answered, or None to answer any request for the file.
+        :return: None.
+        """
+
+        self._queued_responses.append(('/' + name, requested_range, status, headers or {}))
+
+    def last_modified(self, name):
+        return email.utils.formatdate(int(os.path.getmtime(self.directory / name)), usegmt=True)
+
+    def downloader(self, **kwargs):
+        """
+        Builds a downloader of the networks served.
+
+        :param kwargs: Keyword arguments for LocalDownloader.
+        :return: A LocalDownloader.
+        """
+
+        return LocalDownloader(self.base_url, **kwargs)
+
+
+@pytest.fixture(params=['threads', 'async'])
+def download(request):
+    """
+    Downloads the networks of a repository with each backend.
+
+    :return: A function taking a downloader, an output directory and keyword arguments for download_networks.
+    """
+
+    def download_with_threads(downloader, output_dir, **kwargs):
+        downloader.download_networks(str(output_dir), **kwargs)
+
+    def download_with_asyncio(downloader, output_dir, **kwargs):
+        from asyncdownloader import AsyncNetworkDownloader, client_session
+
+        async def download_networks():
+            async with client_session() as session:
+                await AsyncNetworkDownloader(downloader, session, asyncio.Semaphore(4)).download_networks(
+                    str(output_dir), **kwargs)
+
+        asyncio.run(download_networks())
+
+    return download_with_threads if request.param == 'threads' else download_with_asyncio
+
+
+@pytest.fixture
+def file_server(tmp_path):
+    """
+    Serves a directory over HTTP on localhost, standing in for a repository.
+
+    :return: A FileServer.
+    """
+
+    directory = tmp_path / 'site'
+    directory.mkdir()
+    handler = type('Handler', (_QuietHandler,), {'requested_paths': [], 'requested_ranges': [], 'queued_responses': []})
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(handler, directory=str(directory)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield FileServer(directory, 'http://127.0.0.1:{}'.format(server.server_address[1]), handler)
+    server.shutdown()
+    server.server_close()
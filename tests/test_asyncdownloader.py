@@ -0,0 +1,60 @@
+import asyncio
+import gzip
+import hashlib
+import os
+
+from asyncdownloader import AsyncNetworkDownloader, client_session
+from manifest import Manifest
+
+
+def _download(downloader, output_dir, **kwargs):
+    async def download():
+        async with client_session(workers=4) as session:
+            async_downloader = AsyncNetworkDownloader(downloader, session, asyncio.Semaphore(4))
+            await async_downloader.download_networks(str(output_dir), **kwargs)
+
+    asyncio.run(download())
+
+
+def test_download_networks(file_server, tmp_path):
+    files = {'network{}.txt'.format(i): os.urandom(50000 + i) for i in range(4)}
+    file_server.serve(files)
+
+    _download(file_server.downloader(), tmp_path)
+
+    manifest = Manifest(str(tmp_path))
+    for name, data in files.items():
+        assert (tmp_path / name).read_bytes() == data
+        assert manifest.get(file_server.url(name))['sha256'] == hashlib.sha256(data).hexdigest()
+
+
+def test_decompress_while_downloading(file_server, tmp_path):
+    data = os.urandom(20000) * 10
+    file_server.serve({'network.txt.gz': gzip.compress(data)})
+
+    _download(file_server.downloader(), tmp_path, extract=True, extract_workers=1)
+
+    assert (tmp_path / 'network.txt').read_bytes() == data
+
+
+def test_repository_without_networks_is_discovered_once(file_server, tmp_path):
+    file_server.serve({})
+
+    _download(file_server.downloader(), tmp_path)
+
+    assert file_server.requested_paths == ['/index.html']
+
+
+def test_get_urls_fetches_each_page_once(file_server):
+    file_server.serve({'graphs.html': b'<a href="/a.txt">x</a><a href="/b.txt">x</a><a href="/a.txt">x</a>',
+                       'social.html': b'<a href="/b.txt">x</a><a href="/c.txt">x</a>'})
+    (file_server.directory / 'index.html').write_text('<a href="/graphs.html">x</a><a href="/social.html">x</a>'
+                                                      '<a href="/graphs.html">x</a>')
+    downloader = file_server.downloader(categories=True)
+
+    async def get_urls():
+        async with client_session() as session:
+            return await AsyncNetworkDownloader(downloader, session, asyncio.Semaphore(4)).get_urls()
+
+    assert asyncio.run(get_urls()) == [file_server.url('a.txt'), file_server.url('b.txt'), file_server.url('c.txt')]
+    assert file_server.requested_paths.count('/graphs.html') == 1
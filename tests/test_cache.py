@@ -0,0 +1,44 @@
+import os
+
+from cache import HTTPCache
+from manifest import Manifest
+
+
+def test_put_file_skips_responses_without_validators(tmp_path):
+    filename = tmp_path / 'network.txt'
+    filename.write_bytes(b'data')
+    http_cache = HTTPCache(str(tmp_path / 'cache'), 10 ** 6)
+
+    http_cache.put_file('http://example.org/network.txt', str(filename))
+    assert http_cache.get('http://example.org/network.txt') is None
+
+    http_cache.put_file('http://example.org/network.txt', str(filename), etag='"1"')
+    assert http_cache.get('http://example.org/network.txt')['etag'] == '"1"'
+
+
+def test_download_after_cached_copy_is_evicted(file_server, tmp_path):
+    files = {'network{}.txt'.format(i): os.urandom(1000) for i in range(3)}
+    file_server.serve(files)
+    http_cache = HTTPCache(str(tmp_path / 'cache'), 10 ** 6)
+
+    first_dir = tmp_path / 'first'
+    first_dir.mkdir()
+    file_server.downloader(http_cache=http_cache).download_networks(str(first_dir))
+
+    # Every cached copy is evicted between the conditional request and its link.
+    link = http_cache.link
+
+    def evict_then_link(url, filename):
+        http_cache._max_size = 0
+        http_cache.evict()
+        return link(url, filename)
+
+    http_cache.link = evict_then_link
+    second_dir = tmp_path / 'second'
+    second_dir.mkdir()
+    file_server.downloader(http_cache=http_cache).download_networks(str(second_dir))
+
+    for name, data in files.items():
+        assert (second_dir / name).read_bytes() == data
+    assert len(Manifest(str(second_dir))) == len(files)
+    assert not os.path.exists(second_dir / '.failed.json')
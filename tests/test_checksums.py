@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+
+from bs4 import BeautifulSoup
+
+from downloader import SNAPDownloader, SparseMatrixDownloader
+from htmlparse import LxmlPage
+from integrity import parse_checksums
+
+import pytest
+
+SHA256 = hashlib.sha256(b'network').hexdigest()
+MD5 = hashlib.md5(b'network').hexdigest()
+
+
+def _pages(data):
+    return [BeautifulSoup(data, 'lxml'), LxmlPage.from_html(data)]
+
+
+def test_parse_checksums():
+    assert parse_checksums('sha256: {} md5: {}'.format(SHA256.upper(), MD5)) == {'sha256': SHA256, 'md5': MD5}
+    assert parse_checksums('{} {}'.format(MD5, hashlib.md5(b'other').hexdigest())) == {}
+    assert parse_checksums('x{}0'.format(MD5)) == {}
+
+
+@pytest.mark.parametrize('page', _pages(
+    '<table><tr><td>1</td>'
+    '<td><a href="../MAT/HB/a.mat">MAT</a> md5 {other}</td>'
+    '<td><a href="../MM/HB/a.tar.gz">MM</a> md5 {md5}</td></tr>'
+    '<tr><td><a href="../MM/HB/b.tar.gz">MM</a></td></tr></table>'.format(
+        other=hashlib.md5(b'other').hexdigest(), md5=MD5)))
+def test_sparse_matrix_checksums_are_the_ones_of_the_mm_link(page):
+    downloader = SparseMatrixDownloader('spmx', 'http://host/research/sparse/matrices/list_by_id.html')
+
+    assert downloader._parse_urls(page) == ['http://host/research/sparse/MM/HB/a.tar.gz',
+                                           'http://host/research/sparse/MM/HB/b.tar.gz']
+    assert downloader._expected_checksums('http://host/research/sparse/MM/HB/a.tar.gz') == {'md5': MD5}
+    assert downloader._expected_checksums('http://host/research/sparse/MM/HB/b.tar.gz') == {}
+
+
+@pytest.mark.parametrize('page', _pages(
+    '<table id="datatab"><tr><th>File</th><th>SHA-256</th></tr>'
+    '<tr><td><a href="../data/a.txt.gz">a.txt.gz</a></td><td>{}</td></tr>'
+    '<tr><td><a href="../data/b.txt.gz">b.txt.gz</a></td><td>Edges</td></tr></table>'.format(SHA256)))
+def test_snap_checksums_are_read_from_the_row_of_the_link(page):
+    downloader = SNAPDownloader('snap', 'http://host/data/index.html')
+
+    assert downloader._parse_urls(page) == ['http://host/data/a.txt.gz', 'http://host/data/b.txt.gz']
+    assert downloader._expected_checksums('http://host/data/a.txt.gz') == {'sha256': SHA256}
+    assert downloader._expected_checksums('http://host/data/b.txt.gz') == {}
+
+
+@pytest.mark.parametrize('published, kept', [(SHA256, True), (hashlib.sha256(b'other').hexdigest(), False)])
+def test_network_not_matching_the_published_checksum_is_downloaded_again(file_server, tmp_path, published, kept):
+    file_server.serve({'network.txt': b'network'})
+    downloader = file_server.downloader(resume_attempts=3, retry_backoff=0)
+    downloader._record_published_checksums(file_server.url('network.txt'), published)
+
+    downloader.download_networks(str(tmp_path))
+
+    assert os.path.exists(tmp_path / 'network.txt') == kept
+    assert not os.path.exists(tmp_path / 'network.txt.part')
+    assert file_server.requested_paths.count('/network.txt') == (1 if kept else 3)
+    if not kept:
+        with open(tmp_path / '.failed.json') as in_file:
+            assert 'sha256 mismatch' in json.dumps(json.load(in_file))
@@ -0,0 +1,70 @@
+import gzip
+import random
+
+from csr import convert_to_csr, load_csr
+
+import pytest
+
+
+def _random_edges(nodes, edges, seed):
+    generator = random.Random(seed)
+    return [(generator.randrange(nodes), generator.randrange(nodes), generator.randint(1, 9)) for _ in range(edges)]
+
+
+def _naive_rows(edges, nodes, symmetric=False):
+    rows = [[] for _ in range(nodes)]
+    for source, target, weight in edges:
+        rows[source].append((target, weight))
+        if symmetric and source != target:
+            rows[target].append((source, weight))
+    return [sorted(row) for row in rows]
+
+
+def _csr_rows(path):
+    indptr, indices, weights = load_csr(path)
+    return [sorted((int(indices[i]), int(weights[i]) if weights is not None else None)
+                   for i in range(indptr[row], indptr[row + 1])) for row in range(len(indptr) - 1)]
+
+
+def test_snap_edge_list(tmp_path):
+    edges = _random_edges(50, 400, 1)
+    filename = tmp_path / 'graph.txt'
+    filename.write_text('# Directed graph\n# FromNodeId\tToNodeId\n' +
+                        ''.join('{}\t{}\n'.format(source, target) for source, target, _ in edges))
+
+    # A tiny chunk size makes the file span many chunks in both passes.
+    rows = _csr_rows(convert_to_csr(str(filename), size=64))
+
+    assert rows == [[(target, None) for target, _ in row] for row in _naive_rows(edges, len(rows))]
+    assert len(rows) == max(max(source, target) for source, target, _ in edges) + 1
+
+
+def test_gzipped_symmetric_matrix_market(tmp_path):
+    edges = [(source, target, weight) for source, target, weight in _random_edges(40, 300, 2) if source >= target]
+    filename = tmp_path / 'matrix.mtx.gz'
+    with gzip.open(filename, 'wt') as out_file:
+        out_file.write('%%MatrixMarket matrix coordinate integer symmetric\n% comment\n%\n')
+        out_file.write('{} {} {}\n'.format(45, 45, len(edges)))
+        for i, (source, target, weight) in enumerate(edges):
+            out_file.write('{} {} {}\n'.format(source + 1, target + 1, weight))
+            if i % 50 == 0:
+                out_file.write('% comment inside the data\n')
+
+    rows = _csr_rows(convert_to_csr(str(filename), size=64))
+
+    # Ids are made 0-based, every off-diagonal entry also stands for its reverse and the size line sets the nodes.
+    assert len(rows) == 45
+    assert rows == _naive_rows(edges, 45, symmetric=True)
+
+
+@pytest.mark.parametrize('size', [32, 1024 * 1024])
+def test_konect_edge_list(tmp_path, size):
+    edges = _random_edges(30, 200, 3)
+    filename = tmp_path / 'out.network'
+    filename.write_text('% asym positive\n% 200 30 30\n' +
+                        ''.join('{} {} {} {}\n'.format(source, target, weight, 1000 + i)
+                                for i, (source, target, weight) in enumerate(edges)))
+
+    rows = _csr_rows(convert_to_csr(str(filename), size=size))
+
+    assert rows == _naive_rows(edges, len(rows))
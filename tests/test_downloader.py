@@ -0,0 +1,159 @@
+import builtins
+import http.client
+import os
+import threading
+import time
+
+import asyncdownloader
+import downloader
+from store import ContentStore
+
+
+def test_segments_count_against_the_host_limit(file_server, tmp_path):
+    data = os.urandom(400000)
+    file_server.serve({'network.txt': data})
+    downloader = file_server.downloader(segments=4, segment_threshold=1000)
+
+    lock = threading.Lock()
+    active = [0, 0]
+    fetch_segment = downloader._fetch_segment
+
+    def counting_fetch_segment(*args):
+        with lock:
+            active[0] += 1
+            active[1] = max(active)
+        time.sleep(0.1)
+        try:
+            return fetch_segment(*args)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    downloader._fetch_segment = counting_fetch_segment
+    downloader.download_networks(str(tmp_path), max_requests_per_host=2)
+
+    assert (tmp_path / 'network.txt').read_bytes() == data
+    assert active[1] == 2
+
+
+def test_download_when_the_stored_copy_is_removed(file_server, tmp_path):
+    data = os.urandom(1000)
+    file_server.serve({'network.txt': data})
+    store = ContentStore(str(tmp_path / 'store'))
+
+    (tmp_path / 'first').mkdir()
+    file_server.downloader(store=store).download_networks(str(tmp_path / 'first'))
+
+    # The blob is removed between the conditional request and its link.
+    link = store.link
+
+    def remove_then_link(sha256, filename):
+        store.link = link
+        os.remove(store.blob_path(sha256))
+        return link(sha256, filename)
+
+    store.link = remove_then_link
+    (tmp_path / 'second').mkdir()
+    file_server.downloader(store=store).download_networks(str(tmp_path / 'second'))
+
+    assert (tmp_path / 'second' / 'network.txt').read_bytes() == data
+    assert not os.path.exists(tmp_path / 'second' / '.failed.json')
+
+
+def test_get_urls_fetches_each_page_once(file_server):
+    file_server.serve({'graphs.html': b'<a href="/a.txt">x</a><a href="/b.txt">x</a><a href="/a.txt">x</a>',
+                       'social.html': b'<a href="/b.txt">x</a><a href="/c.txt">x</a>'})
+    (file_server.directory / 'index.html').write_text('<a href="/graphs.html">x</a><a href="/social.html">x</a>'
+                                                      '<a href="/graphs.html">x</a>')
+
+    urls = file_server.downloader(categories=True).get_urls()
+
+    assert urls == [file_server.url('a.txt'), file_server.url('b.txt'), file_server.url('c.txt')]
+    assert file_server.requested_paths.count('/graphs.html') == 1
+
+
+def test_segment_answered_with_503_is_retried_alone(file_server, tmp_path):
+    data = os.urandom(400000)
+    file_server.serve({'network.txt': data})
+    file_server.respond('network.txt', 503, requested_range='bytes=200000-399999')
+
+    file_server.downloader(segments=2, segment_threshold=1000, retry_backoff=0).download_networks(str(tmp_path))
+
+    assert (tmp_path / 'network.txt').read_bytes() == data
+    assert [requested_range for path, requested_range in file_server.requested_ranges if path == '/network.txt'] == \
+        ['bytes=0-199999', 'bytes=200000-399999', 'bytes=200000-399999']
+
+
+def test_short_writes_of_segments_are_completed(file_server, tmp_path, monkeypatch):
+    data = os.urandom(400000)
+    file_server.serve({'network.txt': data})
+    pwrite = os.pwrite
+
+    def short_pwrite(fd, chunk, offset):
+        return pwrite(fd, chunk[:max(1, len(chunk) // 3)], offset)
+
+    monkeypatch.setattr(os, 'pwrite', short_pwrite)
+    file_server.downloader(segments=2, segment_threshold=1000).download_networks(str(tmp_path))
+
+    assert (tmp_path / 'network.txt').read_bytes() == data
+
+
+class _ShortWritingFile(object):
+    """
+    Wraps an unbuffered file whose writes only write part of the chunks, as they may when interrupted.
+    """
+
+    def __init__(self, out_file):
+        self._out_file = out_file
+
+    def write(self, data):
+        return self._out_file.write(data[:max(1, len(data) // 3)])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._out_file.close()
+
+    def __getattr__(self, name):
+        return getattr(self._out_file, name)
+
+
+def test_short_writes_are_completed(file_server, tmp_path, download, monkeypatch):
+    data = os.urandom(400000)
+    file_server.serve({'network.txt': data})
+
+    def short_writing_open(filename, mode='r', buffering=-1, **kwargs):
+        out_file = builtins.open(filename, mode, buffering, **kwargs)
+        return _ShortWritingFile(out_file) if buffering == 0 else out_file
+
+    for module in (downloader, asyncdownloader):
+        monkeypatch.setattr(module, 'open', short_writing_open, raising=False)
+    download(file_server.downloader(), tmp_path)
+
+    assert (tmp_path / 'network.txt').read_bytes() == data
+
+
+class _ResponseWithoutHttpClient(object):
+    """
+    Wraps a urllib3 response without the private attribute holding its http.client response.
+    """
+
+    def __init__(self, request):
+        self.headers = request.headers
+        self.readinto = request.readinto
+
+
+def test_read_chunks_with_and_without_the_http_client_response(file_server):
+    data = os.urandom(300000)
+    file_server.serve({'network.txt': data})
+    local_downloader = file_server.downloader(chunk_size=1024, max_chunk_size=64 * 1024)
+
+    request = local_downloader.http.urlopen('GET', file_server.url('network.txt'), preload_content=False)
+    assert isinstance(downloader._http_client_response(request), http.client.HTTPResponse)
+    assert b''.join(bytes(chunk) for chunk in local_downloader._read_chunks(request)) == data
+
+    request = _ResponseWithoutHttpClient(
+        local_downloader.http.urlopen('GET', file_server.url('network.txt'), preload_content=False))
+    assert downloader._http_client_response(request) is None
+    assert b''.join(bytes(chunk) for chunk in local_downloader._read_chunks(request)) == data
@@ -0,0 +1,14 @@
+from bs4 import BeautifulSoup
+
+from htmlparse import LxmlPage
+
+import pytest
+
+
+@pytest.mark.parametrize('data', [b'', b'  \n\t', b'<a href="/network.txt">network</a>'])
+def test_lxml_page_matches_beautifulsoup(data):
+    page = LxmlPage.from_html(data)
+    soup = BeautifulSoup(data, 'lxml')
+
+    assert [a.get('href') for a in page.find_all('a')] == [a.get('href') for a in soup.find_all('a')]
+    assert (page.find('a') is None) == (soup.find('a') is None)
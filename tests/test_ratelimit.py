@@ -0,0 +1,55 @@
+import asyncio
+import os
+import time
+
+from asyncdownloader import AsyncNetworkDownloader, client_session
+from conftest import LocalDownloader
+from ratelimit import RateLimiter, TokenBucket
+
+
+def test_reserve_does_not_wait():
+    bucket = TokenBucket(2)
+
+    s_time = time.monotonic()
+    waits = [bucket.reserve() for _ in range(4)]
+
+    assert time.monotonic() - s_time < 0.1
+    assert waits[:2] == [0.0, 0.0]
+    assert 0.4 < waits[2] < 0.6 and 0.9 < waits[3] < 1.1
+
+
+def test_reserve_without_limits():
+    rate_limiter = RateLimiter()
+
+    assert rate_limiter.reserve_request('http://example.org/network.txt') == 0.0
+    assert rate_limiter.reserve_transfer('http://example.org/network.txt', 10 ** 9) == 0.0
+
+
+def test_throttled_host_does_not_hold_up_other_hosts(file_server, tmp_path):
+    file_server.serve({'network{:02d}.txt'.format(i): os.urandom(2000) for i in range(20)})
+    rate_limiter = RateLimiter()
+    # Both names reach the same server, but count as different hosts.
+    throttled = LocalDownloader(file_server.base_url.replace('127.0.0.1', 'localhost'), rate_limiter=rate_limiter,
+                                rate_limits={'max_requests_per_sec': 4})
+    unlimited = LocalDownloader(file_server.base_url, rate_limiter=rate_limiter)
+    for name in ('throttled', 'unlimited'):
+        (tmp_path / name).mkdir()
+    durations = {}
+
+    async def download(session, semaphore, name, downloader, delay=0):
+        # The unlimited host starts once the throttled one has every request waiting.
+        await asyncio.sleep(delay)
+        s_time = time.monotonic()
+        await AsyncNetworkDownloader(downloader, session, semaphore).download_networks(str(tmp_path / name))
+        durations[name] = time.monotonic() - s_time
+
+    async def download_both():
+        semaphore = asyncio.Semaphore(4)
+        async with client_session(workers=4) as session:
+            await asyncio.gather(download(session, semaphore, 'throttled', throttled),
+                                 download(session, semaphore, 'unlimited', unlimited, delay=1))
+
+    asyncio.run(download_both())
+
+    assert len(os.listdir(tmp_path / 'unlimited')) >= 20
+    assert durations['unlimited'] < 2 < durations['throttled'] - 1
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import os
+
+from manifest import Manifest
+
+
+def _write_part(output_dir, data, last_modified):
+    (output_dir / 'network.txt.part').write_bytes(data)
+    if last_modified is not None:
+        (output_dir / 'network.txt.part.json').write_text(json.dumps({'etag': None, 'last_modified': last_modified}))
+
+
+def _assert_downloaded(file_server, output_dir, data):
+    assert (output_dir / 'network.txt').read_bytes() == data
+    assert Manifest(str(output_dir)).get(file_server.url('network.txt'))['sha256'] == hashlib.sha256(data).hexdigest()
+    assert not os.path.exists(output_dir / 'network.txt.part')
+    assert not os.path.exists(output_dir / 'network.txt.part.json')
+    assert not os.path.exists(output_dir / '.failed.json')
+
+
+def test_resume_partial_file(file_server, tmp_path, download):
+    data = os.urandom(100000)
+    file_server.serve({'network.txt': data})
+    _write_part(tmp_path, data[:30000], file_server.last_modified('network.txt'))
+
+    download(file_server.downloader(), tmp_path)
+
+    _assert_downloaded(file_server, tmp_path, data)
+    assert file_server.requested_ranges[-1] == ('/network.txt', 'bytes=30000-')
+
+
+def test_partial_file_of_another_version_is_downloaded_again(file_server, tmp_path, download):
+    old_data, data = os.urandom(100000), os.urandom(100000)
+    file_server.serve({'network.txt': old_data})
+    os.utime(file_server.directory / 'network.txt', (10 ** 9, 10 ** 9))
+    _write_part(tmp_path, old_data[:40000], file_server.last_modified('network.txt'))
+    # The network changes upstream, keeping its size.
+    (file_server.directory / 'network.txt').write_bytes(data)
+
+    download(file_server.downloader(), tmp_path)
+
+    _assert_downloaded(file_server, tmp_path, data)
+
+
+def test_partial_file_without_record_is_downloaded_again(file_server, tmp_path, download):
+    data = os.urandom(100000)
+    file_server.serve({'network.txt': data})
+    _write_part(tmp_path, os.urandom(30000), None)
+
+    download(file_server.downloader(), tmp_path)
+
+    _assert_downloaded(file_server, tmp_path, data)
+    assert file_server.requested_ranges[-1] == ('/network.txt', None)
+
+
+def test_complete_partial_file_is_kept(file_server, tmp_path, download):
+    data = os.urandom(100000)
+    file_server.serve({'network.txt': data})
+    _write_part(tmp_path, data, file_server.last_modified('network.txt'))
+
+    download(file_server.downloader(), tmp_path)
+
+    _assert_downloaded(file_server, tmp_path, data)
+    assert file_server.requested_ranges[-1] == ('/network.txt', 'bytes=100000-')
@@ -0,0 +1,95 @@
+import email.utils
+import json
+import os
+import subprocess
+import sys
+import time
+
+from retry import RetryPolicy, parse_retry_after
+
+import pytest
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _failures(output_dir):
+    with open(output_dir / '.failed.json') as in_file:
+        return json.load(in_file)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120.0
+    assert 50 < parse_retry_after(email.utils.formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert parse_retry_after(email.utils.formatdate(time.time() - 60, usegmt=True)) == 0.0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+
+def test_retry_policy_delay():
+    policy = RetryPolicy(attempts=5, backoff=1.0, max_backoff=3.0, max_retry_after=10.0)
+
+    assert policy.delay(1, retry_after=5.0) == 5.0
+    assert policy.delay(1, retry_after=3600.0) == 10.0
+    assert all(0 <= policy.delay(attempt) <= min(3.0, 2 ** (attempt - 1)) for attempt in range(1, 6) for _ in range(20))
+
+
+def test_retry_after_is_honoured_before_a_not_found(file_server, tmp_path, download):
+    file_server.serve({'network.txt': b'network', 'other.txt': b'other'})
+    file_server.respond('network.txt', 503, {'Retry-After': '1'})
+    file_server.respond('network.txt', 404)
+
+    s_time = time.perf_counter()
+    download(file_server.downloader(retry_backoff=0), tmp_path)
+
+    assert time.perf_counter() - s_time >= 1
+    assert file_server.requested_paths.count('/network.txt') == 2
+    assert (tmp_path / 'other.txt').read_bytes() == b'other'
+    assert not os.path.exists(tmp_path / 'network.txt')
+    failures = _failures(tmp_path)
+    assert list(failures) == [file_server.url('network.txt')]
+    assert failures[file_server.url('network.txt')]['error'] == 'HTTP 404'
+
+
+@pytest.mark.parametrize('unavailable, kept', [(2, True), (3, False)])
+def test_unavailable_network_is_retried(file_server, tmp_path, download, unavailable, kept):
+    file_server.serve({'network.txt': b'network'})
+    for _ in range(unavailable):
+        file_server.respond('network.txt', 503)
+
+    download(file_server.downloader(resume_attempts=3, retry_backoff=0), tmp_path)
+
+    assert file_server.requested_paths.count('/network.txt') == 3
+    assert os.path.exists(tmp_path / 'network.txt') == kept
+    if kept:
+        assert not os.path.exists(tmp_path / '.failed.json')
+    else:
+        assert _failures(tmp_path)[file_server.url('network.txt')]['error'] == 'HTTP 503'
+
+
+def test_retry_failed_only_downloads_failed_networks(file_server, tmp_path):
+    file_server.serve({'a.zip': b'a', 'b.zip': b'b'})
+    (file_server.directory / 'index.html').write_text('<ul><li><a href="a.zip">a</a></li><li><a href="b.zip">b</a>'
+                                                      '</li></ul>')
+    file_server.respond('b.zip', 404)
+    (tmp_path / 'repositories.json').write_text(json.dumps(
+        {'small': {'class': 'downloader:SmallDownloader', 'site_url': file_server.base_url + '/'}}))
+
+    def net_downloader(*args):
+        return subprocess.run([sys.executable, os.path.join(REPOSITORY_DIR, 'net-downloader.py'), '-repo', 'small',
+                               '-odir', 'output', '-cache_dir', 'cache', '-retries', '1'] + list(args),
+                              cwd=str(tmp_path), capture_output=True, timeout=60)
+
+    assert net_downloader().returncode == 0
+    output_dir = tmp_path / 'output' / 'small'
+    assert list(_failures(output_dir)) == [file_server.url('b.zip')]
+
+    del file_server.requested_paths[:]
+    assert net_downloader('-retry_failed').returncode == 0
+
+    assert file_server.requested_paths == ['/b.zip']
+    assert (output_dir / 'a.zip').read_bytes() == b'a'
+    assert (output_dir / 'b.zip').read_bytes() == b'b'
+    assert not os.path.exists(output_dir / '.failed.json')
+
+    assert net_downloader('-retry_failed').returncode == 0
+    assert file_server.requested_paths == ['/b.zip']
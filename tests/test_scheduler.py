@@ -0,0 +1,64 @@
+import collections
+import threading
+import time
+
+from scheduler import download_repositories
+
+
+class _FakeDownloader(object):
+    """
+    Stands in for a NetworkDownloader of one host, recording when its downloads start and how many are in flight.
+    """
+
+    def __init__(self, host, files, log):
+        self._repository_name = host
+        self._urls = ['http://{}/{}'.format(host, i) for i in range(files)]
+        self._log = log
+        self.finished = False
+
+    def begin_downloads(self, repository_output_dir, **kwargs):
+        return [(repository_output_dir + '/' + url.rsplit('/', 1)[1], url) for url in self._urls]
+
+    def download_network(self, out_filename, url):
+        self._log.start(url)
+        time.sleep(0.1)
+        self._log.end(url)
+
+    def finish_downloads(self):
+        self.finished = True
+
+
+class _Log(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = collections.Counter()
+        self.max_in_flight = collections.Counter()
+        self.started = []
+
+    def start(self, url):
+        host = url.split('/')[2]
+        with self._lock:
+            self.started.append(host)
+            self.in_flight[host] += 1
+            self.max_in_flight[host] = max(self.max_in_flight[host], self.in_flight[host])
+
+    def end(self, url):
+        with self._lock:
+            self.in_flight[url.split('/')[2]] -= 1
+
+
+def test_hosts_are_visited_round_robin_up_to_their_limit():
+    log = _Log()
+    downloaders = {'busy': _FakeDownloader('busy.example', 8, log),
+                   'small': _FakeDownloader('small.example', 2, log),
+                   'third': _FakeDownloader('third.example', 1, log)}
+
+    download_repositories(downloaders, {repository: '/tmp' for repository in downloaders}, workers=6,
+                          max_requests_per_host=2)
+
+    assert log.max_in_flight == {'busy.example': 2, 'small.example': 2, 'third.example': 1}
+    assert collections.Counter(log.started) == {'busy.example': 8, 'small.example': 2, 'third.example': 1}
+    # Workers left idle by the busy host's limit go to the other hosts, which are not queued behind it.
+    assert sorted(log.started[:5]) == ['busy.example', 'busy.example', 'small.example', 'small.example',
+                                       'third.example']
+    assert all(downloader.finished for downloader in downloaders.values())
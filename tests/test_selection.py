@@ -0,0 +1,51 @@
+from selection import Selection
+
+import pytest
+
+URLS = ['http://host/a.txt', 'http://host/b.txt.gz', 'http://host/c.tsv', 'http://host/d.txt', 'http://host/e.txt']
+SIZES = {'http://host/a.txt': 300, 'http://host/b.txt.gz': 100, 'http://host/c.tsv': None, 'http://host/d.txt': 200,
+         'http://host/e.txt': 5000}
+
+
+@pytest.mark.parametrize('order, expected', [
+    ('name', URLS),
+    ('smallest', ['http://host/b.txt.gz', 'http://host/d.txt', 'http://host/a.txt', 'http://host/e.txt',
+                  'http://host/c.tsv']),
+    ('largest', ['http://host/e.txt', 'http://host/a.txt', 'http://host/d.txt', 'http://host/b.txt.gz',
+                 'http://host/c.tsv'])])
+def test_order_puts_unknown_sizes_last(order, expected):
+    assert Selection(order=order).apply(URLS, SIZES) == expected
+
+
+def test_max_size_keeps_unknown_sizes():
+    assert Selection(max_size=300).apply(URLS, SIZES) == ['http://host/a.txt', 'http://host/b.txt.gz',
+                                                          'http://host/c.tsv', 'http://host/d.txt']
+
+
+def test_limit_applies_after_the_order():
+    assert Selection(order='largest', limit=2).apply(URLS, SIZES) == ['http://host/e.txt', 'http://host/a.txt']
+
+
+def test_patterns():
+    selection = Selection(include=['*.txt', 're:\\.gz$'], exclude=['re:/e\\.'])
+
+    assert selection.apply(URLS) == ['http://host/a.txt', 'http://host/b.txt.gz', 'http://host/d.txt']
+    assert not selection.needs_sizes
+    assert Selection(max_size=1).needs_sizes and Selection(order='smallest').needs_sizes
+
+
+def test_invalid_order():
+    with pytest.raises(ValueError):
+        Selection(order='random')
+
+
+def test_select_urls_with_unknown_sizes(file_server):
+    file_server.serve({'large.txt': b'x' * 3000, 'small.txt': b'x' * 10, 'unknown.txt': b'x' * 10,
+                       'other.csv': b'x'})
+    # The server does not tell the size of one network, whose HEAD request fails.
+    file_server.respond('unknown.txt', 404)
+    downloader = file_server.downloader()
+
+    urls = downloader.select_urls(Selection(include=['*.txt'], order='smallest', max_size=1000))
+
+    assert urls == [file_server.url('small.txt'), file_server.url('unknown.txt')]
@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+
+from manifest import Manifest
+from shard import Shard, manifest_sizes, merge_shards, parse_shard
+
+import pytest
+
+
+def _download_shard(base_url, index, count, output_dir):
+    from conftest import LocalDownloader
+
+    LocalDownloader(base_url).download_networks(output_dir, workers=2, shard=Shard(index, count))
+
+
+def test_parse_shard():
+    assert parse_shard('2/4') == (2, 4)
+    for text in ('0/4', '5/4', '2', 'a/b'):
+        with pytest.raises(ValueError):
+            parse_shard(text)
+
+
+def test_shard_of_url_does_not_depend_on_other_urls():
+    urls = ['http://example.org/{}.gz'.format(i) for i in range(200)]
+    shards = [Shard(index, 4) for index in range(1, 5)]
+    kept = [shard.apply(urls) for shard in shards]
+
+    # A machine which failed to discover some urls, or sees them in another order, still agrees on the others.
+    partial = urls[::-3]
+    for shard, urls_of_shard in zip(shards, kept):
+        assert shard.apply(partial) == [url for url in partial if url in urls_of_shard]
+
+    assert sorted(sum(kept, [])) == sorted(urls)
+    assert all(30 <= len(urls_of_shard) <= 70 for urls_of_shard in kept)
+
+
+def test_large_networks_are_spread_by_size():
+    sizes = {'http://example.org/{}.gz'.format(i): 1000 for i in range(200)}
+    sizes.update({'http://example.org/large{}.gz'.format(i): 100000 * (i + 1) for i in range(8)})
+    shards = [Shard(index, 4, sizes=sizes, size_threshold=10000) for index in range(1, 5)]
+    shard_bytes = [sum(sizes[url] for url in shard.apply(sorted(sizes))) for shard in shards]
+
+    assert sum(shard_bytes) == sum(sizes.values())
+    assert max(shard_bytes) - min(shard_bytes) <= 100000
+
+    # The assignment does not depend on the order of the sizes nor on the urls a machine discovered.
+    reordered = dict(reversed(list(sizes.items())))
+    partial = sorted(sizes)[::-3] + ['http://example.org/new.gz']
+    for shard in shards:
+        same_shard = Shard(int(str(shard).split('/')[0]), 4, sizes=reordered, size_threshold=10000)
+        assert same_shard.apply(partial) == shard.apply(partial)
+
+    # Small networks are hashed as without sizes.
+    assert [shard.apply(sorted(sizes)[:200]) for shard in shards] == \
+        [Shard(index, 4).apply(sorted(sizes)[:200]) for index in range(1, 5)]
+
+
+def test_manifest_sizes(tmp_path):
+    manifest = Manifest(str(tmp_path))
+    manifest.record('http://example.org/a.gz', 'a.gz', 10)
+    manifest.save()
+
+    assert manifest_sizes(str(tmp_path)) == {'http://example.org/a.gz': 10}
+    assert manifest_sizes(str(tmp_path / 'missing')) == {}
+
+
+def test_shards_downloaded_by_separate_processes(file_server, tmp_path):
+    names = ['network{:02d}.txt'.format(i) for i in range(24)]
+    file_server.serve({name: os.urandom(100 + i) for i, name in enumerate(names)})
+
+    shard_dirs = [str(tmp_path / 'shard{}'.format(index)) for index in range(1, 4)]
+    for shard_dir in shard_dirs:
+        os.makedirs(shard_dir)
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_download_shard, args=(file_server.base_url, index, 3, shard_dir))
+                 for index, shard_dir in enumerate(shard_dirs, 1)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    downloaded = [{name for name in os.listdir(shard_dir) if name.endswith('.txt')} for shard_dir in shard_dirs]
+    assert sum(len(names_of_shard) for names_of_shard in downloaded) == len(names)
+    assert set().union(*downloaded) == set(names)
+
+    merged_dir = str(tmp_path / 'merged')
+    os.makedirs(merged_dir)
+    assert merge_shards(shard_dirs, merged_dir) == len(names)
+    assert len(Manifest(merged_dir)) == len(names)
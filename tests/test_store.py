@@ -0,0 +1,48 @@
+import errno
+import hashlib
+import os
+
+from store import ContentStore
+
+import pytest
+
+
+def _add(store, tmp_path, data):
+    filename = tmp_path / 'network.txt'
+    filename.write_bytes(data)
+    sha256 = hashlib.sha256(data).hexdigest()
+    store.add(str(filename), 'http://example.org/network.txt', sha256, size=len(data))
+    return sha256
+
+
+def test_link_shares_the_blob(tmp_path):
+    store = ContentStore(str(tmp_path / 'store'))
+    sha256 = _add(store, tmp_path, b'data')
+
+    store.link(sha256, str(tmp_path / 'copy.txt'))
+
+    assert (tmp_path / 'copy.txt').read_bytes() == b'data'
+    assert os.path.samefile(tmp_path / 'copy.txt', store.blob_path(sha256))
+
+
+def test_link_falls_back_to_a_symbolic_link_across_file_systems(tmp_path, monkeypatch):
+    store = ContentStore(str(tmp_path / 'store'))
+    sha256 = _add(store, tmp_path, b'data')
+
+    def cross_device_link(source, destination):
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+    monkeypatch.setattr(os, 'link', cross_device_link)
+    store.link(sha256, str(tmp_path / 'copy.txt'))
+
+    assert os.path.islink(tmp_path / 'copy.txt')
+    assert (tmp_path / 'copy.txt').read_bytes() == b'data'
+
+
+def test_link_of_a_missing_blob_raises(tmp_path):
+    store = ContentStore(str(tmp_path / 'store'))
+
+    with pytest.raises(FileNotFoundError):
+        store.link(hashlib.sha256(b'data').hexdigest(), str(tmp_path / 'copy.txt'))
+
+    assert not os.path.lexists(tmp_path / 'copy.txt')
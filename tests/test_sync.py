@@ -0,0 +1,57 @@
+import os
+import time
+
+from manifest import Manifest
+
+
+def _forget_validators(output_dir, url):
+    # Servers sending neither ETag nor Last-Modified leave the manifest without validators.
+    manifest = Manifest(str(output_dir))
+    entry = manifest.get(url)
+    manifest.record(url, entry['filename'], entry['size'], sha256=entry['sha256'], md5=entry['md5'])
+    manifest.save()
+
+
+def test_sync_keeps_unchanged_networks(file_server, tmp_path, download):
+    file_server.serve({'network.txt': b'network', 'other.txt': b'other'})
+    download(file_server.downloader(), tmp_path)
+    inode = os.stat(tmp_path / 'network.txt').st_ino
+
+    # The other network changed upstream since the first run.
+    (file_server.directory / 'other.txt').write_bytes(b'other network')
+    os.utime(file_server.directory / 'other.txt', (time.time() + 10, time.time() + 10))
+    download(file_server.downloader(), tmp_path, sync=True)
+
+    # The unchanged network was answered with 304, so its file was not replaced.
+    assert file_server.requested_paths.count('/network.txt') == 2
+    assert os.stat(tmp_path / 'network.txt').st_ino == inode
+    assert (tmp_path / 'other.txt').read_bytes() == b'other network'
+    assert Manifest(str(tmp_path)).get(file_server.url('other.txt'))['size'] == len(b'other network')
+    assert Manifest(str(tmp_path)).get(file_server.url('other.txt'))['last_modified'] == \
+        file_server.last_modified('other.txt')
+
+
+def test_download_without_sync_fetches_every_network(file_server, tmp_path, download):
+    file_server.serve({'network.txt': b'network'})
+    download(file_server.downloader(), tmp_path)
+    inode = os.stat(tmp_path / 'network.txt').st_ino
+
+    download(file_server.downloader(), tmp_path)
+
+    assert file_server.requested_paths.count('/network.txt') == 2
+    assert os.stat(tmp_path / 'network.txt').st_ino != inode
+
+
+def test_sync_compares_sizes_without_validators(file_server, tmp_path, download):
+    file_server.serve({'network.txt': b'network', 'other.txt': b'other'})
+    download(file_server.downloader(), tmp_path)
+    for name in ('network.txt', 'other.txt'):
+        _forget_validators(tmp_path, file_server.url(name))
+    (file_server.directory / 'other.txt').write_bytes(b'other network')
+
+    download(file_server.downloader(), tmp_path, sync=True)
+
+    # Only the network whose size the HEAD request found changed is requested again.
+    assert file_server.requested_paths.count('/network.txt') == 1
+    assert file_server.requested_paths.count('/other.txt') == 2
+    assert (tmp_path / 'other.txt').read_bytes() == b'other network'